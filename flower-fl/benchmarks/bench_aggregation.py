@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Server aggregation benchmark: memory and time vs. number of clients.
+
+  collect    stock Flower round: every client's FitRes is held until the round
+             ends, then FedAvg.aggregate_fit averages them (what server.py did)
+  streaming  SaveBest + StreamingServer: each FitRes is folded into the
+             running average as it arrives and released
+
+Client updates are random CNN-shaped weights. Each (mode, clients) pair runs
+in its own process so peak RSS is not shared between runs.
+
+    python benchmarks/bench_aggregation.py --clients 4 16 64 256 1000
+"""
+import os
+import sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "server"))
+
+import argparse
+import multiprocessing as mp
+import resource
+import time
+
+
+def make_result(shapes, rng):
+    import numpy as np
+    from flwr.common import Code, FitRes, Status, ndarrays_to_parameters
+    arrays = [rng.standard_normal(s, dtype=np.float32) for s in shapes]
+    return FitRes(
+        status=Status(Code.OK, "Success"),
+        parameters=ndarrays_to_parameters(arrays),
+        num_examples=int(rng.integers(50, 500)),
+        metrics={},
+    )
+
+
+def no_metrics(metrics_list):
+    return {}
+
+
+def run(mode, num_clients, strategy_name, seed=0):
+    import numpy as np
+    from flwr.common import ndarrays_to_parameters, parameters_to_ndarrays
+    from server import make_savebest_strategy, strategy_class
+    from common.models.cnn import build_model
+
+    rng = np.random.default_rng(seed)
+    initial = [t.numpy() for t in build_model().state_dict().values()]
+    shapes = [a.shape for a in initial]
+    initial_parameters = ndarrays_to_parameters(initial)
+    base_cls = strategy_class(strategy_name)
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if mode == "collect":
+        strategy = base_cls(initial_parameters=initial_parameters, fit_metrics_aggregation_fn=no_metrics)
+        # Clients finish one after another; the round holds all their results
+        results = [(None, make_result(shapes, rng)) for _ in range(num_clients)]
+        start = time.perf_counter()
+        params, _ = strategy.aggregate_fit(1, results, [])
+        agg_time = time.perf_counter() - start
+        del results
+    else:
+        strategy = make_savebest_strategy(base_cls)(
+            initial_parameters=initial_parameters, fit_metrics_aggregation_fn=no_metrics
+        )
+        strategy.begin_fit_round(initial_parameters)
+        agg_time = 0.0
+        for _ in range(num_clients):
+            res = make_result(shapes, rng)
+            start = time.perf_counter()
+            strategy.fold_fit_result(1, None, res)
+            agg_time += time.perf_counter() - start
+            del res
+        start = time.perf_counter()
+        params, _ = strategy.finish_fit_round(1, [])
+        agg_time += time.perf_counter() - start
+
+    assert len(parameters_to_ndarrays(params)) == len(shapes)
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux
+    return (rss_peak - rss_start) / 1024, rss_peak / 1024, agg_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server aggregation memory and time")
+    parser.add_argument("-c", "--clients", type=int, nargs="+", default=[4, 16, 64, 256, 1000])
+    parser.add_argument("-m", "--strategy", type=str, default="FedAvg",
+                        choices=["FedAvg", "FedAdagrad", "FedAdam", "FedYogi"])
+    parser.add_argument("--modes", nargs="+", default=["collect", "streaming"], choices=["collect", "streaming"])
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    print(f"strategy={args.strategy}")
+    print(f"{'mode':10} {'clients':>7} {'growth MB':>10} {'peak MB':>9} {'agg s':>8} {'ms/client':>10}")
+    for n in args.clients:
+        for mode in args.modes:
+            with ctx.Pool(1) as pool:
+                growth, peak, agg = pool.apply(run, (mode, n, args.strategy))
+            print(f"{mode:10} {n:7d} {growth:10.0f} {peak:9.0f} {agg:8.2f} {agg / n * 1e3:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
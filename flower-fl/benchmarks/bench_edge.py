@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Root server fan-in benchmark: server.py with N clients attached directly, against
+the same N clients behind --edges edge aggregators (server/edge.py), over
+loopback. Clients are lightweight NumPy stand-ins (threads, no training), so
+what grows with N is only the work of terminating connections and aggregating.
+For each run the root's total CPU seconds and peak RSS are printed; with edges
+they should stay flat as N grows, as the root only ever sees --edges clients.
+The peak is the one the root measures itself (see peak_memory_mb): this script
+loads torch, and a child's ru_maxrss on Linux starts from its parent's.
+
+    python benchmarks/bench_edge.py --clients 4 16 64 --edges 2 --rounds 3
+"""
+import os
+import sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import argparse
+import json
+import tempfile
+import threading
+import time
+import subprocess
+from pathlib import Path
+
+from bench_rounds import free_port, wait_for_port
+
+# Stand-in clients per process; each is a thread with its own connection
+CLIENTS_PER_PROCESS = 16
+
+
+def child(args):
+    """Run `args.child` stand-in clients against `args.address` until the server ends."""
+    import flwr as fl
+    import numpy as np
+
+    class StandInClient(fl.client.NumPyClient):
+        def __init__(self, cid):
+            self.cid = cid
+            self.rng = np.random.default_rng(int(cid))
+
+        def fit(self, parameters, config):
+            update = [(p + 1e-3 * self.rng.standard_normal(p.shape)).astype(p.dtype) for p in parameters]
+            return update, 100, {"t_total": 0.01, "samples": 100, "cid": self.cid}
+
+        def evaluate(self, parameters, config):
+            return 1.0, 20, {"accuracy": 0.5, "misclassified": 10, "t_total": 0.01, "cid": self.cid}
+
+    threads = [
+        threading.Thread(target=fl.client.start_numpy_client,
+                         kwargs={"server_address": args.address, "client": StandInClient(f"{args.first + i}")})
+        for i in range(args.child)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def run(n_clients, n_edges, args, workdir):
+    """One run; return the root's (CPU seconds, peak RSS in MB)."""
+    procs, logs = [], []
+
+    def launch(cmd, log_name, cwd=workdir):
+        log = open(workdir / log_name, "w")
+        logs.append(log)
+        procs.append(subprocess.Popen([sys.executable, *cmd], cwd=cwd, stdout=log, stderr=subprocess.STDOUT))
+        return procs[-1]
+
+    def stand_ins(address, first, count):
+        for start in range(0, count, CLIENTS_PER_PROCESS):
+            launch([__file__, "--address", address, "--first", str(first + start),
+                    "--child", str(min(CLIENTS_PER_PROCESS, count - start))],
+                   f"clients_{n_clients}_{n_edges}_{first + start}.log")
+
+    port = free_port()
+    history = workdir / f"root_{n_clients}_{n_edges}.json"
+    root = launch([os.path.join(ROOT, "server", "server.py"), "-p", str(port), "-r", str(args.rounds),
+                   "--hidden-units", str(args.hidden_units), "--min-clients", str(n_edges or n_clients),
+                   "--checkpoint-dir", "", "--history-json", str(history)], f"root_{n_clients}_{n_edges}.log")
+    try:
+        wait_for_port(port, root)
+        if n_edges == 0:
+            stand_ins(f"127.0.0.1:{port}", 1, n_clients)
+        else:
+            per_edge = [n_clients // n_edges + (i < n_clients % n_edges) for i in range(n_edges)]
+            first = 1
+            for i, count in enumerate(per_edge):
+                edge_port = free_port()
+                edge = launch([os.path.join(ROOT, "server", "edge.py"), "--root", f"127.0.0.1:{port}",
+                               "-p", str(edge_port), "--min-clients", str(count)],
+                              f"edge_{n_clients}_{i}.log")
+                wait_for_port(edge_port, edge)
+                stand_ins(f"127.0.0.1:{edge_port}", first, count)
+                first += count
+        # wait4 returns the root's own CPU time
+        _, status, usage = os.wait4(root.pid, 0)
+        root.returncode = os.waitstatus_to_exitcode(status)
+        for p in procs[1:]:
+            p.wait(timeout=120)
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.kill()
+        for log in logs:
+            log.close()
+    if root.returncode != 0:
+        tail = (workdir / f"root_{n_clients}_{n_edges}.log").read_text().splitlines()[-20:]
+        raise RuntimeError("root server failed:\n" + "\n".join(tail))
+    peak = json.loads(history.read_text())["server_peak_mem_mb"]
+    return usage.ru_utime + usage.ru_stime, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark root server load with and without edge aggregators")
+    parser.add_argument("-c", "--clients", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--edges", type=int, default=2, help="Edge aggregators in the tiered runs")
+    parser.add_argument("-r", "--rounds", type=int, default=3)
+    parser.add_argument("--hidden-units", type=int, default=128, help="Model size (fc1 width)")
+    parser.add_argument("-o", "--out", default=None, help="Also write the results to this JSON file")
+    parser.add_argument("--child", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--address", help=argparse.SUPPRESS)
+    parser.add_argument("--first", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    results = []
+    print(f"{'clients':>7} {'edges':>5} {'root CPU s':>10} {'root MB':>8} {'wall s':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.clients:
+            for edges in (0, args.edges):
+                start = time.perf_counter()
+                cpu, peak = run(n, edges, args, Path(tmp))
+                wall = time.perf_counter() - start
+                results.append({"clients": n, "edges": edges, "root_cpu_s": cpu, "root_peak_mb": peak, "wall_s": wall})
+                print(f"{n:7d} {edges:5d} {cpu:10.2f} {peak:8.0f} {wall:7.1f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"→ Wrote {len(results)} runs to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Straggler benchmark: synchronous FedAvg rounds, FedAvg rounds with a deadline,
+and asynchronous FedBuff.
+
+Clients run in-process and "train" by sleeping for a fixed per-client time, then
+step halfway towards their own optimum of a quadratic objective, so the numbers
+measure scheduling rather than compute. Under a deadline a client only sleeps
+for its time budget and reports proportionally fewer samples. All servers use
+the real SaveBest strategy and get the same budget of client updates.
+
+    python benchmarks/bench_fedbuff.py --delays 0.2 0.2 0.3 0.3 0.5 1 3 --updates 56
+"""
+import os
+import sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "server"))
+
+import argparse
+import contextlib
+import io
+import logging
+import tempfile
+import time
+
+import numpy as np
+from flwr.common import (Code, EvaluateRes, FitRes, Status, ndarrays_to_parameters,
+                         parameters_to_ndarrays)
+from flwr.server import SimpleClientManager
+from flwr.server.client_proxy import ClientProxy
+
+from fedbuff import AsyncBufferedServer
+from server import aggregate_fit_metrics, aggregate_metrics, make_savebest_strategy, strategy_class
+from streaming import StreamingServer
+
+SHAPES = [(64, 32), (64,), (10, 64), (10,)]
+
+
+class SlowClientProxy(ClientProxy):
+    """In-process client whose fit takes `delay` seconds."""
+
+    def __init__(self, cid, delay, optimum):
+        super().__init__(cid)
+        self.delay = delay
+        self.optimum = optimum  # This client's minimiser of the objective
+
+    def fit(self, ins, timeout, group_id):
+        budget = float(ins.config.get("time_budget", 0.0))
+        work = min(self.delay, budget) if budget else self.delay
+        time.sleep(work)
+        weights = parameters_to_ndarrays(ins.parameters)
+        new = [w + 0.5 * (o - w) for w, o in zip(weights, self.optimum)]
+        return FitRes(Status(Code.OK, "Success"), ndarrays_to_parameters(new), int(100 * work / self.delay), {})
+
+    def evaluate(self, ins, timeout, group_id):
+        weights = parameters_to_ndarrays(ins.parameters)
+        loss = sum(float(np.mean((w - o) ** 2)) for w, o in zip(weights, self.optimum))
+        return EvaluateRes(Status(Code.OK, "Success"), loss, 100, {})
+
+    def get_properties(self, ins, timeout, group_id):
+        raise NotImplementedError
+
+    def get_parameters(self, ins, timeout, group_id):
+        raise NotImplementedError
+
+    def reconnect(self, ins, timeout, group_id):
+        raise NotImplementedError
+
+
+def run(strategy_name, delays, updates, buffer_size, deadline=None, seed=0):
+    rng = np.random.default_rng(seed)
+    target = [rng.standard_normal(s).astype(np.float32) for s in SHAPES]
+    manager = SimpleClientManager()
+    for i, delay in enumerate(delays):
+        optimum = [t + 0.1 * rng.standard_normal(t.shape).astype(np.float32) for t in target]
+        manager.register(SlowClientProxy(str(i), delay, optimum))
+
+    extra = {"buffer_size": buffer_size} if strategy_name == "FedBuff" else {}
+    # Every round of synchronous FedAvg takes one update from each client
+    num_rounds = updates // (buffer_size if strategy_name == "FedBuff" else len(delays))
+    strategy = make_savebest_strategy(strategy_class(strategy_name))(
+        fraction_fit=1.0,
+        fraction_evaluate=1.0,
+        min_fit_clients=1,
+        min_evaluate_clients=1,
+        min_available_clients=len(delays),
+        initial_parameters=ndarrays_to_parameters([np.zeros(s, dtype=np.float32) for s in SHAPES]),
+        evaluate_metrics_aggregation_fn=aggregate_metrics,
+        fit_metrics_aggregation_fn=aggregate_fit_metrics,
+        # Same split as server.py: 80% of the deadline for training
+        on_fit_config_fn=lambda rnd: {"time_budget": 0.8 * deadline if deadline else 0.0},
+        **extra,
+    )
+    if strategy_name == "FedBuff":
+        server = AsyncBufferedServer(client_manager=manager, strategy=strategy)
+    else:
+        server = StreamingServer(client_manager=manager, strategy=strategy, round_deadline=deadline)
+    server.set_max_workers(len(delays))
+
+    # SaveBest writes best_model.npz into the working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        os.chdir(tmp)
+        try:
+            history, elapsed = server.fit(num_rounds, timeout=None)
+        finally:
+            os.chdir(cwd)
+    final_loss = history.losses_distributed[-1][1] if history.losses_distributed else float("nan")
+    return num_rounds, elapsed, final_loss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FedBuff against synchronous rounds with slow clients")
+    parser.add_argument("-d", "--delays", type=float, nargs="+", default=[0.2, 0.2, 0.3, 0.3, 0.5, 1.0, 3.0],
+                        help="Seconds each client takes per fit")
+    parser.add_argument("-u", "--updates", type=int, default=56, help="Client updates aggregated per run")
+    parser.add_argument("-k", "--buffer-size", type=int, default=3)
+    parser.add_argument("--deadline", type=float, default=0.6, help="Round deadline of the FedAvg+deadline run")
+    args = parser.parse_args()
+
+    logging.getLogger("flwr").setLevel(logging.WARNING)
+    print(f"clients={len(args.delays)} delays={args.delays} updates={args.updates}")
+    print(f"{'strategy':15} {'rounds':>7} {'wall s':>8} {'updates/min':>12} {'final loss':>11}")
+    for label, name, deadline in (("FedAvg", "FedAvg", None),
+                                  ("FedAvg+deadline", "FedAvg", args.deadline),
+                                  ("FedBuff", "FedBuff", None)):
+        rounds, elapsed, loss = run(name, args.delays, args.updates, args.buffer_size, deadline)
+        n = rounds * (args.buffer_size if name == "FedBuff" else len(args.delays))
+        print(f"{label:15} {rounds:7d} {elapsed:8.1f} {n / elapsed * 60:12.1f} {loss:11.4f}")
+
+
+if __name__ == "__main__":
+    main()
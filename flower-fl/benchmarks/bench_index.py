@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Client start-up benchmark: time for load_client_data to return with and without
+the file index (common/utils/dataindex.py), on one synthetic client of
+--images screenshots, with and without the decoded data cache. Each start runs
+in a fresh process, after one untimed start that builds the cache and index.
+Also times a full index build against a refresh after adding --add images.
+
+    python benchmarks/bench_index.py --images 50000
+"""
+import os
+import sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import argparse
+import json
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+
+def start_client(root, cache, index):
+    """Start load_client_data in a new process; return its wall time in seconds."""
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", "--root", str(root)]
+        + (["--cache"] if cache else []) + (["--index"] if index else []),
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])["seconds"]
+
+
+def child(args):
+    from common.utils.data import load_client_data
+    start = time.perf_counter()
+    load_client_data("1", data_root=args.root, cache=args.cache, index=args.index)
+    print(json.dumps({"seconds": time.perf_counter() - start}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark client start-up with and without the file index")
+    parser.add_argument("-n", "--images", type=int, default=50000, help="Images in the client folder")
+    parser.add_argument("--add", type=int, default=500, help="Images added before timing a refresh")
+    parser.add_argument("--repeat", type=int, default=3, help="Starts timed per configuration (median kept)")
+    parser.add_argument("--root", default=None, help="Data folder to reuse (default: a temp folder)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--cache", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--index", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    from common.utils.dataindex import build_index, refresh_index
+    from synthetic import make_dataset
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(args.root or tmp)
+        per_class = args.images // 5
+        start = time.perf_counter()
+        make_dataset(root, 1, train_per_class=per_class * 4 // 5, test_per_class=per_class // 5)
+        print(f"→ {args.images} images ready under {root} ({time.perf_counter() - start:.0f}s)")
+        client_dir = root / "client_1"
+
+        print(f"{'cache':>6} {'startup':>9} {'median s':>9}")
+        for cache in (False, True):
+            for index in (False, True):
+                start_client(root, cache, index)  # Builds the cache / index
+                times = sorted(start_client(root, cache, index) for _ in range(args.repeat))
+                print(f"{str(cache):>6} {'index' if index else 'scan':>9} {times[len(times) // 2]:9.3f}")
+
+        start = time.perf_counter()
+        build_index(client_dir)
+        build_s = time.perf_counter() - start
+        source = next((client_dir / "train" / "Food").iterdir())
+        for i in range(args.add):
+            shutil.copy(source, client_dir / "train" / "Food" / f"added_{i}.jpg")
+        start = time.perf_counter()
+        _, added, _, _ = refresh_index(client_dir)
+        print(f"→ index build {build_s:.3f}s; refresh picking up {added} new images "
+              f"{time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Low-rank fc1 updates against full updates: simulation.py on the same synthetic
+client partitions (client_<i>/ folders from benchmarks/synthetic.py), once with
+full float32 updates and once per --ranks value with `--codec lowrank --rank r`.
+For each run it prints the uplink bytes per fit round, the reduction against
+the full-update run, the mean client fit time, and the federated accuracy of
+the last round and of the best round.
+
+    python benchmarks/bench_lowrank.py --clients 4 --rounds 10 --ranks 4 16
+"""
+import os
+import sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import argparse
+import json
+import shlex
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+from bench_rounds import per_round
+from synthetic import make_dataset
+
+
+def run(name, extra, args, data_root, workdir):
+    """One simulation; return its saved history."""
+    history_path = workdir / f"history_{name}.json"
+    cmd = [sys.executable, os.path.join(ROOT, "simulation.py"), "-n", str(args.clients), "-r", str(args.rounds),
+           "--partition", "dirs", "--data-root", str(data_root), "-e", str(args.local_epochs),
+           "-l", str(args.learning_rate), "--checkpoint-dir", "", "--telemetry", "",
+           "--history-json", str(history_path), *extra, *shlex.split(args.extra_args)]
+    with open(workdir / f"{name}.log", "w") as log:
+        proc = subprocess.run(cmd, cwd=workdir, stdout=log, stderr=subprocess.STDOUT, timeout=args.timeout)
+    if proc.returncode != 0:
+        tail = (workdir / f"{name}.log").read_text().splitlines()[-20:]
+        raise RuntimeError(f"{name} failed:\n" + "\n".join(tail))
+    return json.loads(history_path.read_text())
+
+
+def summarize(history):
+    accuracy = per_round(history, "metrics_distributed", "accuracy")
+    bytes_up = per_round(history, "metrics_distributed_fit", "bytes_up")
+    fit_s = per_round(history, "metrics_distributed_fit", "t_total_mean")
+    return {
+        "bytes_up_per_round": statistics.mean(bytes_up.values()) if bytes_up else 0.0,
+        "fit_s": statistics.mean(fit_s.values()) if fit_s else None,
+        "final_accuracy": accuracy[max(accuracy)] if accuracy else None,
+        "best_accuracy": max(accuracy.values()) if accuracy else None,
+        "accuracy": accuracy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare low-rank fc1 updates with full updates")
+    parser.add_argument("-c", "--clients", type=int, default=4)
+    parser.add_argument("-r", "--rounds", type=int, default=10)
+    parser.add_argument("--ranks", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("-e", "--local-epochs", type=int, default=1)
+    parser.add_argument("-l", "--learning-rate", type=float, default=0.01)
+    parser.add_argument("--train-per-class", type=int, default=40, help="Synthetic images per class per client")
+    parser.add_argument("--test-per-class", type=int, default=10)
+    parser.add_argument("--data-root", default=None, help="Where to generate the data (default: a temp folder)")
+    parser.add_argument("--extra-args", default="", help="Extra simulation.py options for every run")
+    parser.add_argument("--timeout", type=float, default=3600, help="Seconds allowed per run")
+    parser.add_argument("-o", "--out", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    configs = [("full", [])] + [(f"rank{r}", ["--codec", "lowrank", "--rank", str(r)]) for r in args.ranks]
+    results = []
+    print(f"{'update':>8} {'MB up/round':>11} {'reduction':>9} {'fit s':>6} {'final acc':>9} {'best acc':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        data_root = make_dataset(args.data_root or workdir / "data", args.clients,
+                                 args.train_per_class, args.test_per_class)
+        for name, extra in configs:
+            summary = {"update": name, **summarize(run(name, extra, args, data_root, workdir))}
+            results.append(summary)
+            reduction = results[0]["bytes_up_per_round"] / summary["bytes_up_per_round"]
+            print(f"{name:>8} {summary['bytes_up_per_round'] / 1e6:11.2f} {reduction:8.1f}x "
+                  f"{summary['fit_s'] or 0:6.2f} {summary['final_accuracy'] or 0:9.3f} {summary['best_accuracy'] or 0:8.3f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"→ Wrote {len(results)} runs to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
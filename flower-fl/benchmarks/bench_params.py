@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the client parameter path for one round:
+  deserialize → set_parameters → get_parameters → serialize
+
+Compares the original path (torch.tensor per array + load_state_dict, then
+.cpu().numpy() per state_dict entry) with ParameterBridge, for the project CNN
+and a larger model. Each configuration runs in its own process, so the peak RSS
+reported belongs to that configuration alone.
+
+    python benchmarks/bench_params.py --rounds 20 --models cnn large
+"""
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import multiprocessing as mp
+import resource
+import time
+
+
+def build(name):
+    import torch.nn as nn
+    from common.models.cnn import build_model
+    if name == "cnn":
+        return build_model(num_classes=5)
+    # ~50M parameters (200 MB of float32 weights)
+    return nn.Sequential(*[nn.Linear(4096, 4096) for _ in range(3)])
+
+
+def run(model_name, mode, rounds):
+    import numpy as np
+    import torch
+    from flwr.common import ndarrays_to_parameters, parameters_to_ndarrays
+    from common.utils.params import ParameterBridge
+
+    model = build(model_name)
+    bridge = ParameterBridge(model)
+    # What the server would send: a fresh copy of the weights, serialized
+    incoming = ndarrays_to_parameters([a + 0.01 for a in bridge.to_numpy()])
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    timings = {"deserialize": 0.0, "set": 0.0, "get": 0.0, "serialize": 0.0}
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        arrays = parameters_to_ndarrays(incoming)
+        t1 = time.perf_counter()
+        if mode == "legacy":
+            state_dict = {k: torch.tensor(v) for k, v in zip(model.state_dict().keys(), arrays)}
+            model.load_state_dict(state_dict, strict=True)
+        else:
+            bridge.load(arrays)
+        t2 = time.perf_counter()
+        if mode == "legacy":
+            out = [v.cpu().numpy() for _, v in model.state_dict().items()]
+        else:
+            out = bridge.to_numpy()
+        t3 = time.perf_counter()
+        ndarrays_to_parameters(out)
+        t4 = time.perf_counter()
+        timings["deserialize"] += t1 - t0
+        timings["set"] += t2 - t1
+        timings["get"] += t3 - t2
+        timings["serialize"] += t4 - t3
+        del arrays, out
+
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    n_params = int(sum(a.size for a in bridge.to_numpy()))
+    per_round = {k: v / rounds * 1e3 for k, v in timings.items()}
+    # ru_maxrss is in KiB on Linux
+    return model_name, mode, n_params, per_round, rss_start / 1024, rss_peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark client parameter (de)serialization")
+    parser.add_argument("-r", "--rounds", type=int, default=20)
+    parser.add_argument("-m", "--models", nargs="+", default=["cnn", "large"], choices=["cnn", "large"])
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    print(f"{'model':6} {'mode':7} {'params':>11} {'deser ms':>9} {'set ms':>8} {'get ms':>8} "
+          f"{'ser ms':>8} {'total ms':>9} {'RSS MB':>8} {'peak MB':>8}")
+    for model_name in args.models:
+        for mode in ("legacy", "bridge"):
+            with ctx.Pool(1) as pool:
+                name, mode, n, t, rss0, rss1 = pool.apply(run, (model_name, mode, args.rounds))
+            print(f"{name:6} {mode:7} {n:11,d} {t['deserialize']:9.2f} {t['set']:8.2f} {t['get']:8.2f} "
+                  f"{t['serialize']:8.2f} {sum(t.values()):9.2f} {rss0:8.0f} {rss1:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
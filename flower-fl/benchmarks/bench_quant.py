@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Int8 evaluation benchmark: fp32 against static and dynamic int8 (see
+common/models/quant.py) on every client's test split of a synthetic dataset.
+
+A CNN is first trained for --epochs on the pooled training splits (or loaded
+with --model), so the accuracies mean something. Then, per client, the static
+model is calibrated on that client's own training split, as FLClient does with
+--int8-eval. Printed per mode, over all clients:
+
+  img/s        evaluation throughput (forward passes only)
+  speedup      over fp32
+  acc          mean accuracy; delta is the mean and worst change against fp32
+  agree        share of images where int8 and fp32 predict the same class
+  quantize s   time to calibrate and convert, paid once per global model
+  break-even   test images per client from which quantizing saves time
+
+    python benchmarks/bench_quant.py --clients 4 --epochs 15 --test-per-class 40
+"""
+import os
+import sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, os.path.join(ROOT, "server"))
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import torch
+import torch.nn.functional as F
+
+from common.models.cnn import build_model
+from common.models.quant import QUANT_MODES, calibration_batches, evaluate, quantize_cnn, split_loader
+from synthetic import make_dataset
+
+
+def train(model, loaders, epochs, lr):
+    """Plain SGD over every client's training split in turn."""
+    optimizer = torch.optim.SGD(model.parameters(), lr=lr)
+    model.train()
+    for _ in range(epochs):
+        for loader in loaders:
+            for x, y in loader:
+                optimizer.zero_grad()
+                F.cross_entropy(model(x), y).backward()
+                optimizer.step()
+    return model.eval()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark int8 evaluation against fp32")
+    parser.add_argument("-c", "--clients", type=int, default=4)
+    parser.add_argument("--epochs", type=int, default=5, help="Training epochs before the comparison")
+    parser.add_argument("-l", "--learning-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the model's initialisation and training order")
+    parser.add_argument("--model", default=None, help="best_model.npz to compare instead of training one")
+    parser.add_argument("--train-per-class", type=int, default=40, help="Synthetic images per class per client")
+    parser.add_argument("--test-per-class", type=int, default=40)
+    parser.add_argument("-b", "--batch-size", type=int, default=32, help="Evaluation batch size")
+    parser.add_argument("--calibration-batches", type=int, default=8)
+    parser.add_argument("--data-root", default=None, help="Where to generate the data (default: a temp folder)")
+    parser.add_argument("-o", "--out", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    torch.manual_seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_root = make_dataset(args.data_root or Path(tmp) / "data", args.clients,
+                                 args.train_per_class, args.test_per_class)
+        clients = [data_root / f"client_{i}" for i in range(1, args.clients + 1)]
+        train_loaders = [split_loader(c / "train", 32, shuffle=True) for c in clients]
+        test_loaders = [split_loader(c / "test", args.batch_size) for c in clients]
+        if args.model:
+            from serve import load_model
+            model, _ = load_model(args.model)
+        else:
+            start = time.perf_counter()
+            model = train(build_model(), train_loaders, args.epochs, args.learning_rate)
+            print(f"→ Trained the CNN for {args.epochs} epochs in {time.perf_counter() - start:.1f}s")
+
+        runs = {"fp32": [], **{mode: [] for mode in QUANT_MODES}}
+        for train_loader, test_loader in zip(train_loaders, test_loaders):
+            fp32_acc, fp32_pred, fp32_s = evaluate(model, test_loader)
+            runs["fp32"].append({"images": len(fp32_pred), "accuracy": fp32_acc, "seconds": fp32_s,
+                                 "agreement": 1.0, "quantize_s": 0.0})
+            calibration = calibration_batches(train_loader, args.calibration_batches)
+            for mode in QUANT_MODES:
+                start = time.perf_counter()
+                quantized = quantize_cnn(model, mode, calibration)
+                quantize_s = time.perf_counter() - start
+                evaluate(quantized, [next(iter(test_loader))])  # Warm-up
+                acc, pred, seconds = evaluate(quantized, test_loader)
+                runs[mode].append({"images": len(pred), "accuracy": acc, "seconds": seconds,
+                                   "agreement": float((pred == fp32_pred).float().mean()),
+                                   "quantize_s": quantize_s, "delta": acc - fp32_acc})
+
+    fp32_rate = sum(r["images"] for r in runs["fp32"]) / sum(r["seconds"] for r in runs["fp32"])
+    print(f"{'mode':>8} {'img/s':>8} {'speedup':>7} {'acc':>6} {'delta':>7} {'worst':>7} {'agree':>6} "
+          f"{'quantize s':>10} {'break-even':>10}")
+    summary = []
+    for mode, results in runs.items():
+        rate = sum(r["images"] for r in results) / sum(r["seconds"] for r in results)
+        deltas = [r.get("delta", 0.0) for r in results]
+        quantize_s = statistics.mean(r["quantize_s"] for r in results)
+        saved = 1 / fp32_rate - 1 / rate  # Seconds saved per image
+        break_even = quantize_s / saved if mode != "fp32" and saved > 0 else None
+        row = {"mode": mode, "images_per_s": rate, "speedup": rate / fp32_rate,
+               "accuracy": statistics.mean(r["accuracy"] for r in results),
+               "delta": statistics.mean(deltas), "worst_delta": min(deltas),
+               "agreement": statistics.mean(r["agreement"] for r in results),
+               "quantize_s": quantize_s, "break_even_images": break_even, "clients": results}
+        summary.append(row)
+        print(f"{mode:>8} {rate:8.0f} {row['speedup']:6.1f}x {row['accuracy']:6.3f} {row['delta']:+7.3f} "
+              f"{row['worst_delta']:+7.3f} {row['agreement']:6.3f} {quantize_s:10.3f} "
+              + (f"{break_even:10.0f}" if break_even is not None else f"{'-':>10}"))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(summary, f, indent=1)
+        print(f"→ Wrote {len(summary)} modes to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+End-to-end round benchmark: the real server.py against K client_v2.py processes
+over loopback, on synthetic data from benchmarks/synthetic.py.
+
+Every combination of --clients, --hidden-units, --batch-size and --strategy is
+one run. For each run the per-round medians below are printed, and all runs
+(with their per-round values) are written to --out as JSON:
+
+  round_s                      fit round + evaluate round, server wall time
+  fit_round_s / eval_round_s   the two halves
+  fit_s / eval_s               mean client time inside fit() / evaluate()
+  aggregate_s                  server time folding updates into the new model
+  bytes_down / bytes_up        model payload per fit round, all clients
+  server_peak_mb / client_peak_mb   peak resident memory of the server / largest client
+                               process, each counted from its own start
+
+    python benchmarks/bench_rounds.py --clients 2 4 --hidden-units 128 512 --rounds 3 --out rounds.json
+"""
+import os
+import sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import argparse
+import itertools
+import json
+import platform
+import shlex
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import make_dataset
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, proc, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited before accepting connections")
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise TimeoutError(f"server did not listen on port {port} within {timeout:.0f}s")
+
+
+def per_round(history, key, name):
+    """{round: value} of metric `name` from one metrics section of a saved history."""
+    return {rnd: value for rnd, value in history[key].get(name, [])}
+
+
+def summarize(history, rounds):
+    """Per-round measurements of one run, and their medians."""
+    fit = {name: per_round(history, "metrics_distributed_fit", name)
+           for name in ("round_s", "aggregate_s", "bytes_down", "bytes_up", "t_total_mean", "peak_mem_mb_max")}
+    ev = {name: per_round(history, "metrics_distributed", name)
+          for name in ("round_s", "t_total_mean", "peak_mem_mb_max")}
+    table = []
+    for rnd in range(1, rounds + 1):
+        row = {
+            "round": rnd,
+            "fit_round_s": fit["round_s"].get(rnd),
+            "eval_round_s": ev["round_s"].get(rnd),
+            "fit_s": fit["t_total_mean"].get(rnd),
+            "eval_s": ev["t_total_mean"].get(rnd),
+            "aggregate_s": fit["aggregate_s"].get(rnd),
+            "bytes_down": fit["bytes_down"].get(rnd),
+            "bytes_up": fit["bytes_up"].get(rnd),
+            "client_peak_mb": max(fit["peak_mem_mb_max"].get(rnd, 0.0), ev["peak_mem_mb_max"].get(rnd, 0.0)),
+        }
+        if row["fit_round_s"] is not None and row["eval_round_s"] is not None:
+            row["round_s"] = row["fit_round_s"] + row["eval_round_s"]
+        table.append(row)
+    summary = {}
+    for name in ("round_s", "fit_round_s", "eval_round_s", "fit_s", "eval_s", "aggregate_s", "bytes_down", "bytes_up"):
+        values = [row[name] for row in table if row.get(name) is not None]
+        summary[name] = statistics.median(values) if values else None
+    summary["client_peak_mb"] = max(row["client_peak_mb"] for row in table)
+    summary["server_peak_mb"] = history.get("server_peak_mem_mb")
+    if history["losses_distributed"]:
+        summary["final_loss"] = history["losses_distributed"][-1][1]
+    return summary, table
+
+
+def run(params, data_root, workdir, rounds, server_args, client_args, timeout):
+    """Run server.py and K clients once; return the parsed history JSON."""
+    port = free_port()
+    tag = "_".join(f"{k}{v}" for k, v in params.items())
+    history_path = workdir / f"history_{tag}.json"
+    logs = []
+
+    def launch(script, args, log_name):
+        log = open(workdir / log_name, "w")
+        logs.append(log)
+        # Run from the scratch folder so best_model.npz and traces land there
+        return subprocess.Popen([sys.executable, os.path.join(ROOT, script), *args],
+                                cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+
+    server = launch("server/server.py", [
+        "-p", str(port), "-r", str(rounds), "-m", params["strategy"],
+        "--hidden-units", str(params["hidden_units"]), "--min-clients", str(params["clients"]),
+        "--history-json", str(history_path), *server_args,
+    ], f"server_{tag}.log")
+    clients = []
+    try:
+        wait_for_port(port, server)
+        for cid in range(1, params["clients"] + 1):
+            clients.append(launch("client/client_v2.py", [
+                "-c", str(cid), "-s", f"127.0.0.1:{port}", "--data-root", str(data_root),
+                "--hidden-units", str(params["hidden_units"]), "-b", str(params["batch_size"]), *client_args,
+            ], f"client{cid}_{tag}.log"))
+        server.wait(timeout=timeout)
+        for c in clients:
+            c.wait(timeout=60)
+    finally:
+        for p in [server, *clients]:
+            if p.poll() is None:
+                p.kill()
+        for log in logs:
+            log.close()
+    if server.returncode != 0 or not history_path.exists():
+        log_tail = (workdir / f"server_{tag}.log").read_text().splitlines()[-20:]
+        raise RuntimeError(f"run {tag} failed:\n" + "\n".join(log_tail))
+    return json.loads(history_path.read_text())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark federated rounds end to end over loopback")
+    parser.add_argument("-c", "--clients", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--hidden-units", type=int, nargs="+", default=[128], help="Model size (fc1 width)")
+    parser.add_argument("-b", "--batch-size", type=int, nargs="+", default=[32])
+    parser.add_argument("-m", "--strategy", nargs="+", default=["FedAvg"])
+    parser.add_argument("-r", "--rounds", type=int, default=3)
+    parser.add_argument("--train-per-class", type=int, default=40, help="Synthetic images per class per client")
+    parser.add_argument("--test-per-class", type=int, default=10)
+    parser.add_argument("--data-root", default=None, help="Where to generate the data (default: a temp folder)")
+    parser.add_argument("--server-args", default="", help="Extra server.py options, e.g. \"--codec int8\"")
+    parser.add_argument("--client-args", default="", help="Extra client_v2.py options, e.g. \"--cache\"")
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds allowed per run")
+    parser.add_argument("-o", "--out", default="bench_rounds.json")
+    args = parser.parse_args()
+
+    results = {
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "rounds": args.rounds,
+        "server_args": args.server_args,
+        "client_args": args.client_args,
+        "runs": [],
+    }
+    columns = ("round_s", "fit_round_s", "eval_round_s", "fit_s", "eval_s", "aggregate_s")
+    print(f"{'clients':>7} {'hidden':>6} {'batch':>5} {'strategy':9} "
+          + " ".join(f"{c:>12}" for c in columns) + f" {'MB down':>8} {'MB up':>7} {'srv MB':>7} {'cli MB':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for clients, hidden, batch, strategy in itertools.product(
+            args.clients, args.hidden_units, args.batch_size, args.strategy
+        ):
+            data_root = make_dataset(args.data_root or workdir / "data", max(args.clients),
+                                     args.train_per_class, args.test_per_class)
+            params = {"clients": clients, "hidden_units": hidden, "batch_size": batch, "strategy": strategy}
+            history = run(params, data_root, workdir, args.rounds,
+                          shlex.split(args.server_args), shlex.split(args.client_args), args.timeout)
+            summary, table = summarize(history, args.rounds)
+            results["runs"].append({**params, "summary": summary, "per_round": table})
+            fmt = lambda v: f"{v:12.3f}" if v is not None else f"{'-':>12}"
+            print(f"{clients:7d} {hidden:6d} {batch:5d} {strategy:9} "
+                  + " ".join(fmt(summary[c]) for c in columns)
+                  + f" {(summary['bytes_down'] or 0) / 1e6:8.2f} {(summary['bytes_up'] or 0) / 1e6:7.2f}"
+                  + f" {summary['server_peak_mb'] or 0:7.0f} {summary['client_peak_mb']:7.0f}")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"→ Wrote {len(results['runs'])} runs to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Load generator for serve.py. For every combination of --batch-sizes and
+--waits-ms it starts serve.py on a model file, keeps --concurrency clients
+(threads with keep-alive connections) posting synthetic screenshots for
+--duration seconds, and prints throughput, latency percentiles, the mean batch
+the server formed and the number of failed requests. With --reload-every the
+model file is rewritten during each run, so the failed count shows whether
+reloads drop requests.
+
+    python benchmarks/bench_serve.py --batch-sizes 1 8 32 --waits-ms 0 2 10 --concurrency 16
+"""
+import os
+import sys
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, os.path.join(ROOT, "server"))
+
+import argparse
+import http.client
+import io
+import itertools
+import json
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench_rounds import free_port, wait_for_port
+from checkpoint import atomic_savez
+from common.models.spec import cnn_spec, init_parameters
+from synthetic import make_image
+
+
+def save_model(path, seed):
+    """A freshly initialised CNN in best_model.npz format."""
+    atomic_savez(path, *init_parameters(cnn_spec(), seed), metadata={"round": seed, "loss": 0.0})
+
+
+def make_images(n, seed=0):
+    """`n` PNG-encoded synthetic screenshots."""
+    rng = np.random.default_rng(seed)
+    images = []
+    for i in range(n):
+        buf = io.BytesIO()
+        make_image(i % 5, rng).save(buf, format="PNG")
+        images.append(buf.getvalue())
+    return images
+
+
+def post(conn, image):
+    """POST one image on `conn`; True if it was classified."""
+    try:
+        conn.request("POST", "/predict", body=image, headers={"Content-Type": "application/octet-stream"})
+        response = conn.getresponse()
+        response.read()
+        return response.status == 200
+    except (OSError, http.client.HTTPException):
+        conn.close()  # Reconnects on the next request
+        return False
+
+
+def client(port, images, stop, latencies, errors):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    for image in itertools.cycle(images):
+        if stop.is_set():
+            break
+        start = time.perf_counter()
+        if post(conn, image):
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(1)
+    conn.close()
+
+
+def health(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", "/health")
+    out = json.loads(conn.getresponse().read())
+    conn.close()
+    return out
+
+
+def run(batch_size, wait_ms, args, model_path, images, workdir):
+    """One load run against a fresh serve.py; return its summary."""
+    port = free_port()
+    log = open(workdir / f"serve_{batch_size}_{wait_ms}.log", "w")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "serve.py"), "--model", str(model_path), "-p", str(port),
+         "--max-batch-size", str(batch_size), "--max-wait-ms", str(wait_ms), "--reload-interval", "0.2"],
+        stdout=log, stderr=subprocess.STDOUT,
+    )
+    try:
+        wait_for_port(port, server)
+        # Warm-up, so the first batches do not count
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        for image in images[:8]:
+            post(conn, image)
+        conn.close()
+        before = health(port)
+        stop = threading.Event()
+        latencies, errors = [], []
+        threads = [threading.Thread(target=client, args=(port, images, stop, latencies, errors))
+                   for _ in range(args.concurrency)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        seed = 1
+        while time.perf_counter() - start < args.duration:
+            time.sleep(args.reload_every or args.duration)
+            if args.reload_every and time.perf_counter() - start < args.duration:
+                seed += 1
+                save_model(model_path, seed)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        after = health(port)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        log.close()
+    batches = after["batches"] - before["batches"]
+    p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000).tolist() if latencies else [float("nan")] * 3
+    return {
+        "batch_size": batch_size, "wait_ms": wait_ms, "requests": len(latencies), "errors": len(errors),
+        "throughput": len(latencies) / elapsed, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+        "mean_batch": (after["requests"] - before["requests"]) / batches if batches else 0.0,
+        "reloads": after["reloads"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and tail latency of serve.py under load")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--waits-ms", type=float, nargs="+", default=[0, 2, 10])
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="Clients posting at once")
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="Seconds of load per setting")
+    parser.add_argument("--reload-every", type=float, default=0.0,
+                        help="Rewrite the model file every this many seconds during each run (0: never)")
+    parser.add_argument("--model", default=None, help="Model file to serve (default: a random CNN)")
+    parser.add_argument("-o", "--out", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    images = make_images(64)
+    results = []
+    print(f"{'batch':>5} {'wait ms':>7} {'req/s':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} "
+          f"{'mean batch':>10} {'failed':>6} {'reloads':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        model_path = workdir / "best_model.npz"
+        if args.model:
+            model_path.write_bytes(Path(args.model).read_bytes())
+        for batch_size, wait_ms in itertools.product(args.batch_sizes, args.waits_ms):
+            if not args.model:
+                save_model(model_path, 0)
+            r = run(batch_size, wait_ms, args, model_path, images, workdir)
+            results.append(r)
+            print(f"{batch_size:5d} {wait_ms:7g} {r['throughput']:7.0f} {r['p50_ms']:7.1f} {r['p95_ms']:7.1f} "
+                  f"{r['p99_ms']:7.1f} {r['mean_batch']:10.1f} {r['errors']:6d} {r['reloads']:7d}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"→ Wrote {len(results)} runs to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
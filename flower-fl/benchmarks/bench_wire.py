@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the wire formats of Parameters (see common/utils/wire.py):
+Flower's default (np.save per array) against the packed buffer, with and
+without checksums, for the CNN at each --hidden-units (128: the project CNN,
+0.5M parameters; 2440: 10M; 24400: 100M). Printed per format, as the median
+over --repeat runs:
+
+  encode ms       arrays → Parameters
+  decode ms       Parameters → arrays
+  +copy ms        decode, then copy into preallocated float32 weights, as
+                  ParameterBridge.load does on a client
+  enc/dec MB      peak memory allocated while encoding / decoding (tracemalloc),
+                  on top of the arrays and Parameters that already exist
+  wire MB         bytes on the wire
+
+    python benchmarks/bench_wire.py --hidden-units 128 2440 24400 --repeat 5
+"""
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+from flwr.common import ndarrays_to_parameters, parameters_to_ndarrays
+
+from common.models.spec import cnn_spec, init_parameters
+from common.utils.wire import from_parameters, to_parameters
+
+FORMATS = {
+    "numpy": (ndarrays_to_parameters, parameters_to_ndarrays),
+    "packed": (lambda arrays: to_parameters(arrays, "packed"), from_parameters),
+    "packed+crc": (lambda arrays: to_parameters(arrays, "packed", checksum=True), from_parameters),
+}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - start) * 1e3
+
+
+def peak_mb(fn, *args):
+    """Peak memory allocated while `fn` runs, in MB; its result is dropped first."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    out = fn(*args)
+    del out
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def run(arrays, encode, decode, repeat):
+    targets = [np.empty(a.shape, dtype=np.float32) for a in arrays]
+    enc, dec, copy = [], [], []
+    for _ in range(repeat):
+        params, ms = timed(encode, arrays)
+        enc.append(ms)
+        _, ms = timed(decode, params)
+        dec.append(ms)
+        start = time.perf_counter()
+        for target, a in zip(targets, decode(params)):
+            np.copyto(target, a)
+        copy.append((time.perf_counter() - start) * 1e3)
+    return {
+        "encode_ms": statistics.median(enc),
+        "decode_ms": statistics.median(dec),
+        "decode_copy_ms": statistics.median(copy),
+        "encode_peak_mb": peak_mb(encode, arrays),
+        "decode_peak_mb": peak_mb(decode, params),
+        "wire_mb": sum(len(t) for t in params.tensors) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Parameters wire formats")
+    parser.add_argument("--hidden-units", type=int, nargs="+", default=[128, 2440, 24400],
+                        help="fc1 widths of the CNNs to serialize")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("-o", "--out", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'params':>11} {'format':>10} {'encode ms':>9} {'decode ms':>9} {'+copy ms':>8} "
+          f"{'enc MB':>7} {'dec MB':>7} {'wire MB':>8}")
+    for hidden_units in args.hidden_units:
+        arrays = init_parameters(cnn_spec(hidden_units=hidden_units), seed=0)
+        n_params = int(sum(a.size for a in arrays))
+        for name, (encode, decode) in FORMATS.items():
+            r = {"params": n_params, "format": name, **run(arrays, encode, decode, args.repeat)}
+            results.append(r)
+            print(f"{n_params:11,d} {name:>10} {r['encode_ms']:9.2f} {r['decode_ms']:9.3f} "
+                  f"{r['decode_copy_ms']:8.2f} {r['encode_peak_mb']:7.1f} {r['decode_peak_mb']:7.1f} "
+                  f"{r['wire_mb']:8.2f}")
+        del arrays
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=1)
+        print(f"→ Wrote {len(results)} results to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Synthetic screenshot-like datasets in the layout load_client_data expects:
+
+    <root>/client_<ID>/{train,test}/<class in CLASS_NAMES>/<n>.jpg
+
+Each class has its own background colour and arrangement of blocks (rows of
+"text", tiles, columns, ...) under per-image noise, so the CNN has something to
+learn and the numbers come out the same on every machine for a given seed.
+
+    python benchmarks/synthetic.py --root /tmp/synth --clients 4 --train-per-class 40
+"""
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from common.utils.data import CLASS_NAMES
+
+# Background colour per class, RGB
+PALETTE = [(235, 210, 180), (30, 30, 40), (250, 250, 245), (90, 140, 90), (245, 245, 255)]
+
+
+def make_image(class_index: int, rng, size: int = 64) -> Image.Image:
+    """One size×size screenshot-like image of the given class."""
+    base = np.array(PALETTE[class_index % len(PALETTE)], dtype=np.float32)
+    img = np.empty((size, size, 3), dtype=np.float32)
+    img[...] = base + rng.normal(0, 12, 3)
+    ink = 255 - base
+    layout = class_index % 5
+    for _ in range(rng.integers(3, 8)):
+        if layout == 0:    # Wide bars: paragraphs of text
+            h, w = rng.integers(2, 4), rng.integers(size // 3, size)
+        elif layout == 1:  # Tall narrow blocks: posters
+            h, w = rng.integers(size // 3, size // 2), rng.integers(size // 8, size // 5)
+        elif layout == 2:  # Short lines: notes
+            h, w = 1, rng.integers(size // 4, size // 2)
+        elif layout == 3:  # Large patches: photos
+            h, w = rng.integers(size // 4, size // 2), rng.integers(size // 4, size // 2)
+        else:              # Small tiles: product grids
+            h = w = rng.integers(size // 8, size // 5)
+        y, x = rng.integers(0, size - h + 1), rng.integers(0, size - w + 1)
+        img[y:y + h, x:x + w] = ink * rng.uniform(0.5, 1.0) + rng.normal(0, 10, 3)
+    img += rng.normal(0, 6, img.shape)
+    return Image.fromarray(np.clip(img, 0, 255).astype(np.uint8))
+
+
+def make_dataset(root, num_clients: int, train_per_class: int = 40, test_per_class: int = 10,
+                 size: int = 64, seed: int = 0) -> Path:
+    """
+    Write client_1 … client_<num_clients> under `root` and return it. A dataset
+    already generated there with the same settings is reused.
+    """
+    root = Path(root)
+    spec = {"clients": num_clients, "train_per_class": train_per_class,
+            "test_per_class": test_per_class, "size": size, "seed": seed, "classes": CLASS_NAMES}
+    spec_path = root / "synthetic.json"
+    if spec_path.exists():
+        if json.loads(spec_path.read_text()) == spec:
+            return root
+        # Generated here before with other settings: start over
+        spec_path.unlink()
+        for folder in root.glob("client_*"):
+            shutil.rmtree(folder)
+
+    for client_id in range(1, num_clients + 1):
+        rng = np.random.default_rng([seed, client_id])
+        for split, per_class in (("train", train_per_class), ("test", test_per_class)):
+            for class_index, name in enumerate(CLASS_NAMES):
+                folder = root / f"client_{client_id}" / split / name
+                folder.mkdir(parents=True, exist_ok=True)
+                for n in range(per_class):
+                    make_image(class_index, rng, size).save(folder / f"{n}.jpg", quality=90)
+    spec_path.write_text(json.dumps(spec))
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic client datasets")
+    parser.add_argument("--root", required=True, help="Output folder (use as --data-root)")
+    parser.add_argument("-c", "--clients", type=int, default=4)
+    parser.add_argument("--train-per-class", type=int, default=40)
+    parser.add_argument("--test-per-class", type=int, default=10)
+    parser.add_argument("--size", type=int, default=64, help="Image side in pixels")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    root = make_dataset(args.root, args.clients, args.train_per_class, args.test_per_class, args.size, args.seed)
+    print(f"→ Wrote {args.clients} synthetic clients to {root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,71 +6,131 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import argparse
+import time
 import flwr as fl
 import torch
 import numpy as np
 
 from common.models.cnn import build_model
-from common.utils.data import load_client_data
+from common.utils.data import TimedLoader, load_client_data
+from common.utils.params import ParameterBridge
+from common.utils.profiling import PhaseTimer, peak_memory_mb, torch_trace
+from common.utils.wire import PackedClient
 
 # Device configuration
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 class FLClient(fl.client.NumPyClient):
-    def __init__(self, model, train_loader, test_loader):
+    def __init__(self, model, train_loader, test_loader, cid=None, profile_round=None):
         self.model = model.to(DEVICE)
-        self.train_loader = train_loader
-        self.test_loader = test_loader
+        # NumPy views of the model's weights, reused every round
+        self.params = ParameterBridge(self.model)
+        # Wrapped so each round can report how long training waited on data
+        self.train_loader = TimedLoader(train_loader)
+        self.test_loader = TimedLoader(test_loader)
+        self.cid = cid
+        self.profile_round = profile_round  # Server round to record a torch.profiler trace for
 
     # Accept the `config` argument to match Flower's expected signature
     def get_parameters(self, config):
-        params = [val.cpu().numpy() for _, val in self.model.state_dict().items()]
-        print("→ get_parameters(): sending", params)
+        params = self.params.to_numpy()
+        print(f"→ get_parameters(): sending {len(params)} arrays")
         return params
 
     def set_parameters(self, parameters):
-        state_dict = {
-            k: torch.tensor(v)
-            for k, v in zip(self.model.state_dict().keys(), parameters)
+        # Copy straight into the existing tensors, no intermediate state_dict
+        self.params.load(parameters)
+
+    def _profile_metrics(self, timer, start, samples, loop_time):
+        """Per-phase timings plus throughput and memory, as Flower metrics."""
+        return {
+            **timer.metrics(),
+            "t_total": time.perf_counter() - start,
+            "samples_per_s": samples / loop_time if loop_time > 0 else 0.0,
+            "peak_mem_mb": peak_memory_mb(),
+            "cid": str(self.cid),
         }
-        self.model.load_state_dict(state_dict, strict=True)
 
     def fit(self, parameters, config):
-        print("→ fit(): received", parameters, "with config", config)
-        self.set_parameters(parameters)
+        # Summaries only: printing whole parameter arrays every round is itself slow
+        print(f"→ fit(): received {len(parameters)} arrays with config {config}")
+        start = time.perf_counter()
+        timer = PhaseTimer(sync_cuda=DEVICE.type == "cuda")
+        with timer.phase("decode"):
+            self.set_parameters(parameters)
         self.model.train()
         optimizer = torch.optim.SGD(self.model.parameters(), lr=config.get("lr", 0.01))
         epochs = int(config.get("local_epochs", 1))
-        for _ in range(epochs):
-            for x, y in self.train_loader:
-                x, y = x.to(DEVICE), y.to(DEVICE)
-                optimizer.zero_grad()
-                outputs = self.model(x)
-                loss = torch.nn.functional.cross_entropy(outputs, y)
-                loss.backward()
-                optimizer.step()
+        rnd = int(config.get("server_round", 0))
+        # Seconds until this fit should return, counted from its start (0 = no deadline)
+        budget = float(config.get("time_budget", 0.0))
+        self.train_loader.reset()
+        samples = 0
+        out_of_time = False
+        trace = torch_trace(rnd == self.profile_round, f"trace_client{self.cid}_round{rnd}.json")
+        with trace:
+            for _ in range(epochs):
+                if out_of_time:
+                    break
+                for x, y in self.train_loader:
+                    with timer.phase("data"):
+                        x, y = x.to(DEVICE), y.to(DEVICE)
+                    with timer.phase("forward"):
+                        outputs = self.model(x)
+                        loss = torch.nn.functional.cross_entropy(outputs, y)
+                    with timer.phase("backward"):
+                        optimizer.zero_grad()
+                        loss.backward()
+                    with timer.phase("step"):
+                        optimizer.step()
+                    samples += y.size(0)
+                    if budget and time.perf_counter() - start >= budget:
+                        out_of_time = True
+                        break
 
-        new_params = [val.cpu().numpy() for _, val in self.model.state_dict().items()]
-        print("→ fit(): returning", new_params)
-        return new_params, len(self.train_loader.dataset), {}
+        data_wait = self.train_loader.wait_time
+        timer.add("data", data_wait)
+        print(f"→ fit(): waited {data_wait:.2f}s on data over {self.train_loader.batches} batches")
+        with timer.phase("encode"):
+            new_params = self.params.to_numpy()
+        loop_time = sum(timer.totals.get(k, 0.0) for k in ("data", "forward", "backward", "step"))
+        metrics = {
+            "data_wait_s": data_wait,
+            "samples": samples,
+            "out_of_time": out_of_time,
+            **self._profile_metrics(timer, start, samples, loop_time),
+        }
+        print(f"→ fit(): returning {len(new_params)} arrays after {metrics['t_total']:.2f}s")
+        # Under a deadline the update is weighted by the work actually done
+        num_examples = samples if budget else len(self.train_loader.dataset)
+        return new_params, num_examples, metrics
 
     def evaluate(self, parameters, config):
-        print("→ evaluate(): received", parameters)
-        self.set_parameters(parameters)
+        print(f"→ evaluate(): received {len(parameters)} arrays")
+        start = time.perf_counter()
+        timer = PhaseTimer(sync_cuda=DEVICE.type == "cuda")
+        with timer.phase("decode"):
+            self.set_parameters(parameters)
         self.model.eval()
+        self.test_loader.reset()
         loss, correct, total = 0.0, 0, 0
         with torch.no_grad():
             for x, y in self.test_loader:
-                x, y = x.to(DEVICE), y.to(DEVICE)
-                outputs = self.model(x)
-                loss += float(torch.nn.functional.cross_entropy(outputs, y, reduction="sum"))
-                _, preds = outputs.max(1)
+                with timer.phase("data"):
+                    x, y = x.to(DEVICE), y.to(DEVICE)
+                with timer.phase("forward"):
+                    outputs = self.model(x)
+                    loss += float(torch.nn.functional.cross_entropy(outputs, y, reduction="sum"))
+                    _, preds = outputs.max(1)
+                    correct += (preds == y).sum().item()
                 total += y.size(0)
-                correct += (preds == y).sum().item()
+        timer.add("data", self.test_loader.wait_time)
         loss /= total
         accuracy = correct / total
         print(f"→ evaluate(): loss={loss:.4f}, accuracy={accuracy:.4f}")
-        return float(loss), total, {"accuracy": accuracy}
+        loop_time = timer.totals.get("data", 0.0) + timer.totals.get("forward", 0.0)
+        metrics = {"accuracy": accuracy, **self._profile_metrics(timer, start, total, loop_time)}
+        return float(loss), total, metrics
 
 
 def main():
@@ -87,19 +147,56 @@ def main():
         "-nc", "--num-classes", type=int, default=5,
         help="Number of classes in the dataset"
     )
+    parser.add_argument(
+        "--cache", action="store_true",
+        help="Decode images once into a memory-mapped cache and train from it"
+    )
+    parser.add_argument(
+        "--num-workers", type=int, default=0,
+        help="DataLoader worker processes (0 = load in the training process)"
+    )
+    parser.add_argument(
+        "--prefetch-factor", type=int, default=None,
+        help="Batches each worker loads ahead (requires --num-workers > 0)"
+    )
+    parser.add_argument(
+        "--persistent-workers", action="store_true",
+        help="Keep DataLoader workers alive across rounds"
+    )
+    parser.add_argument(
+        "--pin-memory", action="store_true",
+        help="Use pinned host memory for faster host-to-GPU copies"
+    )
+    parser.add_argument(
+        "--auto-workers", action="store_true",
+        help="Probe this machine and pick the fastest --num-workers"
+    )
+    parser.add_argument(
+        "--profile-round", type=int, default=None,
+        help="Save a torch.profiler trace of fit() in this server round"
+    )
     args = parser.parse_args()
 
     # Build the model for the specified number of classes
     model = build_model(num_classes=args.num_classes)
     # Load this client's train/test data
-    train_loader, test_loader = load_client_data(client_id=args.client_id)
+    train_loader, test_loader = load_client_data(
+        client_id=args.client_id,
+        cache=args.cache,
+        num_workers=args.num_workers,
+        pin_memory=args.pin_memory,
+        persistent_workers=args.persistent_workers,
+        prefetch_factor=args.prefetch_factor,
+        auto_workers=args.auto_workers,
+    )
 
     # Start the Flower client
-    client = FLClient(model, train_loader, test_loader)
+    client = FLClient(model, train_loader, test_loader, cid=args.client_id, profile_round=args.profile_round)
     print(f"Connecting to Flower server at {args.server_address}")
-    fl.client.start_numpy_client(
+    # Reads and answers both Flower's default and the packed wire format (see server.py --wire)
+    fl.client.start_client(
         server_address=args.server_address,
-        client=client,
+        client=PackedClient(client),
     )
 
 if __name__ == "__main__":
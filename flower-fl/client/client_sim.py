@@ -1,10 +1,17 @@
 #!/usr/bin/env python3
+import os
+import sys
+# Ensure the project root is on PYTHONPATH so we can import common/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 import flwr as fl
 import numpy as np
 import argparse
 
+from common.utils.wire import PackedClient
+
 class DummyClient(fl.client.NumPyClient):
-    def get_parameters(self):
+    def get_parameters(self, config):
         # Send a 2×2 “parameter matrix” of random floats
         params = [np.random.randn(2, 2).astype(np.float32)]
         print("→ get_parameters(): sending", params)
@@ -37,9 +44,10 @@ def main():
 
     client = DummyClient()
     print("Connecting to server at", args.server)
-    fl.client.start_numpy_client(
+    # Reads and answers both Flower's default and the packed wire format (see server.py --wire)
+    fl.client.start_client(
         server_address=args.server,
-        client=client,
+        client=PackedClient(client),
     )
 
 if __name__ == "__main__":
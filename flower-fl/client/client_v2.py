@@ -1,70 +1,188 @@
 #!/usr/bin/env python3
 import os
 import sys
+import time
 import argparse
+from contextlib import nullcontext
 import flwr as fl
+import numpy as np
 import torch
 
 # Allow imports from project root
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from common.models.cnn import build_model
-from common.utils.data import load_client_data
+from common.models.cnn import build_model, low_rank_factors, merge_factors, set_rank
+from common.models.quant import QUANT_MODES, calibration_batches, quantize_cnn
+from common.utils.codec import encode_update, nbytes
+from common.utils.data import TimedLoader, load_client_data
+from common.utils.fastcpu import FastCPU, set_threads
+from common.utils.params import ParameterBridge
+from common.utils.profiling import PhaseTimer, peak_memory_mb, torch_trace
+from common.utils.versions import VersionCache
+from common.utils.wire import PackedClient
 
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 class FLClient(fl.client.NumPyClient):
-    def __init__(self, model, train_loader, test_loader, cid):
+    def __init__(self, model, train_loader, test_loader, cid, profile_round=None, fast=None, model_cache=3,
+                 int8_eval=None, calibration_size=8):
         self.model = model.to(DEVICE)
-        self.train_loader = train_loader
-        self.test_loader = test_loader
+        # Execution settings of the loops (see common/utils/fastcpu.py); plain eager by default
+        self.fast = fast or FastCPU(self.model)
+        # NumPy views of the model's weights, reused every round
+        self.params = ParameterBridge(self.model)
+        # Wrapped so each round can report how long training waited on data
+        self.train_loader = TimedLoader(train_loader)
+        self.test_loader = TimedLoader(test_loader)
         self.cid = cid
+        self.residual = None  # Top-k error feedback: update entries not sent yet
+        self.profile_round = profile_round  # Server round to record a torch.profiler trace for
+        # Recent global models by version hash, so the server can skip or delta-encode them
+        self.versions = VersionCache(model_cache)
+        # Evaluate an int8 copy of each global model ("static" / "dynamic", see common/models/quant.py)
+        self.int8_eval = int8_eval
+        self.calibration_size = calibration_size  # Training batches calibrating static int8
+        self.calibration = None
 
     def get_parameters(self, config):
-        return [v.cpu().numpy() for _, v in self.model.state_dict().items()]
+        return self.params.to_numpy()
 
     def set_parameters(self, parameters):
-        state_dict = {
-            k: torch.tensor(v)
-            for k, v in zip(self.model.state_dict().keys(), parameters)
+        # Copy straight into the existing tensors, no intermediate state_dict
+        self.params.load(parameters)
+
+    def _profile_metrics(self, timer, start, samples, loop_time):
+        """Per-phase timings plus throughput and memory, as Flower metrics."""
+        return {
+            **timer.metrics(),
+            "t_total": time.perf_counter() - start,
+            "samples_per_s": samples / loop_time if loop_time > 0 else 0.0,
+            "peak_mem_mb": peak_memory_mb(),
+            "cid": str(self.cid),
+            **self.fast.metrics(),
+            **({"model_versions": ",".join(self.versions.versions())} if len(self.versions) else {}),
         }
-        self.model.load_state_dict(state_dict, strict=True)
 
     def fit(self, parameters, config):
-        self.set_parameters(parameters)
+        start = time.perf_counter()
+        timer = PhaseTimer(sync_cuda=DEVICE.type == "cuda")
+        with timer.phase("decode"):
+            # Deltas below are taken against the full global model, however it was sent
+            parameters = self.versions.resolve(parameters, config)
+            self.set_parameters(parameters)
+            if "rank" in config:
+                # Train a fresh rank-r update of fc1 this round (0: the full layer)
+                set_rank(self.model, int(config["rank"]))
         epochs = int(config.get("local_epochs", 1))
         lr = float(config.get("lr", 0.01))
+        rnd = int(config.get("server_round", 0))
+        # Seconds until this fit should return, counted from its start (0 = no deadline)
+        budget = float(config.get("time_budget", 0.0))
         print(f"→ Client {self.cid}: training {epochs} epochs on {len(self.train_loader.dataset)} samples (lr={lr})")
         optimizer = torch.optim.SGD(self.model.parameters(), lr=lr)
         self.model.train()
-        for _ in range(epochs):
-            for x, y in self.train_loader:
-                x, y = x.to(DEVICE), y.to(DEVICE)
-                optimizer.zero_grad()
-                loss = torch.nn.functional.cross_entropy(self.model(x), y)
-                loss.backward()
-                optimizer.step()
-        new_params = [v.cpu().numpy() for _, v in self.model.state_dict().items()]
-        return new_params, len(self.train_loader.dataset), {"local_epochs": epochs}
+        self.train_loader.reset()
+        samples = 0
+        out_of_time = False
+        trace = torch_trace(rnd == self.profile_round, f"trace_client{self.cid}_round{rnd}.json")
+        with trace:
+            for _ in range(epochs):
+                if out_of_time:
+                    break
+                for x, y in self.train_loader:
+                    with timer.phase("data"):
+                        x, y = self.fast.input(x.to(DEVICE)), y.to(DEVICE)
+                    with timer.phase("forward"), self.fast.autocast():
+                        loss = torch.nn.functional.cross_entropy(self.fast.model(x), y)
+                    with timer.phase("backward"):
+                        optimizer.zero_grad()
+                        loss.backward()
+                    with timer.phase("step"):
+                        optimizer.step()
+                    samples += y.size(0)
+                    if budget and time.perf_counter() - start >= budget:
+                        out_of_time = True
+                        break
+        data_wait = self.train_loader.wait_time
+        timer.add("data", data_wait)
+        loop_time = sum(timer.totals.get(k, 0.0) for k in ("data", "forward", "backward", "step"))
+        print(f"→ Client {self.cid}: waited {data_wait:.2f}s on data over {self.train_loader.batches} batches")
+        if out_of_time:
+            print(f"→ Client {self.cid}: time budget of {budget:.1f}s used up after {samples} samples")
+
+        # Optionally send a compressed delta against the weights we received
+        codec = str(config.get("codec", "none"))
+        with timer.phase("encode"):
+            # lowrank sends the factors themselves; the model keeps the merged weights
+            factors = low_rank_factors(self.model, self.params.keys) if codec == "lowrank" else None
+            merge_factors(self.model)
+            new_params = self.params.to_numpy()
+            if codec == "topk" and self.residual is None:
+                self.residual = [np.zeros(p.shape, dtype=np.float32) for p in new_params]
+            payload = encode_update(
+                new_params, parameters, codec,
+                per_channel=bool(config.get("int8_per_channel", False)),
+                stochastic=bool(config.get("stochastic_rounding", False)),
+                topk_ratio=float(config.get("topk_ratio", 0.01)),
+                residual=self.residual,
+                factors=factors,
+            )
+        bytes_up = nbytes(payload)
+        print(f"→ Client {self.cid}: sending {bytes_up / 1e6:.2f} MB update (codec={codec})")
+        metrics = {
+            "local_epochs": epochs,
+            "data_wait_s": data_wait,
+            "codec": codec,
+            "bytes_up": bytes_up,
+            "samples": samples,
+            "out_of_time": out_of_time,
+            **self._profile_metrics(timer, start, samples, loop_time),
+        }
+        # Under a deadline the update is weighted by the work actually done
+        num_examples = samples if budget else len(self.train_loader.dataset)
+        return payload, num_examples, metrics
 
     def evaluate(self, parameters, config):
-        self.set_parameters(parameters)
+        start = time.perf_counter()
+        timer = PhaseTimer(sync_cuda=DEVICE.type == "cuda")
+        with timer.phase("decode"):
+            self.set_parameters(self.versions.resolve(parameters, config))
         self.model.eval()
+        model, prepare, autocast = self.fast.model, self.fast.input, self.fast.autocast
+        if self.int8_eval:
+            with timer.phase("quantize"):
+                if self.int8_eval == "static" and self.calibration is None:
+                    # Activation ranges from this client's own training images, fixed once
+                    self.calibration = calibration_batches(self.train_loader.loader, self.calibration_size)
+                model = quantize_cnn(self.model, self.int8_eval, self.calibration)
+            prepare, autocast = (lambda x: x), nullcontext
+        self.test_loader.reset()
         total, correct = 0, 0
         loss_sum = 0.0
         with torch.no_grad():
             for x, y in self.test_loader:
-                x, y = x.to(DEVICE), y.to(DEVICE)
-                outputs = self.model(x)
-                loss_sum += float(torch.nn.functional.cross_entropy(outputs, y, reduction="sum"))
-                preds = outputs.argmax(dim=1)
-                correct += (preds == y).sum().item()
+                with timer.phase("data"):
+                    x, y = prepare(x.to(DEVICE)), y.to(DEVICE)
+                with timer.phase("forward"):
+                    with autocast():
+                        outputs = model(x).float()
+                    loss_sum += float(torch.nn.functional.cross_entropy(outputs, y, reduction="sum"))
+                    preds = outputs.argmax(dim=1)
+                    correct += (preds == y).sum().item()
                 total   += y.size(0)
+        timer.add("data", self.test_loader.wait_time)
         loss = loss_sum / total
         accuracy = correct / total
         miscls = total - correct
         print(f"→ Client {self.cid}: eval loss={loss:.4f}, acc={accuracy:.4f}, miscls={miscls}/{total}")
-        return float(loss), total, {"accuracy": accuracy, "misclassified": miscls}
+        loop_time = timer.totals.get("data", 0.0) + timer.totals.get("forward", 0.0)
+        metrics = {
+            "accuracy": accuracy,
+            "misclassified": miscls,
+            **({"int8": self.int8_eval} if self.int8_eval else {}),
+            **self._profile_metrics(timer, start, total, loop_time),
+        }
+        return float(loss), total, metrics
 
 def main():
     parser = argparse.ArgumentParser(description="Flower FL client")
@@ -81,16 +199,111 @@ def main():
         "-nc", "--num-classes", type=int, default=5,
         help="Number of output classes"
     )
+    parser.add_argument(
+        "--hidden-units", type=int, default=128,
+        help="Width of the model's fully connected layer (must match the server)"
+    )
+    parser.add_argument(
+        "--data-root", default=None,
+        help="Folder holding the client_<ID>/ data folders (default: client/data)"
+    )
+    parser.add_argument(
+        "-b", "--batch-size", type=int, default=32,
+        help="Training and evaluation batch size"
+    )
+    parser.add_argument(
+        "--cache", action="store_true",
+        help="Decode images once into a memory-mapped cache and train from it"
+    )
+    parser.add_argument(
+        "--index", action="store_true",
+        help="List images from client_<ID>/index.json instead of scanning the folders "
+             "(run common/utils/dataindex.py refresh after adding images)"
+    )
+    parser.add_argument(
+        "--num-workers", type=int, default=0,
+        help="DataLoader worker processes (0 = load in the training process)"
+    )
+    parser.add_argument(
+        "--prefetch-factor", type=int, default=None,
+        help="Batches each worker loads ahead (requires --num-workers > 0)"
+    )
+    parser.add_argument(
+        "--persistent-workers", action="store_true",
+        help="Keep DataLoader workers alive across rounds"
+    )
+    parser.add_argument(
+        "--pin-memory", action="store_true",
+        help="Use pinned host memory for faster host-to-GPU copies"
+    )
+    parser.add_argument(
+        "--auto-workers", action="store_true",
+        help="Probe this machine and pick the fastest --num-workers"
+    )
+    parser.add_argument(
+        "--profile-round", type=int, default=None,
+        help="Save a torch.profiler trace of fit() in this server round"
+    )
+    parser.add_argument(
+        "--fast-cpu", action="store_true",
+        help="Time channels_last / bfloat16 variants of the training step at start-up and use the fastest"
+    )
+    parser.add_argument(
+        "--compile", action="store_true",
+        help="With --fast-cpu: also try torch.compile on the fastest variant"
+    )
+    parser.add_argument(
+        "--threads", type=int, default=None,
+        help="Intra-op threads for torch (default: torch's choice)"
+    )
+    parser.add_argument(
+        "--interop-threads", type=int, default=None,
+        help="Inter-op threads for torch (default: torch's choice)"
+    )
+    parser.add_argument(
+        "--model-cache", type=int, default=3,
+        help="Global model versions kept for servers running with --model-cache"
+    )
+    parser.add_argument(
+        "--int8-eval", choices=QUANT_MODES, default=None,
+        help="Evaluate an int8 copy of each global model (static: calibrated on this client's training data)"
+    )
+    parser.add_argument(
+        "--calibration-batches", type=int, default=8,
+        help="With --int8-eval static: training batches used to calibrate activation ranges"
+    )
     args = parser.parse_args()
+    set_threads(args.threads, args.interop_threads)
+    if args.int8_eval and DEVICE.type != "cpu":
+        print("→ --int8-eval runs on CPU only; evaluating in fp32")
+        args.int8_eval = None
+
+    model = build_model(num_classes=args.num_classes, hidden_units=args.hidden_units)
+    train_loader, test_loader = load_client_data(
+        client_id=args.client_id,
+        batch_size=args.batch_size,
+        data_root=args.data_root,
+        cache=args.cache,
+        index=args.index,
+        num_workers=args.num_workers,
+        pin_memory=args.pin_memory,
+        persistent_workers=args.persistent_workers,
+        prefetch_factor=args.prefetch_factor,
+        auto_workers=args.auto_workers,
+    )
 
-    model = build_model(num_classes=args.num_classes)
-    train_loader, test_loader = load_client_data(client_id=args.client_id)
+    fast = None
+    if args.fast_cpu and DEVICE.type == "cpu":
+        fast = FastCPU.calibrate(model, train_loader, compile=args.compile)
 
-    client = FLClient(model, train_loader, test_loader, cid=args.client_id)
+    client = FLClient(model, train_loader, test_loader, cid=args.client_id,
+                      profile_round=args.profile_round, fast=fast, model_cache=args.model_cache,
+                      int8_eval=args.int8_eval, calibration_size=args.calibration_batches)
     print(f"→ Client {args.client_id} connecting to server at {args.server_address}")
-    fl.client.start_numpy_client(
+    # Reads and answers both Flower's default and the packed wire format (see server.py --wire)
+    fl.client.start_client(
         server_address=args.server_address,
-        client=client,
+        client=PackedClient(client),
     )
 
 if __name__ == "__main__":
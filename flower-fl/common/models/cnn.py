@@ -1,12 +1,83 @@
+import math
+
+import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+class LowRankLinear(nn.Linear):
+    """
+    nn.Linear that, with `rank` > 0, trains a low-rank update instead of its weight:
+    y = x (W + B A)ᵀ + b, with W frozen, A (rank × in) and B (out × rank).
+
+    A starts like a Linear weight and B at zero, so a fresh update is zero. The
+    factors are per-round scratch, not model state: they are left out of
+    state_dict(), and `merge()` folds B A into W. With rank 0 this is nn.Linear.
+    """
+
+    FACTORS = ("lora_a", "lora_b")
+
+    def __init__(self, in_features: int, out_features: int, bias: bool = True, rank: int = 0):
+        super().__init__(in_features, out_features, bias=bias)
+        self.rank = 0
+        self.register_parameter("lora_a", None)
+        self.register_parameter("lora_b", None)
+        self.set_rank(rank)
+
+    def set_rank(self, rank: int):
+        """Switch to `rank` (0: train W itself) and start from a zero update."""
+        if rank != self.rank:
+            self.rank = rank
+            like = {"device": self.weight.device, "dtype": self.weight.dtype}
+            self.lora_a = nn.Parameter(torch.empty(rank, self.in_features, **like)) if rank else None
+            self.lora_b = nn.Parameter(torch.empty(self.out_features, rank, **like)) if rank else None
+            self.weight.requires_grad_(rank == 0)
+        self.reset_factors()
+
+    def reset_factors(self):
+        if self.rank:
+            nn.init.kaiming_uniform_(self.lora_a, a=math.sqrt(5))
+            nn.init.zeros_(self.lora_b)
+
+    def factors(self):
+        """(B, A) as float32 NumPy copies, or None with rank 0."""
+        if not self.rank:
+            return None
+        return tuple(p.detach().float().cpu().numpy().copy() for p in (self.lora_b, self.lora_a))
+
+    @torch.no_grad()
+    def merge(self):
+        """Fold B A into W and start again from a zero update."""
+        if self.rank:
+            self.weight += self.lora_b @ self.lora_a
+            self.reset_factors()
+
+    def forward(self, x):
+        out = F.linear(x, self.weight, self.bias)
+        if self.rank:
+            out = out + F.linear(F.linear(x, self.lora_a), self.lora_b)
+        return out
+
+    def _save_to_state_dict(self, destination, prefix, keep_vars):
+        super()._save_to_state_dict(destination, prefix, keep_vars)
+        for name in self.FACTORS:
+            destination.pop(prefix + name, None)
+
+    def _load_from_state_dict(self, state_dict, prefix, local_metadata, strict, missing_keys,
+                              unexpected_keys, error_msgs):
+        super()._load_from_state_dict(state_dict, prefix, local_metadata, strict, missing_keys,
+                                      unexpected_keys, error_msgs)
+        for name in self.FACTORS:
+            if prefix + name in missing_keys:
+                missing_keys.remove(prefix + name)
+
 class CNN(nn.Module):
-    def __init__(self, num_classes: int = 5):
+    def __init__(self, num_classes: int = 5, hidden_units: int = 128, rank: int = 0):
         """
         A simple 2‑layer CNN for 5‑way screenshot classification.
         Args:
             num_classes: number of output labels (default 5).
+            hidden_units: width of the fully connected layer (default 128).
+            rank: rank of the trained update of fc1 (default 0: train fc1 in full).
         """
         super(CNN, self).__init__()
         # Conv layer block 1
@@ -15,18 +86,42 @@ class CNN(nn.Module):
         # Conv layer block 2
         self.conv2 = nn.Conv2d(32, 64, kernel_size=3, padding=1)
         # After two 2×2 poolings on 32×32 input → 8×8 feature maps
-        self.fc1   = nn.Linear(64 * 8 * 8, 128)
-        self.fc2   = nn.Linear(128, num_classes)
+        self.fc1   = LowRankLinear(64 * 8 * 8, hidden_units, rank=rank)
+        self.fc2   = nn.Linear(hidden_units, num_classes)
 
     def forward(self, x):
         x = self.pool(F.relu(self.conv1(x)))
         x = self.pool(F.relu(self.conv2(x)))
-        x = x.view(x.size(0), -1)
+        x = torch.flatten(x, 1)  # Also valid for channels_last activations
         x = F.relu(self.fc1(x))
         return self.fc2(x)
 
-def build_model(num_classes: int = 5) -> nn.Module:
+def build_model(num_classes: int = 5, hidden_units: int = 128, rank: int = 0) -> nn.Module:
     """
     Instantiate and return the CNN model for `num_classes` labels.
+    `hidden_units` sets the width of fc1, which holds most of the parameters;
+    with `rank` > 0 only a rank-`rank` update of fc1 is trained (see LowRankLinear).
     """
-    return CNN(num_classes=num_classes)
+    return CNN(num_classes=num_classes, hidden_units=hidden_units, rank=rank)
+
+def set_rank(model: nn.Module, rank: int):
+    """Set the update rank of every LowRankLinear in `model`; also zeroes their updates."""
+    for module in model.modules():
+        if isinstance(module, LowRankLinear):
+            module.set_rank(rank)
+
+def merge_factors(model: nn.Module):
+    """Fold every low-rank update of `model` into its weights."""
+    for module in model.modules():
+        if isinstance(module, LowRankLinear):
+            module.merge()
+
+def low_rank_factors(model: nn.Module, keys) -> list:
+    """(B, A) of the low-rank update behind each state_dict key in `keys`, or None."""
+    modules = dict(model.named_modules())
+    factors = []
+    for key in keys:
+        name, _, attr = key.rpartition(".")
+        module = modules.get(name)
+        factors.append(module.factors() if attr == "weight" and isinstance(module, LowRankLinear) else None)
+    return factors
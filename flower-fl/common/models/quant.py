@@ -0,0 +1,115 @@
+"""
+Post-training int8 quantization of the CNN, for CPU evaluation and inference.
+
+  static   weights and activations in int8 (FX graph mode, x86/fbgemm kernels):
+           the convolutions, pooling and both fully connected layers all run
+           in int8. Activation ranges are calibrated by running a few batches
+           of training images through the fp32 model.
+  dynamic  only the fully connected weights in int8, activations quantized on
+           the fly. Needs no calibration, but the convolutions, where most of
+           the time goes, stay fp32.
+
+The fp32 model is left untouched; the quantized copy is CPU-only and for
+inference. Low-rank fc1 updates (LowRankLinear) are merged in first.
+"""
+import copy
+import time
+import warnings
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+
+from common.models.cnn import LowRankLinear, merge_factors
+from common.utils.data import cached_loader, load_cached_split
+
+QUANT_MODES = ("static", "dynamic")
+
+
+def _float_copy(model: nn.Module) -> nn.Module:
+    """fp32 CPU copy of `model` in eval mode, with every LowRankLinear as a plain nn.Linear."""
+    model = copy.deepcopy(model).cpu().float().to(memory_format=torch.contiguous_format).eval()
+    merge_factors(model)
+    for parent in list(model.modules()):
+        for name, child in parent.named_children():
+            if isinstance(child, LowRankLinear):
+                linear = nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                linear.load_state_dict(child.state_dict())
+                setattr(parent, name, linear.eval())
+    return model
+
+
+def calibration_batches(loader, batches: int = 8) -> list:
+    """The inputs of the first `batches` batches of `loader`, for static calibration."""
+    inputs = []
+    for x, _ in loader:
+        inputs.append(x.cpu().float())
+        if len(inputs) >= batches:
+            break
+    return inputs
+
+
+def split_loader(split_dir, batch_size: int = 64, shuffle: bool = False):
+    """
+    Loader over a <class>/<image> folder (e.g. a client's train/ split),
+    preprocessed like load_client_data and cached next to the folder like the
+    server's held-out set (see server/central_eval.py).
+    """
+    split_dir = Path(split_dir)
+    dataset = load_cached_split(split_dir, split_dir.parent / ".cache" / split_dir.name)
+    if len(dataset) == 0:
+        raise ValueError(f"No images under {split_dir}")
+    return cached_loader(dataset, batch_size, shuffle)
+
+
+def evaluate(model: nn.Module, loader):
+    """(accuracy, predicted labels, forward seconds) of `model` over (images, labels) batches."""
+    predictions, labels, seconds = [], [], 0.0
+    with torch.no_grad():
+        for x, y in loader:
+            start = time.perf_counter()
+            predictions.append(model(x).argmax(dim=1))
+            seconds += time.perf_counter() - start
+            labels.append(y)
+    predictions, labels = torch.cat(predictions), torch.cat(labels)
+    return float((predictions == labels).float().mean()), predictions, seconds
+
+
+def quantize_cnn(model: nn.Module, mode: str = "static", calibration=(), engine: str = None) -> nn.Module:
+    """
+    Int8 copy of `model`. `calibration` is an iterable of input batches (see
+    calibration_batches), required for `static`. `engine` defaults to torch's
+    current quantized engine (x86 on Intel/AMD).
+    """
+    if mode not in QUANT_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}', expected one of {QUANT_MODES}")
+    engine = engine or torch.backends.quantized.engine
+    torch.backends.quantized.engine = engine
+    model = _float_copy(model)
+    with warnings.catch_warnings():
+        # torch.ao.quantization announces its move to torchao, and its default
+        # observers their new arguments; the API used here is unchanged
+        warnings.simplefilter("ignore", DeprecationWarning)
+        warnings.filterwarnings("ignore", message="torch.quantize_per_tensor")
+        warnings.filterwarnings("ignore", message="Please use quant_min and quant_max")
+        if mode == "dynamic":
+            return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+        calibration = list(calibration)
+        if not calibration:
+            raise ValueError("static quantization needs calibration batches")
+        prepared = prepare_fx(model, get_default_qconfig_mapping(engine), example_inputs=(calibration[0],))
+        with torch.no_grad():
+            for x in calibration:
+                prepared(x)
+        return convert_fx(prepared)
+
+
+def export_int8(quantized: nn.Module, path, example: torch.Tensor) -> None:
+    """Save a quantized model as TorchScript, loadable with torch.jit.load and no project code."""
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)  # torch.jit points to torch.export, which has no int8 CPU path yet
+        torch.jit.save(torch.jit.trace(quantized, example), str(path))
@@ -0,0 +1,41 @@
+"""
+Torch-free description of the CNN's parameters, for processes that only handle
+its weights as NumPy arrays (the server).
+
+`cnn_spec` lists the tensors in the order of `CNN.state_dict()` (see cnn.py),
+and `init_parameters` draws initial weights from the same distribution as
+PyTorch's default Conv2d/Linear init: U(-1/sqrt(fan_in), 1/sqrt(fan_in)) for
+weights (kaiming_uniform with a=sqrt(5)) and biases alike. Values differ from
+a torch-built model, the distribution does not.
+"""
+import math
+
+import numpy as np
+
+
+def cnn_spec(num_classes: int = 5, hidden_units: int = 128):
+    """(name, shape) of every CNN parameter, in state_dict order."""
+    return [
+        ("conv1.weight", (32, 3, 3, 3)),
+        ("conv1.bias", (32,)),
+        ("conv2.weight", (64, 32, 3, 3)),
+        ("conv2.bias", (64,)),
+        ("fc1.weight", (hidden_units, 64 * 8 * 8)),
+        ("fc1.bias", (hidden_units,)),
+        ("fc2.weight", (num_classes, hidden_units)),
+        ("fc2.bias", (num_classes,)),
+    ]
+
+
+def init_parameters(spec, seed=None):
+    """float32 arrays for `spec`, initialised like PyTorch's default layer init."""
+    rng = np.random.default_rng(seed)
+    arrays = []
+    fan_in = None
+    for name, shape in spec:
+        if name.endswith(".weight"):
+            # Input features × kernel size; the bias that follows uses the same fan-in
+            fan_in = math.prod(shape[1:])
+        bound = 1.0 / math.sqrt(fan_in)
+        arrays.append(rng.uniform(-bound, bound, size=shape).astype(np.float32))
+    return arrays
@@ -0,0 +1,242 @@
+# common/utils/codec.py
+"""
+Model-update codecs shared by clients and the server.
+
+A client encodes the difference (delta) between its trained weights and the
+global weights it received; the server decodes the delta and adds it back onto
+the global weights it sent. Codecs:
+  none  full float32 weights, unchanged wire format
+  fp16  delta cast to float16                       → one array per tensor
+  int8  delta quantized to int8 plus float32 scales → two arrays per tensor
+  topk  k largest-magnitude delta entries as (int32 flat indices, float32
+        values) → two arrays per tensor; the client keeps what it did not
+        send in a residual and adds it to the next round's delta
+  lowrank  the factors (B, A) of a tensor trained as a low-rank update (its
+        delta is B @ A, see LowRankLinear in cnn.py), or the float32 delta and
+        an empty array for any other tensor → two arrays per tensor
+"""
+import numpy as np
+
+CODECS = ("none", "fp16", "int8", "topk", "lowrank")
+
+# Codecs that send two arrays per tensor
+_PAIRED = ("int8", "topk", "lowrank")
+
+# Largest magnitude an int8 code may take (symmetric range, -127..127)
+INT8_MAX = 127
+
+
+def nbytes(arrays) -> int:
+    """
+    Total payload size of a list of arrays in bytes.
+    """
+    return int(sum(a.nbytes for a in arrays))
+
+
+def _is_float(a: np.ndarray) -> bool:
+    return np.issubdtype(a.dtype, np.floating)
+
+
+def quantize_int8(delta: np.ndarray, per_channel: bool = False, stochastic: bool = False, rng=None):
+    """
+    Symmetric int8 quantization of `delta`.
+
+    Returns (codes, scales). With `per_channel`, one scale per output channel
+    (axis 0) is used for tensors with more than one dimension; otherwise one
+    scale covers the whole tensor. With `stochastic`, values are rounded up or
+    down at random in proportion to their distance, which keeps the rounding
+    unbiased across rounds.
+    """
+    if per_channel and delta.ndim > 1:
+        amax = np.abs(delta).reshape(delta.shape[0], -1).max(axis=1)
+        scales = (amax / INT8_MAX).astype(np.float32)
+        bcast = scales.reshape((-1,) + (1,) * (delta.ndim - 1))
+    else:
+        scales = np.array([np.abs(delta).max(initial=0.0) / INT8_MAX], dtype=np.float32)
+        bcast = scales[0]
+    # All-zero channels would divide by zero; any scale decodes them correctly
+    safe = np.where(bcast == 0, 1.0, bcast)
+
+    scaled = delta / safe
+    if stochastic:
+        rng = rng if rng is not None else np.random.default_rng()
+        scaled = np.floor(scaled + rng.random(scaled.shape, dtype=np.float32))
+    else:
+        scaled = np.rint(scaled)
+    codes = np.clip(scaled, -INT8_MAX, INT8_MAX).astype(np.int8)
+    return codes, scales
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """
+    Inverse of `quantize_int8`.
+    """
+    if scales.size > 1:
+        scales = scales.reshape((-1,) + (1,) * (codes.ndim - 1))
+    return codes.astype(np.float32) * scales
+
+
+def sparsify_topk(delta: np.ndarray, ratio: float):
+    """
+    Keep the ceil(ratio × size) largest-magnitude entries of `delta`.
+
+    Returns (indices, values, remainder) where indices are int32 positions in
+    the flattened tensor and remainder is `delta` with the kept entries zeroed.
+    """
+    flat = delta.reshape(-1)
+    k = min(flat.size, max(1, int(np.ceil(ratio * flat.size))))
+    if k == flat.size:
+        indices = np.arange(flat.size, dtype=np.int32)
+    else:
+        indices = np.argpartition(np.abs(flat), flat.size - k)[flat.size - k:].astype(np.int32)
+    values = flat[indices].astype(np.float32)
+    remainder = flat.copy()
+    remainder[indices] = 0.0
+    return indices, values, remainder.reshape(delta.shape)
+
+
+def encode_update(new, base, codec: str = "none", per_channel: bool = False,
+                  stochastic: bool = False, rng=None, topk_ratio: float = 0.01,
+                  residual=None, factors=None) -> list:
+    """
+    Encode trained weights `new` relative to the received weights `base`.
+    Non-float tensors are always sent unchanged.
+
+    For `topk`, `residual` is a list of float32 arrays (one per tensor) holding
+    the error feedback from earlier rounds. It is added to this round's delta
+    and updated in place with whatever is not sent.
+
+    For `lowrank`, `factors` lists the (B, A) of each tensor trained as a
+    low-rank update, or None; such a tensor's entry in `new` is not read.
+    """
+    if codec == "none":
+        return list(new)
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}', expected one of {CODECS}")
+
+    encoded = []
+    for i, (n, b) in enumerate(zip(new, base)):
+        if not _is_float(n):
+            encoded.append(n)
+            if codec in _PAIRED:
+                encoded.append(np.empty(0, dtype=np.float32))
+            continue
+        if codec == "lowrank":
+            if factors is not None and factors[i] is not None:
+                encoded.extend(factors[i])
+            else:
+                encoded.extend((n.astype(np.float32) - b.astype(np.float32), np.empty(0, dtype=np.float32)))
+            continue
+        delta = n.astype(np.float32) - b.astype(np.float32)
+        if codec == "fp16":
+            encoded.append(delta.astype(np.float16))
+        elif codec == "int8":
+            encoded.extend(quantize_int8(delta, per_channel, stochastic, rng))
+        else:
+            if residual is not None:
+                delta += residual[i]
+            indices, values, remainder = sparsify_topk(delta, topk_ratio)
+            if residual is not None:
+                residual[i] = remainder
+            encoded.extend((indices, values))
+    return encoded
+
+
+def arrays_per_tensor(codec: str) -> int:
+    """
+    Number of arrays `codec` sends for each model tensor.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}', expected one of {CODECS}")
+    return 2 if codec in _PAIRED else 1
+
+
+def _check_length(arrays, base, codec: str) -> int:
+    step = arrays_per_tensor(codec)
+    if len(arrays) != step * len(base):
+        raise ValueError(
+            f"{codec} update has {len(arrays)} arrays, expected {step * len(base)}"
+        )
+    return step
+
+
+def _lowrank_delta(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    # (B, A) of a low-rank update, or (delta, empty)
+    return first @ second if second.size else first
+
+
+def decode_update(arrays, base, codec: str = "none") -> list:
+    """
+    Rebuild full weights from an encoded update and the `base` it was taken against.
+    """
+    if codec == "none":
+        return list(arrays)
+    step = _check_length(arrays, base, codec)
+
+    decoded = []
+    for i, b in enumerate(base):
+        payload = arrays[step * i]
+        if not _is_float(b):
+            decoded.append(payload)
+        elif codec == "fp16":
+            decoded.append(b + payload.astype(b.dtype))
+        elif codec == "int8":
+            decoded.append(b + dequantize_int8(payload, arrays[step * i + 1]).astype(b.dtype))
+        elif codec == "lowrank":
+            decoded.append(b + _lowrank_delta(payload, arrays[step * i + 1]).astype(b.dtype))
+        else:
+            full = b.copy()
+            full.reshape(-1)[payload] += arrays[step * i + 1].astype(b.dtype)
+            decoded.append(full)
+    return decoded
+
+
+def check_update(arrays, base, codec: str) -> None:
+    """
+    Raise ValueError unless `arrays` is a well-formed `codec` update of `base`,
+    so that accumulate_update cannot fail after adding some of its tensors.
+    """
+    step = _check_length(arrays, base, codec)
+    for i, b in enumerate(base):
+        payload = arrays[step * i]
+        second = arrays[step * i + 1] if step == 2 else None
+        if any(a.dtype.kind not in "biuf" for a in (payload, second) if a is not None):
+            raise ValueError(f"{codec} update: tensor {i} is not numeric")
+        if codec in ("none", "fp16", "int8") or not _is_float(b):
+            ok = payload.shape == b.shape
+            if codec == "int8" and _is_float(b):
+                ok = ok and second.size in (1, b.shape[0] if b.ndim > 1 else 1)
+        elif codec == "lowrank":
+            if second.size:
+                ok = (b.ndim == payload.ndim == second.ndim == 2 and payload.shape[0] == b.shape[0]
+                      and second.shape[1] == b.shape[1] and payload.shape[1] == second.shape[0])
+            else:
+                ok = payload.shape == b.shape
+        else:
+            ok = (payload.dtype.kind in "iu" and payload.ndim == 1 and second.shape == payload.shape
+                  and (payload.size == 0 or (payload.min() >= 0 and payload.max() < b.size)))
+        if not ok:
+            raise ValueError(f"{codec} update: tensor {i} does not match the model's shape {b.shape}")
+
+
+def accumulate_update(acc, arrays, base, codec: str, weight: float) -> None:
+    """
+    Add `weight` × (decoded delta against `base`) into the float32 buffers `acc`.
+
+    Sparse top-k updates only touch their own indices, so aggregating them
+    never materialises a dense copy of a client's update.
+    """
+    step = 1 if codec == "none" else _check_length(arrays, base, codec)
+    for i, (a, b) in enumerate(zip(acc, base)):
+        payload = arrays[step * i]
+        if codec == "none" or not _is_float(b):
+            a += weight * (payload.astype(np.float32) - b)
+        elif codec == "fp16":
+            a += weight * payload.astype(np.float32)
+        elif codec == "int8":
+            a += weight * dequantize_int8(payload, arrays[step * i + 1])
+        elif codec == "lowrank":
+            a += weight * _lowrank_delta(payload, arrays[step * i + 1])
+        else:
+            # Indices within one tensor are unique, so fancy-index += is safe
+            a.reshape(-1)[payload] += weight * arrays[step * i + 1]
@@ -1,49 +1,359 @@
 # common/utils/data.py
 
+import hashlib
+import json
+import os
+import time
 from pathlib import Path
+
+import numpy as np
+import torch
 from torchvision import datasets, transforms
-from torch.utils.data import DataLoader
+from torch.utils.data import BatchSampler, DataLoader, Dataset, RandomSampler, SequentialSampler
+
+from common.utils.dataindex import build_index, load_index
 
 # Define your class names here:
 CLASS_NAMES = ["Food", "movie", "notes", "real_life", "shopping"]
 
+# Screenshots are resized to IMAGE_SIZE × IMAGE_SIZE before reaching the model
+IMAGE_SIZE = 32
+
+# Bump whenever the on-disk cache layout or preprocessing changes
+CACHE_VERSION = 1
+
+
+def build_transform():
+    """
+    Return the image transform applied to every screenshot.
+    """
+    return transforms.Compose([
+        transforms.Resize((IMAGE_SIZE, IMAGE_SIZE)),
+        transforms.ToTensor(),
+    ])
+
+
+class CachedImageDataset(Dataset):
+    """
+    Dataset over preprocessed uint8 images (N×3×H×W) and their labels.
+
+    Indexing with a single int returns one (image, label) pair like ImageFolder.
+    Indexing with a list of ints returns a whole (images, labels) batch, which
+    is how the loaders from `cached_loader` use it.
+    """
+
+    def __init__(self, images: np.ndarray, labels: np.ndarray, classes):
+        self.images = images
+        self.labels = labels
+        self.classes = list(classes)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getstate__(self):
+        # Worker processes started with "spawn" re-open the memory map instead of
+        # receiving a pickled copy of every image
+        state = self.__dict__.copy()
+        if isinstance(self.images, np.memmap) and self.images.filename:
+            state["images"] = str(self.images.filename)
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state["images"], str):
+            state["images"] = np.load(state["images"], mmap_mode="r")
+        self.__dict__.update(state)
+
+    def __getitem__(self, index):
+        # Fancy indexing copies out of the memory map, so the tensor owns its data
+        x = torch.from_numpy(np.array(self.images[index])).float().div_(255)
+        if isinstance(index, (int, np.integer)):
+            return x, int(self.labels[index])
+        return x, torch.from_numpy(np.array(self.labels[index]))
+
+
+class IndexedImageFolder(Dataset):
+    """
+    ImageFolder over a known list of (path, label) samples, so building it
+    does not walk the folder (see common/utils/dataindex.py).
+    """
+
+    def __init__(self, samples, classes, transform=None):
+        self.samples = samples
+        self.targets = [label for _, label in samples]
+        self.classes = list(classes)
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, index):
+        path, label = self.samples[index]
+        img = datasets.folder.default_loader(path)
+        if self.transform is not None:
+            img = self.transform(img)
+        return img, label
+
+
+def cached_loader(dataset: CachedImageDataset, batch_size: int, shuffle: bool, **loader_kwargs) -> DataLoader:
+    """
+    Wrap a CachedImageDataset in a DataLoader that fetches whole batches at once.
+    Extra keyword arguments (workers, pinning, prefetch) go to the DataLoader.
+    """
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(sampler, batch_size=batch_size, drop_last=False),
+        batch_size=None,
+        **loader_kwargs,
+    )
+
+
+def pipeline_kwargs(num_workers: int = 0, pin_memory: bool = False,
+                    persistent_workers: bool = False, prefetch_factor=None) -> dict:
+    """
+    Build DataLoader keyword arguments for the input pipeline.
+    Worker-only options are dropped when loading runs in the main process,
+    since DataLoader rejects them with num_workers=0.
+    """
+    kwargs = {"num_workers": num_workers, "pin_memory": pin_memory}
+    if num_workers > 0:
+        kwargs["persistent_workers"] = persistent_workers
+        if prefetch_factor is not None:
+            kwargs["prefetch_factor"] = prefetch_factor
+    return kwargs
+
+
+def _make_loader(dataset, batch_size: int, shuffle: bool, **loader_kwargs) -> DataLoader:
+    if isinstance(dataset, CachedImageDataset):
+        return cached_loader(dataset, batch_size=batch_size, shuffle=shuffle, **loader_kwargs)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, **loader_kwargs)
+
 
-def load_client_data(client_id: str, batch_size: int = 32):
+def auto_tune_workers(dataset, batch_size: int = 32, candidates=None,
+                      probe_batches: int = 20, **loader_kwargs) -> int:
+    """
+    Return the worker count that maximises samples/sec for `dataset` on this machine.
+
+    Each candidate gets a fresh loader; the first batches (worker start-up) are
+    skipped and the next `probe_batches` are timed.
+    """
+    if candidates is None:
+        cpus = os.cpu_count() or 1
+        candidates = sorted({0, 1, 2, 4, 8, cpus} & set(range(cpus + 1)))
+    warmup = 2
+    best_workers, best_rate = 0, 0.0
+    for n in candidates:
+        kwargs = pipeline_kwargs(num_workers=n, **loader_kwargs)
+        loader = _make_loader(dataset, batch_size=batch_size, shuffle=True, **kwargs)
+        samples, start = 0, None
+        for i, (x, _) in enumerate(loader):
+            if i == warmup:
+                start = time.perf_counter()
+            if i >= warmup:
+                samples += len(x)
+            if i >= warmup + probe_batches - 1:
+                break
+        rate = samples / (time.perf_counter() - start) if start is not None else 0.0
+        del loader
+        print(f"→ auto-workers: num_workers={n}: {rate:.0f} samples/s")
+        if rate > best_rate:
+            best_workers, best_rate = n, rate
+    return best_workers
+
+
+class TimedLoader:
+    """
+    Iterate a DataLoader while accumulating the time the training loop spends
+    blocked waiting for the next batch. Call `reset()` at the start of a round.
+    """
+
+    def __init__(self, loader: DataLoader):
+        self.loader = loader
+        self.dataset = loader.dataset
+        self.wait_time = 0.0
+        self.batches = 0
+
+    def __len__(self):
+        return len(self.loader)
+
+    def reset(self):
+        self.wait_time = 0.0
+        self.batches = 0
+
+    def __iter__(self):
+        it = iter(self.loader)
+        while True:
+            start = time.perf_counter()
+            try:
+                batch = next(it)
+            except StopIteration:
+                self.wait_time += time.perf_counter() - start
+                return
+            self.wait_time += time.perf_counter() - start
+            self.batches += 1
+            yield batch
+
+
+def split_fingerprint(split_dir: Path) -> str:
+    """
+    Hash the file list, sizes and mtimes under a split folder.
+    Any added, removed, resized or touched file changes the fingerprint.
+    """
+    digest = hashlib.sha1(f"v{CACHE_VERSION}:{IMAGE_SIZE}\n".encode())
+    for root, dirs, files in os.walk(split_dir):
+        dirs.sort()
+        rel_root = os.path.relpath(root, split_dir)
+        for name in sorted(files):
+            st = os.stat(os.path.join(root, name))
+            digest.update(f"{rel_root}/{name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def build_split_cache(split_dir: Path, cache_dir: Path, fingerprint: str, samples=None, classes=None) -> None:
+    """
+    Decode every image under `split_dir` once and store the result in `cache_dir`:
+      images.npy  uint8 N×3×IMAGE_SIZE×IMAGE_SIZE
+      labels.npy  int64 N
+      meta.json   fingerprint, class names, sample count
+    Files are written under temporary names and renamed into place, so an
+    interrupted build never leaves a half-written cache behind. `samples` and
+    `classes` (from an index) replace the scan of `split_dir`.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    if samples is None:
+        folder = datasets.ImageFolder(str(split_dir))
+        samples, classes = folder.samples, folder.classes
+    resize = transforms.Resize((IMAGE_SIZE, IMAGE_SIZE))
+    n = len(samples)
+
+    images_tmp = cache_dir / "images.tmp.npy"
+    labels_tmp = cache_dir / "labels.tmp.npy"
+    images = np.lib.format.open_memmap(
+        images_tmp, mode="w+", dtype=np.uint8, shape=(n, 3, IMAGE_SIZE, IMAGE_SIZE)
+    )
+    labels = np.empty(n, dtype=np.int64)
+    for i, (path, label) in enumerate(samples):
+        img = resize(datasets.folder.default_loader(path))
+        # HWC → CHW, same layout ToTensor() produces
+        images[i] = np.asarray(img, dtype=np.uint8).transpose(2, 0, 1)
+        labels[i] = label
+    images.flush()
+    del images
+    np.save(labels_tmp, labels)
+
+    os.replace(images_tmp, cache_dir / "images.npy")
+    os.replace(labels_tmp, cache_dir / "labels.npy")
+    meta = {"fingerprint": fingerprint, "classes": list(classes), "count": n}
+    meta_tmp = cache_dir / "meta.tmp.json"
+    meta_tmp.write_text(json.dumps(meta))
+    os.replace(meta_tmp, cache_dir / "meta.json")
+
+
+def load_cached_split(split_dir: Path, cache_dir: Path, samples=None, classes=None,
+                      fingerprint=None) -> CachedImageDataset:
+    """
+    Return a CachedImageDataset for `split_dir`, (re)building the cache in
+    `cache_dir` when it is missing or the source folder has changed. With an
+    index, pass its `samples`, `classes` and `fingerprint` to skip the scan.
+    """
+    fingerprint = fingerprint or split_fingerprint(split_dir)
+    meta_path = cache_dir / "meta.json"
+    meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+    if meta.get("fingerprint") != fingerprint:
+        print(f"→ Building data cache for {split_dir}")
+        build_split_cache(split_dir, cache_dir, fingerprint, samples, classes)
+        meta = json.loads(meta_path.read_text())
+
+    images = np.load(cache_dir / "images.npy", mmap_mode="r")
+    labels = np.load(cache_dir / "labels.npy")
+    return CachedImageDataset(images, labels, meta["classes"])
+
+
+def load_client_data(client_id: str, batch_size: int = 32, cache: bool = False,
+                     num_workers: int = 0, pin_memory: bool = False,
+                     persistent_workers: bool = False, prefetch_factor=None,
+                     auto_workers: bool = False, data_root=None, index: bool = False):
     """
     Load train/test DataLoaders for a given client.
     Expects directory structure at:
-      <project_root>/client/data/client_<ID>/{train,test}/{CLASS_NAMES}/
+      <data_root>/client_<ID>/{train,test}/{CLASS_NAMES}/
+    where `data_root` defaults to <project_root>/client/data.
 
     If class folders are missing, they will be created (empty).
+
+    With `cache=True`, each split is decoded once into a memory-mapped uint8
+    array under client_<ID>/.cache/<split>/ and batches are served from it.
+    The cache is rebuilt whenever files in the split are added, removed or
+    modified.
+
+    `num_workers`, `pin_memory`, `persistent_workers` and `prefetch_factor`
+    configure the DataLoader input pipeline. With `auto_workers=True` a short
+    probe on the train split picks `num_workers` instead.
+
+    With `index=True` the file list comes from client_<ID>/index.json (built on
+    first use, see common/utils/dataindex.py) instead of a walk over the
+    folders; images added later are only seen after a `dataindex.py refresh`.
     """
     # Determine project root (common/utils -> common -> project root)
     project_root = Path(__file__).parents[2]
+    if data_root is None:
+        data_root = project_root / "client" / "data"
 
     # Path to this client's data
-    data_dir = project_root / "client" / "data" / f"client_{client_id}"
+    data_dir = Path(data_root) / f"client_{client_id}"
     if not data_dir.exists():
         raise FileNotFoundError(f"Data directory not found: {data_dir}")
 
-    # Ensure class subfolders exist under train/ and test/
-    for split in ("train", "test"):
-        for cls in CLASS_NAMES:
-            cls_path = data_dir / split / cls
-            cls_path.mkdir(parents=True, exist_ok=True)
+    file_index = load_index(data_dir) if index else None
+    if file_index is None:
+        # Ensure class subfolders exist under train/ and test/
+        for split in ("train", "test"):
+            for cls in CLASS_NAMES:
+                cls_path = data_dir / split / cls
+                cls_path.mkdir(parents=True, exist_ok=True)
+        if index:
+            print(f"→ Indexing {data_dir}")
+            file_index = build_index(data_dir)
 
-    # Image transforms
-    transform = transforms.Compose([
-        transforms.Resize((32, 32)),
-        transforms.ToTensor(),
-    ])
-
-    # Create datasets
     train_folder = data_dir / "train"
     test_folder = data_dir / "test"
-    train_ds = datasets.ImageFolder(str(train_folder), transform=transform)
-    test_ds  = datasets.ImageFolder(str(test_folder),  transform=transform)
+
+    if file_index is not None:
+        splits = {}
+        prefix = str(data_dir) + os.sep  # Plain string joins: pathlib costs ~15µs per file
+        for split in ("train", "test"):
+            entry = file_index["splits"][split]
+            samples = list(zip([prefix + rel for rel in entry["path"]], entry["label"]))
+            if cache:
+                splits[split] = load_cached_split(
+                    data_dir / split, data_dir / ".cache" / split, samples, entry["classes"],
+                    fingerprint=f"index:{entry['fingerprint']}:v{CACHE_VERSION}:{IMAGE_SIZE}",
+                )
+            else:
+                splits[split] = IndexedImageFolder(samples, entry["classes"], transform=build_transform())
+        train_ds, test_ds = splits["train"], splits["test"]
+    elif cache:
+        cache_root = data_dir / ".cache"
+        train_ds = load_cached_split(train_folder, cache_root / "train")
+        test_ds  = load_cached_split(test_folder,  cache_root / "test")
+    else:
+        # Image transforms
+        transform = build_transform()
+
+        # Create datasets
+        train_ds = datasets.ImageFolder(str(train_folder), transform=transform)
+        test_ds  = datasets.ImageFolder(str(test_folder),  transform=transform)
+
+    if auto_workers:
+        num_workers = auto_tune_workers(
+            train_ds, batch_size=batch_size, pin_memory=pin_memory,
+            prefetch_factor=prefetch_factor,
+        )
+        print(f"→ auto-workers: using num_workers={num_workers}")
+    loader_kwargs = pipeline_kwargs(num_workers, pin_memory, persistent_workers, prefetch_factor)
 
     # Wrap in DataLoaders
-    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True)
-    test_loader  = DataLoader(test_ds,  batch_size=batch_size, shuffle=False)
+    train_loader = _make_loader(train_ds, batch_size=batch_size, shuffle=True,  **loader_kwargs)
+    test_loader  = _make_loader(test_ds,  batch_size=batch_size, shuffle=False, **loader_kwargs)
 
     return train_loader, test_loader
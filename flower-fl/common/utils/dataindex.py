@@ -0,0 +1,170 @@
+# common/utils/dataindex.py
+"""
+Persisted file index of a client_<ID> data folder.
+
+Starting a client normally walks every class folder (ImageFolder), and with the
+data cache also stats every image to fingerprint it. The index records, once,
+each image's path, label, size, mtime and optionally a SHA-1 of its contents
+in client_<ID>/index.json, and loaders are built from it without touching the
+tree. `refresh` lists the folders again but only stats (and hashes) files that
+are not indexed yet, which is what prepare_dataset.py produces when it adds
+images to an existing client; `--verify` also re-stats every indexed file.
+
+    python common/utils/dataindex.py build   -c 1 [--hash]
+    python common/utils/dataindex.py refresh -c 1 [--verify]
+"""
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+SPLITS = ("train", "test")
+
+# torchvision's IMG_EXTENSIONS, the filter ImageFolder applies (not imported: pulls in torch)
+IMG_EXTENSIONS = (".jpg", ".jpeg", ".png", ".ppm", ".bmp", ".pgm", ".tif", ".tiff", ".webp")
+
+
+def file_sha1(path) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_split(data_dir: Path, split: str):
+    """
+    Class names and (path relative to `data_dir`, label) of every image in the
+    split, in ImageFolder's order and labelling (sorted class folders), without
+    stat calls. Paths use "/" on every platform.
+    """
+    split_dir = os.path.join(data_dir, split)
+    classes = sorted(e.name for e in os.scandir(split_dir) if e.is_dir())
+    files = []
+    skip = len(os.path.join(data_dir, ""))  # Strips "<data_dir>/" from walked paths
+    for label, cls in enumerate(classes):
+        for root, _, names in sorted(os.walk(os.path.join(split_dir, cls), followlinks=True)):
+            prefix = root[skip:].replace(os.sep, "/") + "/"
+            for name in sorted(names):
+                if name.lower().endswith(IMG_EXTENSIONS):
+                    files.append((prefix + name, label))
+    return classes, files
+
+
+def _stat_row(data_dir: Path, rel: str, content_hash: bool):
+    path = os.path.join(data_dir, rel)
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns, file_sha1(path) if content_hash else None
+
+
+def split_fingerprint(entry: dict) -> str:
+    """Fingerprint of one indexed split, stored with it for the decoded data cache."""
+    digest = hashlib.sha1()
+    for row in zip(entry["path"], entry["label"], entry["size"], entry["mtime_ns"], entry["sha1"]):
+        digest.update("\0".join(map(str, row)).encode() + b"\n")
+    return digest.hexdigest()
+
+
+def _split_entry(classes, rows) -> dict:
+    """Column-wise split record (much faster to load than one object per file)."""
+    columns = ("path", "label", "size", "mtime_ns", "sha1")
+    entry = {"classes": classes, **{c: [r[i] for r in rows] for i, c in enumerate(columns)}}
+    entry["fingerprint"] = split_fingerprint(entry)
+    return entry
+
+
+def save_index(data_dir: Path, index: dict) -> None:
+    """Write the index atomically, so a crash never leaves a truncated one."""
+    tmp = Path(data_dir) / f".{INDEX_NAME}.tmp"
+    tmp.write_text(json.dumps(index))
+    os.replace(tmp, Path(data_dir) / INDEX_NAME)
+
+
+def load_index(data_dir):
+    """The index of `data_dir`, or None if there is none (or it is from another version)."""
+    path = Path(data_dir) / INDEX_NAME
+    if not path.exists():
+        return None
+    index = json.loads(path.read_text())
+    return index if index.get("version") == INDEX_VERSION else None
+
+
+def build_index(data_dir, content_hash: bool = False) -> dict:
+    """Scan `data_dir`'s train/ and test/ splits from scratch and save their index."""
+    index = {"version": INDEX_VERSION, "content_hash": content_hash, "splits": {}}
+    for split in SPLITS:
+        classes, files = list_split(data_dir, split)
+        rows = [(rel, label, *_stat_row(data_dir, rel, content_hash)) for rel, label in files]
+        index["splits"][split] = _split_entry(classes, rows)
+    save_index(data_dir, index)
+    return index
+
+
+def refresh_index(data_dir, verify: bool = False):
+    """
+    Bring the index of `data_dir` up to date and save it; return (index, added,
+    removed, changed). Only new files are stat-ed unless `verify` is set, in
+    which case every file is checked for size/mtime changes.
+    """
+    index = load_index(data_dir)
+    if index is None:
+        index = build_index(data_dir)
+        return index, sum(len(s["path"]) for s in index["splits"].values()), 0, 0
+    content_hash = index["content_hash"]
+    added = removed = changed = 0
+    for split in SPLITS:
+        classes, files = list_split(data_dir, split)
+        old = index["splits"][split]
+        # path -> (size, mtime_ns, sha1) of every indexed file
+        known = dict(zip(old["path"], zip(old["size"], old["mtime_ns"], old["sha1"])))
+        rows = []
+        for rel, label in files:
+            stat = known.pop(rel, None)
+            if stat is None:
+                stat = _stat_row(data_dir, rel, content_hash)
+                added += 1
+            elif verify:
+                st = os.stat(os.path.join(data_dir, rel))
+                if (st.st_size, st.st_mtime_ns) != stat[:2]:
+                    stat = _stat_row(data_dir, rel, content_hash)
+                    changed += 1
+            # Labels come from the listing: a new class folder shifts them as in ImageFolder
+            rows.append((rel, label, *stat))
+        removed += len(known)
+        index["splits"][split] = _split_entry(classes, rows)
+    save_index(data_dir, index)
+    return index, added, removed, changed
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build or refresh the file index of a client data folder")
+    parser.add_argument("command", choices=["build", "refresh"])
+    parser.add_argument("-c", "--client-id", required=True)
+    parser.add_argument("--data-root", default=None, help="Folder holding client_<ID>/ (default: client/data)")
+    parser.add_argument("--hash", action="store_true", help="build: also store a SHA-1 of every image")
+    parser.add_argument("--verify", action="store_true", help="refresh: also re-check indexed files for changes")
+    args = parser.parse_args()
+
+    data_root = Path(args.data_root) if args.data_root else Path(__file__).parents[2] / "client" / "data"
+    data_dir = data_root / f"client_{args.client_id}"
+    if not data_dir.is_dir():
+        sys.exit(f"Data directory not found: {data_dir}")
+    start = time.perf_counter()
+    if args.command == "build":
+        index = build_index(data_dir, content_hash=args.hash)
+        n = sum(len(s["path"]) for s in index["splits"].values())
+        print(f"→ Indexed {n} images in {data_dir} ({time.perf_counter() - start:.2f}s)")
+    else:
+        _, added, removed, changed = refresh_index(data_dir, verify=args.verify)
+        print(f"→ Index of {data_dir}: {added} added, {removed} removed, {changed} changed "
+              f"({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# common/utils/fastcpu.py
+"""
+Opt-in fast CPU execution for the client's training and evaluation loops.
+
+A FastCPU holds the execution settings for one model: intra-/inter-op thread
+counts, channels_last memory format, bfloat16 autocast and torch.compile.
+`FastCPU.calibrate` times a few real training steps under each setting this
+machine supports against the plain eager fp32 loop, keeps the fastest, and
+falls back to eager when nothing is clearly faster.
+"""
+import copy
+import itertools
+import time
+from contextlib import nullcontext
+
+import torch
+import torch.nn.functional as F
+
+
+def bf16_supported() -> bool:
+    """True if the CPU has native bfloat16 instructions (AVX512-BF16 or AMX)."""
+    for check in ("_is_avx512_bf16_supported", "_is_amx_tile_supported"):
+        fn = getattr(torch.cpu, check, None)
+        if fn is not None and fn():
+            return True
+    return False
+
+
+def set_threads(threads=None, interop_threads=None) -> None:
+    """
+    Set torch's intra-op and inter-op thread pools (None keeps torch's default).
+    The inter-op pool can only be sized before its first use; later calls are ignored.
+    """
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            print("→ fast-cpu: inter-op threads already started; keeping "
+                  f"{torch.get_num_interop_threads()}")
+
+
+class FastCPU:
+    """
+    Execution settings for one model.
+
+        fast = FastCPU(model, channels_last=True, bf16=True)
+        with fast.autocast():
+            out = fast.model(fast.input(x))
+
+    `fast.model` is what the loops call: with `compile=True` it is the
+    torch.compile wrapper, created once and kept for the client's lifetime.
+    Weights are loaded into the same tensors every round, so it compiles on the
+    first fit and is not recompiled afterwards. `speedups` holds the
+    calibration result per configuration name, relative to "eager".
+    """
+
+    def __init__(self, model, name="eager", channels_last=False, bf16=False, compile=False):
+        self.name = name
+        self.channels_last = channels_last
+        self.bf16 = bf16
+        self.compile = compile
+        self.speedups = {}
+        if channels_last:
+            # Replaces the 4-D weights, so do this before building a ParameterBridge
+            model.to(memory_format=torch.channels_last)
+        self.module = model
+        self.model = torch.compile(model) if compile else model
+
+    def input(self, x):
+        """A batch in the memory format the model runs in."""
+        if self.channels_last and x.dim() == 4:
+            return x.contiguous(memory_format=torch.channels_last)
+        return x
+
+    def autocast(self):
+        """Context for forward passes: bfloat16 autocast if enabled."""
+        if self.bf16:
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return nullcontext()
+
+    def metrics(self) -> dict:
+        """Chosen configuration and measured speedups, as Flower metrics (none if not calibrated)."""
+        if not self.speedups:
+            return {}
+        return {
+            "fast_config": self.name,
+            "fast_speedup": float(self.speedups.get(self.name, 1.0)),
+            **{f"fast_speedup_{name}": float(s) for name, s in self.speedups.items()},
+        }
+
+    @classmethod
+    def calibrate(cls, model, loader, compile=False, steps=8, warmup=3, min_speedup=1.05, lr=0.01):
+        """
+        Return the FastCPU for `model` that trains fastest on batches of `loader`.
+
+        Every candidate trains a throwaway copy of the model for `warmup` untimed
+        and `steps` timed SGD steps. Warm-up also covers every batch shape that
+        is timed (e.g. a short last batch), so compilation is never timed. A
+        candidate must beat eager by `min_speedup` to be chosen; torch.compile is
+        only tried (with `compile=True`) on top of the best uncompiled candidate.
+        """
+        timed = list(itertools.islice(itertools.cycle(loader), warmup, warmup + steps))
+        warm = list(itertools.islice(loader, warmup))
+        shapes = {tuple(x.shape) for x, _ in warm}
+        for x, y in timed:
+            if tuple(x.shape) not in shapes:
+                shapes.add(tuple(x.shape))
+                warm.append((x, y))
+        candidates = [("eager", {}), ("channels_last", {"channels_last": True})]
+        if bf16_supported():
+            candidates += [("bf16", {"bf16": True}),
+                           ("channels_last_bf16", {"channels_last": True, "bf16": True})]
+
+        def rate(settings):
+            probe = cls(copy.deepcopy(model), **settings)
+            optimizer = torch.optim.SGD(probe.module.parameters(), lr=lr)
+            probe.module.train()
+            samples, start = 0, None
+            for i, (x, y) in enumerate(warm + timed):
+                if i == len(warm):
+                    start = time.perf_counter()
+                with probe.autocast():
+                    loss = F.cross_entropy(probe.model(probe.input(x)), y)
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+                if i >= len(warm):
+                    samples += y.size(0)
+            return samples / (time.perf_counter() - start)
+
+        rate({})  # Untimed: one-off library start-up would otherwise count against eager
+        rates = {}
+        for name, settings in candidates:
+            rates[name] = rate(settings)
+        if compile:
+            best = max(rates, key=rates.get)
+            settings = {**dict(candidates)[best], "compile": True}
+            try:
+                rates[f"{best}_compile"] = rate(settings)
+                candidates.append((f"{best}_compile", settings))
+            except Exception as err:  # No C++ toolchain, unsupported platform, ...
+                print(f"→ fast-cpu: torch.compile unavailable ({type(err).__name__}: {err})")
+
+        speedups = {name: r / rates["eager"] for name, r in rates.items()}
+        for name, s in speedups.items():
+            print(f"→ fast-cpu: {name}: {rates[name]:.0f} samples/s ({s:.2f}x)")
+        best = max(speedups, key=speedups.get)
+        if speedups[best] < min_speedup:
+            best = "eager"
+        print(f"→ fast-cpu: using {best}")
+        fast = cls(model, name=best, **dict(candidates)[best])
+        fast.speedups = speedups
+        return fast
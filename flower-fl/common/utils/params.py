@@ -0,0 +1,58 @@
+# common/utils/params.py
+"""
+Copy-light exchange between a torch model's state and lists of NumPy arrays,
+the format Flower's NumPyClient sends and receives.
+"""
+import numpy as np
+import torch
+
+
+class ParameterBridge:
+    """
+    NumPy view of a model's state_dict tensors, in state_dict order.
+
+    On CPU, `to_numpy()` returns arrays that share memory with the model, so
+    sending parameters costs no copy, and `load()` copies incoming arrays
+    straight into the existing tensors without building intermediate ones.
+    """
+
+    def __init__(self, model: torch.nn.Module):
+        self.model = model
+        self.refresh()
+
+    def refresh(self):
+        """
+        Re-read the model's tensors. Call after anything that replaces them,
+        such as moving the model to another device or memory format.
+        """
+        state = self.model.state_dict()
+        self.keys = list(state)
+        self.tensors = list(state.values())
+        self._views = [t.numpy() if t.device.type == "cpu" else None for t in self.tensors]
+
+    def to_numpy(self) -> list:
+        """
+        Current weights as NumPy arrays. On CPU these are live views of the
+        model's storage, so serialize (or copy) them before training changes
+        the weights again.
+        """
+        return [
+            view if view is not None else t.cpu().numpy()
+            for view, t in zip(self._views, self.tensors)
+        ]
+
+    def load(self, arrays) -> None:
+        """
+        Copy `arrays` into the model's tensors in place, casting dtype as needed
+        (e.g. fp16 or float64 global weights into float32 parameters).
+        """
+        if len(arrays) != len(self.tensors):
+            raise ValueError(f"Expected {len(self.tensors)} arrays, got {len(arrays)}")
+        with torch.no_grad():
+            for view, t, a in zip(self._views, self.tensors, arrays):
+                if tuple(a.shape) != tuple(t.shape):
+                    raise ValueError(f"Shape mismatch: expected {tuple(t.shape)}, got {a.shape}")
+                if view is not None:
+                    np.copyto(view, a, casting="same_kind")
+                else:
+                    t.copy_(torch.from_numpy(np.ascontiguousarray(a)))
@@ -0,0 +1,97 @@
+# common/utils/profiling.py
+"""
+Lightweight per-phase timing for client fit/evaluate calls.
+Results are plain floats so they can travel back to the server in Flower metrics.
+torch is only imported where it is needed, so the server can use
+peak_memory_mb without loading it.
+"""
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class PhaseTimer:
+    """
+    Accumulates wall time per named phase.
+
+        timer = PhaseTimer()
+        with timer.phase("forward"):
+            out = model(x)
+        timer.metrics()  # {"t_forward": 0.12}
+
+    With `sync_cuda=True` each phase waits for queued GPU work before it stops
+    the clock, so asynchronous kernels are charged to the phase that launched them.
+    """
+
+    def __init__(self, sync_cuda: bool = False):
+        self.sync_cuda = sync_cuda
+        self.totals = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.sync_cuda:
+                import torch
+                torch.cuda.synchronize()
+            self.totals[name] = self.totals.get(name, 0.0) + time.perf_counter() - start
+
+    def add(self, name: str, seconds: float):
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    def metrics(self) -> dict:
+        return {f"t_{name}": float(secs) for name, secs in self.totals.items()}
+
+
+def peak_memory_mb() -> float:
+    """
+    Peak resident memory of this process in MB (peak GPU allocation on CUDA).
+    Returns 0.0 where the platform offers no cheap way to read it.
+    """
+    torch = sys.modules.get("torch")  # No GPU to ask about in a process without torch
+    if torch is not None and torch.cuda.is_available():
+        return torch.cuda.max_memory_allocated() / 2**20
+    # Linux: VmHWM starts afresh at exec, whereas ru_maxrss carries over the peak of
+    # the process that started us (e.g. a benchmark driver that loaded torch)
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return 0.0
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, KiB on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def torch_trace(enabled: bool, path: str):
+    """
+    Context manager that records a torch.profiler trace to `path` (Chrome
+    trace format, open in chrome://tracing or Perfetto) when `enabled`.
+    """
+    if not enabled:
+        return nullcontext()
+    return _torch_trace(path)
+
+
+@contextmanager
+def _torch_trace(path: str):
+    import torch
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+    with torch.profiler.profile(activities=activities, record_shapes=True) as prof:
+        yield prof
+    prof.export_chrome_trace(path)
+    print(f"→ Saved torch.profiler trace to {path}")
@@ -0,0 +1,111 @@
+# common/utils/versions.py
+"""
+Content-addressed global model versions, shared by clients and the server.
+
+A version is the hash of the arrays the server sends. Clients keep the last
+few versions they received in a VersionCache and report their hashes back with
+every result, so the server can send:
+  cached  only the hash, when the client already holds that version
+          (e.g. evaluating the model the next fit starts from)
+  delta   the XOR of the new and an older version's bits, byte-shuffled and
+          zlib-compressed per tensor → one uint8 array per tensor; exact, and
+          small because consecutive models share sign, exponent and high
+          mantissa bits
+  full    the arrays themselves
+"""
+import hashlib
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+ENCODINGS = ("full", "delta", "cached")
+
+# zlib level of the delta: level 1 gets most of the gain at a fraction of the time
+DELTA_LEVEL = 1
+
+
+def version_hash(arrays) -> str:
+    """Hash of a model's arrays (dtypes, shapes and contents)."""
+    digest = hashlib.sha1()
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        digest.update(f"{a.dtype.str}{a.shape}".encode())
+        digest.update(a.data)
+    return digest.hexdigest()[:16]
+
+
+def _bytes(a: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(a).reshape(-1).view(np.uint8)
+
+
+def encode_delta(arrays, base):
+    """XOR delta from `base` to `arrays`, one compressed uint8 array per tensor."""
+    out = []
+    for a, b in zip(arrays, base):
+        if a.shape != b.shape or a.dtype != b.dtype:
+            raise ValueError("delta needs a base with the same shapes and dtypes")
+        x = np.bitwise_xor(_bytes(a), _bytes(b))
+        # Byte planes (all first bytes, then all second bytes, ...) compress far better
+        planes = x.reshape(-1, a.itemsize).T
+        out.append(np.frombuffer(zlib.compress(planes.tobytes(), DELTA_LEVEL), dtype=np.uint8))
+    return out
+
+
+def decode_delta(payload, base):
+    """Arrays reconstructed from an `encode_delta` payload and the same `base`."""
+    out = []
+    for p, b in zip(payload, base):
+        planes = np.frombuffer(zlib.decompress(p.tobytes()), dtype=np.uint8)
+        x = planes.reshape(b.itemsize, -1).T.reshape(-1)
+        out.append(np.bitwise_xor(x, _bytes(b)).view(b.dtype).reshape(b.shape))
+    return out
+
+
+class VersionCache:
+    """Least-recently-used map of version hash -> arrays, holding at most `size` models."""
+
+    def __init__(self, size=3):
+        self.size = size
+        self._items = OrderedDict()
+
+    def __contains__(self, version):
+        return version in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, version):
+        """Arrays of `version` (KeyError if not held), marked as most recently used."""
+        self._items.move_to_end(version)
+        return self._items[version]
+
+    def put(self, version, arrays):
+        self._items[version] = arrays
+        self._items.move_to_end(version)
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+    def versions(self):
+        """Held versions, least recently used first."""
+        return list(self._items)
+
+    def resolve(self, parameters, config):
+        """
+        Global model arrays for a fit/evaluate call from `parameters` as sent
+        and the `model_version` / `model_encoding` / `model_base` config keys,
+        keeping the result as the newest version. Without a `model_version`
+        (a server without the model cache) `parameters` is returned unchanged.
+        """
+        version = config.get("model_version")
+        if not version:
+            return parameters
+        encoding = config.get("model_encoding", "full")
+        if encoding == "cached":
+            arrays = self.get(version)
+        elif encoding == "delta":
+            arrays = decode_delta(parameters, self.get(config["model_base"]))
+        else:
+            arrays = parameters
+        self.put(version, arrays)
+        return arrays
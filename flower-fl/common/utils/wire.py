@@ -0,0 +1,164 @@
+# common/utils/wire.py
+"""
+Wire formats of the Parameters exchanged by clients and the server.
+
+  numpy   Flower's default: one np.save'd .npy file per array
+  packed  every array in one contiguous bytes buffer behind a compact header;
+          decoding returns read-only np.frombuffer views into the buffer, so
+          nothing is copied or parsed per array
+
+Layout of a packed buffer (little-endian):
+
+  header   magic b"FLPK", version u8, flags u8, 2 pad bytes, array count u32,
+           data offset u32                                       → 16 bytes
+  entries  per array: dtype string (NumPy's dtype.str, NUL-padded) 8 bytes,
+           ndim u32, CRC32 u32 (0 without checksums), data offset u64,
+           then ndim dims as u64                         → 24 + 8·ndim bytes
+  data     each array's bytes in C order, starting at a multiple of ALIGN
+
+With `checksum` the CRC32 of every array is stored (flag bit 0) and checked on
+decode; a mismatch or a truncated or malformed buffer raises ValueError. Only plain numeric
+dtypes (bool, ints, floats, complex) are supported.
+"""
+import struct
+import zlib
+
+import numpy as np
+import flwr as fl
+from flwr.common import (Code, EvaluateRes, FitRes, GetParametersRes, GetPropertiesRes, Parameters, Status,
+                         ndarrays_to_parameters, parameters_to_ndarrays)
+
+WIRE_FORMATS = ("numpy", "packed")
+
+# tensor_type of packed Parameters: a single tensor holding the whole buffer
+PACKED = "numpy.ndarray.packed"
+
+MAGIC = b"FLPK"
+VERSION = 1
+FLAG_CRC32 = 1
+
+# Data offsets are multiples of this, so every view is aligned for SIMD loads
+ALIGN = 64
+
+_HEADER = struct.Struct("<4sBB2xII")
+_ENTRY = struct.Struct("<8sIIQ")
+
+
+def _aligned(n: int) -> int:
+    return -(-n // ALIGN) * ALIGN
+
+
+def pack(arrays, checksum: bool = False) -> bytes:
+    """One contiguous buffer holding `arrays` (see the module docstring for its layout)."""
+    arrays = [np.asarray(a, order="C") for a in arrays]
+    for a in arrays:
+        if a.dtype.kind not in "biufc":
+            raise ValueError(f"cannot pack arrays of dtype {a.dtype}")
+    offset = _aligned(_HEADER.size + sum(_ENTRY.size + 8 * a.ndim for a in arrays))
+    header = [_HEADER.pack(MAGIC, VERSION, FLAG_CRC32 if checksum else 0, len(arrays), offset)]
+    chunks = []
+    for a in arrays:
+        start = _aligned(offset)
+        crc = zlib.crc32(a) if checksum else 0
+        header.append(_ENTRY.pack(a.dtype.str.encode(), a.ndim, crc, start))
+        header.append(struct.pack(f"<{a.ndim}Q", *a.shape))
+        chunks.append(bytes(start - offset))
+        # Flat byte views: join copies each array's memory once, straight into the result
+        chunks.append(a.reshape(-1).view(np.uint8))
+        offset = start + a.nbytes
+    header = b"".join(header)
+    return b"".join([header, bytes(_aligned(len(header)) - len(header)), *chunks])
+
+
+def unpack(buffer, verify: bool = True) -> list:
+    """Read-only arrays viewing `buffer`, which must stay alive (and unchanged) while they are used."""
+    if len(buffer) < _HEADER.size:
+        raise ValueError("packed buffer is truncated")
+    magic, version, flags, count, _ = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("not a packed buffer")
+    if version != VERSION:
+        raise ValueError(f"packed buffer version {version}, expected {VERSION}")
+    arrays = []
+    pos = _HEADER.size
+    for i in range(count):
+        try:
+            dtype, ndim, crc, offset = _ENTRY.unpack_from(buffer, pos)
+            shape = struct.unpack_from(f"<{ndim}Q", buffer, pos + _ENTRY.size)
+            dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        except (struct.error, TypeError, UnicodeDecodeError) as e:
+            raise ValueError(f"packed buffer has a malformed entry for array {i}") from e
+        pos += _ENTRY.size + 8 * ndim
+        if dtype.kind not in "biufc":
+            raise ValueError(f"packed buffer has an unsupported dtype {dtype} (array {i})")
+        size = int(np.prod(shape, dtype=np.int64))
+        if offset + size * dtype.itemsize > len(buffer):
+            raise ValueError(f"packed buffer is truncated (array {i})")
+        a = np.frombuffer(buffer, dtype=dtype, count=size, offset=offset).reshape(shape)
+        if verify and flags & FLAG_CRC32 and zlib.crc32(a) != crc:
+            raise ValueError(f"checksum mismatch in array {i} of a packed buffer")
+        arrays.append(a)
+    return arrays
+
+
+def has_checksums(buffer) -> bool:
+    """Whether a packed buffer carries per-array checksums."""
+    return len(buffer) >= _HEADER.size and bool(_HEADER.unpack_from(buffer, 0)[2] & FLAG_CRC32)
+
+
+def to_parameters(arrays, wire: str = "numpy", checksum: bool = False) -> Parameters:
+    """`arrays` as Parameters in the given wire format."""
+    if wire == "packed":
+        return Parameters(tensors=[pack(arrays, checksum)], tensor_type=PACKED)
+    if wire != "numpy":
+        raise ValueError(f"Unknown wire format '{wire}', expected one of {WIRE_FORMATS}")
+    return ndarrays_to_parameters(arrays)
+
+
+def from_parameters(parameters: Parameters) -> list:
+    """parameters_to_ndarrays for either wire format (packed: views, see unpack)."""
+    if parameters.tensor_type == PACKED:
+        return unpack(parameters.tensors[0]) if parameters.tensors else []
+    return parameters_to_ndarrays(parameters)
+
+
+def wire_of(parameters: Parameters):
+    """(wire format, checksum) `parameters` were sent with, to reply in kind."""
+    if parameters.tensor_type == PACKED:
+        return "packed", bool(parameters.tensors) and has_checksums(parameters.tensors[0])
+    return "numpy", False
+
+
+class PackedClient(fl.client.Client):
+    """
+    Runs a NumPyClient on either wire format. Parameters from the server are
+    decoded by their tensor_type and results are sent back in the format (and
+    with the checksums) of the last Parameters received, so the client works
+    unchanged with servers on Flower's default format.
+    """
+
+    def __init__(self, numpy_client: fl.client.NumPyClient):
+        self.numpy_client = numpy_client
+        self.wire, self.checksum = "numpy", False
+
+    def _receive(self, parameters):
+        if parameters.tensors:  # Not a cached model (see common/utils/versions.py)
+            self.wire, self.checksum = wire_of(parameters)
+        return from_parameters(parameters)
+
+    def _send(self, arrays):
+        return to_parameters(arrays, self.wire, self.checksum)
+
+    def get_properties(self, ins):
+        return GetPropertiesRes(Status(Code.OK, "Success"), self.numpy_client.get_properties(ins.config))
+
+    def get_parameters(self, ins):
+        return GetParametersRes(Status(Code.OK, "Success"), self._send(self.numpy_client.get_parameters(ins.config)))
+
+    def fit(self, ins):
+        arrays, num_examples, metrics = self.numpy_client.fit(self._receive(ins.parameters), ins.config)
+        return FitRes(Status(Code.OK, "Success"), self._send(arrays), num_examples, metrics)
+
+    def evaluate(self, ins):
+        loss, num_examples, metrics = self.numpy_client.evaluate(self._receive(ins.parameters), ins.config)
+        return EvaluateRes(Status(Code.OK, "Success"), float(loss), num_examples, metrics)
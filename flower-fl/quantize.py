@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Export best_model.npz as an int8 TorchScript model for CPU inference.
+
+The CNN is rebuilt from the file as serve.py does, quantized (see
+common/models/quant.py) with activation ranges calibrated on a training folder,
+and saved with torch.jit, so it loads with torch.jit.load and no project code.
+With --eval-data the fp32 and int8 models are compared on that folder:
+accuracy, agreement of their predictions and forward time.
+
+    python quantize.py --model server/best_model.npz --calibration-data client/data/client_1/train \
+        --eval-data client/data/client_1/test --out best_model_int8.pt
+"""
+
+# Standard library imports
+import os, sys
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "server"))
+
+import argparse
+
+# Third-party imports
+import torch
+
+from common.models.quant import QUANT_MODES, calibration_batches, evaluate, export_int8, quantize_cnn, split_loader
+from serve import load_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export best_model.npz as an int8 TorchScript model")
+    parser.add_argument("--model", default="best_model.npz", help="Model file written by the server")
+    parser.add_argument("--mode", choices=QUANT_MODES, default="static")
+    parser.add_argument("--calibration-data", default=None,
+                        help="<class>/<image> folder calibrating activation ranges (required for static)")
+    parser.add_argument("--calibration-batches", type=int, default=8, help="Batches of 32 images used to calibrate")
+    parser.add_argument("--eval-data", default=None, help="<class>/<image> folder to compare fp32 and int8 on")
+    parser.add_argument("-o", "--out", default="best_model_int8.pt")
+    args = parser.parse_args()
+    if args.mode == "static" and not args.calibration_data:
+        parser.error("--mode static needs --calibration-data")
+
+    model, info = load_model(args.model)
+    calibration = []
+    if args.calibration_data:
+        calibration = calibration_batches(split_loader(args.calibration_data, 32, shuffle=True),
+                                          args.calibration_batches)
+    quantized = quantize_cnn(model, args.mode, calibration)
+    export_int8(quantized, args.out, torch.zeros(1, 3, 32, 32))
+    print(f"→ Saved int8 ({args.mode}) model of round {info['round']} to {args.out} "
+          f"({os.path.getsize(args.out) / 1e6:.2f} MB, fp32 weights {os.path.getsize(args.model) / 1e6:.2f} MB)")
+
+    if args.eval_data:
+        loader = split_loader(args.eval_data, 64)
+        fp32_acc, fp32_pred, fp32_s = evaluate(model, loader)
+        int8_acc, int8_pred, int8_s = evaluate(quantized, loader)
+        agree = float((fp32_pred == int8_pred).float().mean())
+        print(f"→ {len(fp32_pred)} images from {args.eval_data}: fp32 acc={fp32_acc:.4f} ({fp32_s:.3f}s), "
+              f"int8 acc={int8_acc:.4f} ({int8_s:.3f}s), delta={int8_acc - fp32_acc:+.4f}, agreement={agree:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Local HTTP inference service for best_model.npz.
+
+The CNN is rebuilt from the file (its size is read from the arrays) and every
+image is preprocessed exactly as load_client_data does: decoded to RGB, resized
+to IMAGE_SIZE × IMAGE_SIZE and scaled to [0, 1]. Requests are queued and run
+through the model in micro-batches: a batch starts with the oldest waiting
+request and runs once it holds --max-batch-size images or --max-wait-ms after
+that request arrived, whichever is first. When the model file changes (SaveBest
+replaces it atomically) the new model is loaded next to the old one and swapped
+in between batches, so no request is dropped or sees a half-loaded model.
+With --int8 every loaded model is quantized first (see common/models/quant.py).
+
+    POST /predict   body: one image file (JPEG, PNG, ...)
+                    → {"class": "notes", "index": 2, "probabilities": {...}, "round": 17}
+    GET  /health    → model file, round and loss, reloads, requests and batches served
+
+    python serve.py --model server/best_model.npz -p 8000 --max-batch-size 32 --max-wait-ms 5
+    curl --data-binary @screenshot.png http://127.0.0.1:8000/predict
+"""
+
+# Standard library imports
+import os, sys
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "server"))
+
+import argparse
+import io
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Third-party imports
+import numpy as np
+import torch
+from PIL import Image
+
+from checkpoint import load_weights
+from common.models.cnn import build_model
+from common.models.quant import QUANT_MODES, calibration_batches, quantize_cnn, split_loader
+from common.models.spec import cnn_spec
+from common.utils.data import CLASS_NAMES, build_transform
+from common.utils.params import ParameterBridge
+
+
+def load_model(path, int8=None, calibration=None):
+    """
+    Return (model in eval mode, metadata) for a best_model.npz-style file; with
+    `int8` ("static" / "dynamic") an int8 copy calibrated on `calibration`.
+    """
+    arrays = load_weights(path)
+    if len(arrays) != 8:
+        raise ValueError(f"{path} holds {len(arrays)} arrays, expected the CNN's 8")
+    # fc1.bias and fc2.bias give the model's size
+    hidden_units, num_classes = arrays[5].shape[0], arrays[7].shape[0]
+    shapes = [shape for _, shape in cnn_spec(num_classes, hidden_units)]
+    if [a.shape for a in arrays] != shapes:
+        raise ValueError(f"{path} does not hold CNN weights")
+    model = build_model(num_classes=num_classes, hidden_units=hidden_units).eval()
+    ParameterBridge(model).load(arrays)
+    if int8:
+        model = quantize_cnn(model, int8, calibration)
+    metadata = {}
+    with np.load(path, allow_pickle=True) as data:
+        if "metadata" in data.files:
+            metadata = data["metadata"].item()
+    return model, {"round": metadata.get("round"), "loss": metadata.get("loss"), "num_classes": num_classes,
+                   "int8": int8}
+
+
+def file_stamp(path):
+    """Changes whenever the file is replaced or rewritten; None if it is missing."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class MicroBatcher:
+    """
+    Runs queued images through the model in batches on one thread.
+
+    `submit` returns a Future of (probabilities, model info). `model` and `info`
+    may be replaced at any time; each batch uses the pair current when it starts.
+    """
+
+    def __init__(self, model, info, max_batch_size=32, max_wait_ms=5.0):
+        self.model, self.info = model, info
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = 0
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def swap(self, model, info):
+        self.model, self.info = model, info
+
+    def submit(self, image):
+        future = Future()
+        self._queue.put((image, future, time.monotonic()))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        """Block for the next request, then take more until the batch is full or its wait is up."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Stop after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            model, info = self.model, self.info
+            try:
+                with torch.inference_mode():
+                    probs = torch.softmax(model(torch.stack([image for image, _, _ in batch])), dim=1).numpy()
+            except Exception as err:
+                for _, future, _ in batch:
+                    future.set_exception(err)
+                continue
+            self.requests += len(batch)
+            self.batches += 1
+            for (_, future, _), p in zip(batch, probs):
+                future.set_result((p, info))
+
+
+class ModelWatcher:
+    """Polls the model file and swaps a newly written model into the batcher."""
+
+    def __init__(self, path, batcher, interval=1.0, load=load_model):
+        self.path = path
+        self.batcher = batcher
+        self.load = load  # path -> (model, info)
+        self.interval = interval
+        self.reloads = 0
+        self._stamp = file_stamp(path)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            stamp = file_stamp(self.path)
+            if stamp is None or stamp == self._stamp:
+                continue
+            try:
+                model, info = self.load(self.path)
+            except Exception as err:
+                # Keep serving the current model; try again once the file changes again
+                print(f"→ Could not reload {self.path}: {err}")
+            else:
+                self.batcher.swap(model, info)
+                self.reloads += 1
+                print(f"→ Reloaded {self.path} (round {info['round']}, loss {info['loss']})")
+            self._stamp = stamp
+
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # socketserver's default of 5 refuses bursts of new clients
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so clients can reuse their connection
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._reply(404, {"error": f"unknown path {self.path}"})
+        batcher, watcher = self.server.batcher, self.server.watcher
+        self._reply(200, {
+            "model": str(watcher.path),
+            **batcher.info,
+            "reloads": watcher.reloads,
+            "requests": batcher.requests,
+            "batches": batcher.batches,
+            "mean_batch": batcher.requests / batcher.batches if batcher.batches else 0.0,
+        })
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/predict":
+            return self._reply(404, {"error": f"unknown path {self.path}"})
+        try:
+            # Same decoding (torchvision's default_loader) and transform as load_client_data
+            image = self.server.transform(Image.open(io.BytesIO(body)).convert("RGB"))
+        except Exception as err:
+            return self._reply(400, {"error": f"cannot read image: {err}"})
+        try:
+            probs, info = self.server.batcher.submit(image).result(timeout=self.server.request_timeout)
+        except Exception as err:
+            return self._reply(500, {"error": f"{type(err).__name__}: {err}"})
+        names = CLASS_NAMES if len(probs) == len(CLASS_NAMES) else [str(i) for i in range(len(probs))]
+        index = int(probs.argmax())
+        self._reply(200, {
+            "class": names[index],
+            "index": index,
+            "probabilities": {name: float(p) for name, p in zip(names, probs)},
+            "round": info["round"],
+        })
+
+    def log_message(self, format, *args):
+        pass  # One line per request would cost more than the prediction
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve best_model.npz predictions over HTTP with micro-batching")
+    parser.add_argument("--model", default="best_model.npz", help="Model file written by the server (watched for updates)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=32, help="Images run through the model at once")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="Longest a request waits for others to share its batch")
+    parser.add_argument("--reload-interval", type=float, default=1.0, help="Seconds between checks of the model file")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads (default: torch's)")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="Seconds before a request gives up")
+    parser.add_argument("--int8", choices=QUANT_MODES, default=None, help="Serve an int8 copy of the model")
+    parser.add_argument("--calibration-data", default=None,
+                        help="With --int8 static: <class>/<image> folder calibrating activation ranges, "
+                             "e.g. client/data/client_1/train")
+    parser.add_argument("--calibration-batches", type=int, default=8, help="Batches of 32 images used to calibrate")
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    calibration = None
+    if args.int8 == "static":
+        if not args.calibration_data:
+            parser.error("--int8 static needs --calibration-data")
+        calibration = calibration_batches(split_loader(args.calibration_data, 32, shuffle=True),
+                                          args.calibration_batches)
+
+    load = lambda path: load_model(path, args.int8, calibration)
+    model, info = load(args.model)
+    batcher = MicroBatcher(model, info, args.max_batch_size, args.max_wait_ms)
+    watcher = ModelWatcher(args.model, batcher, args.reload_interval, load)
+    httpd = InferenceServer((args.host, args.port), Handler)
+    httpd.batcher, httpd.watcher = batcher, watcher
+    httpd.transform = build_transform()
+    httpd.request_timeout = args.request_timeout
+    print(f"→ Serving {args.model} (round {info['round']}, {info['num_classes']} classes, "
+          f"{'int8 ' + args.int8 if args.int8 else 'fp32'}) on "
+          f"http://{args.host}:{args.port} | batch ≤ {args.max_batch_size}, wait ≤ {args.max_wait_ms} ms")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        watcher.close()
+        batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Server-side (centralized) evaluation of the global model on a held-out set.
+
+The held-out folder (<class>/<image> like a client's test/ split) is decoded
+once through the client data cache and kept in memory as one float tensor, so
+each evaluation is just a few large forward passes: no image decoding, no
+DataLoader and nothing sent to clients.
+"""
+
+# Standard library imports
+import time
+from pathlib import Path
+
+# Third-party imports
+import torch
+import torch.nn.functional as F
+
+from common.models.cnn import build_model
+from common.utils.data import load_cached_split
+from common.utils.params import ParameterBridge
+
+
+class CentralEvaluator:
+    """`evaluate_fn` for Flower strategies: (server_round, ndarrays, config) -> (loss, metrics)."""
+
+    def __init__(self, data_dir, num_classes=5, hidden_units=128, batch_size=512):
+        data_dir = Path(data_dir)
+        if not data_dir.is_dir():
+            raise FileNotFoundError(f"Held-out data folder not found: {data_dir}")
+        # Same cache location a client uses for its own splits (client_<ID>/.cache/<split>)
+        dataset = load_cached_split(data_dir, data_dir.parent / ".cache" / data_dir.name)
+        if len(dataset) == 0:
+            raise ValueError(f"No images under {data_dir}")
+        self.images = torch.from_numpy(dataset.images[:]).float().div_(255)
+        self.labels = torch.from_numpy(dataset.labels)
+        self.batch_size = batch_size
+        self.model = build_model(num_classes=num_classes, hidden_units=hidden_units).eval()
+        self.params = ParameterBridge(self.model)
+        print(f"→ Centralized evaluation on {len(self.labels)} held-out images from {data_dir}")
+
+    def __call__(self, server_round, ndarrays, config):
+        start = time.perf_counter()
+        self.params.load(ndarrays)
+        loss_sum, correct = 0.0, 0
+        with torch.inference_mode():
+            for i in range(0, len(self.labels), self.batch_size):
+                x = self.images[i:i + self.batch_size]
+                y = self.labels[i:i + self.batch_size]
+                outputs = self.model(x)
+                loss_sum += float(F.cross_entropy(outputs, y, reduction="sum"))
+                correct += int((outputs.argmax(dim=1) == y).sum())
+        total = len(self.labels)
+        loss, accuracy = loss_sum / total, correct / total
+        elapsed = time.perf_counter() - start
+        print(f"→ Round {server_round}: centralized loss={loss:.4f}, acc={accuracy:.4f} ({elapsed:.2f}s)")
+        return loss, {"accuracy": accuracy, "eval_s": elapsed, "eval_samples": total}
@@ -0,0 +1,160 @@
+"""
+Crash-safe checkpoints for the Flower server.
+
+Each finished fit round is saved as <dir>/round_<N>.npz, holding the global
+weights, the round number and the strategy's own state (best loss so far, and
+the server-optimizer moments of FedAdam/FedYogi/FedAdagrad). Files are written
+by a background thread, so aggregation never waits on the disk, and always go
+to a temporary file that is renamed into place: a crash mid-write leaves the
+previous checkpoint intact. Only the last `keep_last` round checkpoints are
+kept (all of them if it is 0); the best model is a separate file and is never
+pruned.
+"""
+
+# Standard library imports
+import json
+import os
+import queue
+import re
+import threading
+import time
+from logging import WARNING
+from pathlib import Path
+
+# Third-party and Flower (FL) imports
+import numpy as np
+from flwr.common.logger import log
+
+ROUND_FILE = re.compile(r"round_(\d+)\.npz$")
+
+
+def atomic_savez(path, *args, **kwargs):
+    """np.savez to `path` through a temporary file renamed into place."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, *args, **kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def save_checkpoint(path, rnd, parameters, state):
+    """Write one round checkpoint.
+
+    `state` maps names to lists of arrays (e.g. optimizer moments) or to plain
+    JSON values (e.g. the best loss).
+    """
+    arrays = {f"parameters_{i}": a for i, a in enumerate(parameters)}
+    meta = {"round": rnd, "num_parameters": len(parameters), "state": {}, "array_state": {}}
+    for key, value in state.items():
+        if isinstance(value, list) and value and isinstance(value[0], np.ndarray):
+            meta["array_state"][key] = len(value)
+            arrays.update({f"{key}_{i}": a for i, a in enumerate(value)})
+        else:
+            meta["state"][key] = value
+    atomic_savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def load_checkpoint(path):
+    """Return (round, parameters, state) saved by `save_checkpoint`."""
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        parameters = [data[f"parameters_{i}"] for i in range(meta["num_parameters"])]
+        state = dict(meta["state"])
+        for key, n in meta["array_state"].items():
+            state[key] = [data[f"{key}_{i}"] for i in range(n)]
+    return meta["round"], parameters, state
+
+
+def load_weights(path):
+    """
+    Model weights from a round checkpoint, a best_model.npz, or any np.savez of
+    the arrays in state_dict order (arr_0, arr_1, ...).
+    """
+    with np.load(path) as data:
+        if "meta" not in data.files:
+            names = sorted((f for f in data.files if f.startswith("arr_")), key=lambda f: int(f[4:]))
+            return [data[name] for name in names]
+    return load_checkpoint(path)[1]
+
+
+def list_checkpoints(directory):
+    """Round checkpoints in `directory`, oldest first, as (round, path)."""
+    found = []
+    for path in Path(directory).glob("round_*.npz"):
+        match = ROUND_FILE.search(path.name)
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
+
+
+def latest_checkpoint(directory):
+    """Path of the newest round checkpoint in `directory`, or None."""
+    found = list_checkpoints(directory)
+    return found[-1][1] if found else None
+
+
+class CheckpointWriter:
+    """Writes checkpoints on a background thread.
+
+    The queue holds at most `max_pending` checkpoints; if the disk falls that
+    far behind, `save_round` blocks rather than piling up copies of the model.
+    A failed write is logged and training goes on. `on_write(kind, round,
+    seconds, bytes)` is called from the writer thread after each file.
+    """
+
+    def __init__(self, directory, keep_last=3, max_pending=2, on_write=None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.keep_last = keep_last
+        self.on_write = on_write
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def save_round(self, rnd, parameters, state):
+        """Queue the checkpoint of round `rnd`; the arrays must not be modified afterwards."""
+        self._queue.put(("round", rnd, parameters, state))
+
+    def save_best(self, path, arrays, metadata):
+        """Queue a best_model.npz-style file: the arrays plus a `metadata` dict."""
+        self._queue.put(("best", path, arrays, metadata))
+
+    def flush(self):
+        """Block until everything queued so far is on disk."""
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                kind, target, arrays, extra = job
+                start = time.perf_counter()
+                if kind == "round":
+                    path, rnd = self.directory / f"round_{target:05d}.npz", target
+                    save_checkpoint(path, target, arrays, extra)
+                    self._prune()
+                else:
+                    path, rnd = Path(target), extra.get("round")
+                    atomic_savez(path, *arrays, metadata=extra)
+                if self.on_write is not None:
+                    self.on_write(kind, rnd, time.perf_counter() - start, path.stat().st_size)
+            except Exception as err:
+                log(WARNING, "Checkpoint write failed: %s", err)
+            finally:
+                del job
+                self._queue.task_done()
+
+    def _prune(self):
+        if self.keep_last <= 0:  # Keep every round
+            return
+        for _, path in list_checkpoints(self.directory)[:-self.keep_last]:
+            path.unlink(missing_ok=True)
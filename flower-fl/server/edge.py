@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Edge aggregator: a server to the clients of one site, a single client to the root.
+
+Clients connect to the edge exactly as they would to server.py. When the root
+asks the edge to fit, the edge runs a round on its own clients with the root's
+config (StreamingServer + SaveBest, so codecs, deadlines and the model cache
+all work locally) and returns one update: the example-weighted average of its
+clients' models, with the summed example count, re-encoded with the root's
+codec. The root's model is taken in float32 whatever its downlink encoding, so
+the site's updates are averaged in full precision; what the site's clients are
+sent is set by the edge's own --downlink-codec. The root's FedAvg then weights
+edges exactly as it would have weighted their clients. Evaluation returns the example-weighted loss over all edge
+clients, their summed `misclassified`, their mean `accuracy` and the number of
+clients behind it (`clients`), which aggregate_metrics weights accuracy by.
+
+    python server.py -p 8080 --min-clients 2
+    python edge.py --root 127.0.0.1:8080 -p 8081 --min-clients 50
+    python edge.py --root 127.0.0.1:8080 -p 8082 --min-clients 50
+    python ../client/client_v2.py -c 1 -s 127.0.0.1:8081  # ... one per client
+"""
+
+# Standard library imports
+import os, sys
+# Add the project root directory to the Python path so that 'common/' can be imported
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Third-party and Flower (FL) imports
+import argparse
+import time
+import flwr as fl
+import numpy as np
+from flwr.common import GRPC_MAX_MESSAGE_LENGTH
+from flwr.server import SimpleClientManager
+from flwr.server.strategy import FedAvg
+from flwr.server.superlink.fleet.grpc_bidi.grpc_server import start_grpc_server
+
+from common.utils.codec import encode_update, nbytes
+from common.utils.profiling import peak_memory_mb
+from common.utils.versions import VersionCache
+from common.utils.wire import WIRE_FORMATS, PackedClient, from_parameters
+from server import aggregate_fit_metrics, aggregate_metrics, make_savebest_strategy
+from streaming import StreamingServer
+
+
+class EdgeStrategy(make_savebest_strategy(FedAvg)):
+    """SaveBest for the edge's own clients; the root decides which model is best."""
+
+    def save_if_best(self, rnd, loss, metrics, ndarrays):
+        pass
+
+
+class EdgeClient(fl.client.NumPyClient):
+    """The edge as seen by the root server: one client standing for all of the site's clients."""
+
+    def __init__(self, name, server=None, model_cache=3):
+        self.server = server   # StreamingServer of the site's clients
+        self.name = name
+        self.versions = VersionCache(model_cache)  # Models from the root (see common/utils/versions.py)
+        self.residual = None   # Top-k error feedback towards the root
+        self.config = {}       # Root config of the current call, passed on to the edge's clients
+        self.latest = []       # Last model received from the root
+        self.round = 0         # Root round last trained (evaluate configs do not carry it)
+
+    def fit_config(self, rnd):
+        return self.config
+
+    def get_parameters(self, config):
+        return self.latest
+
+    def _begin(self, parameters, config):
+        """Take the root's model and config as the edge server's own."""
+        # float32 like the root's master weights: with an fp16 downlink from the root the
+        # site's updates would otherwise be averaged, and sent back up, in fp16
+        self.latest = [a.astype(np.float32, copy=False) for a in self.versions.resolve(parameters, config)]
+        # Model version keys address the root's cache, not the edge's
+        self.config = {k: v for k, v in config.items() if not k.startswith("model_")}
+        self.server.parameters = self.server.strategy.wire_parameters(self.latest)
+        self.round = int(config.get("server_round", self.round))
+        return self.round
+
+    def _metrics(self, start, clients):
+        metrics = {
+            "cid": self.name,
+            "clients": clients,
+            "t_total": time.perf_counter() - start,
+            "peak_mem_mb": peak_memory_mb(),
+        }
+        if len(self.versions):
+            metrics["model_versions"] = ",".join(self.versions.versions())
+        return metrics
+
+    def fit(self, parameters, config):
+        start = time.perf_counter()
+        rnd = self._begin(parameters, config)
+        res = self.server.fit_round(server_round=rnd, timeout=None)
+        if res is None or res[0] is None:
+            raise RuntimeError(f"{self.name}: no client update in round {rnd}")
+        params, metrics, _ = res
+        averaged = from_parameters(params)
+        examples = int(metrics["examples"])
+
+        # Forward the combined update the way a client would send its own
+        codec = str(config.get("codec", "none"))
+        if codec == "topk" and self.residual is None:
+            self.residual = [a * 0 for a in averaged]
+        payload = encode_update(
+            averaged, self.latest, codec,
+            per_channel=bool(config.get("int8_per_channel", False)),
+            stochastic=bool(config.get("stochastic_rounding", False)),
+            topk_ratio=float(config.get("topk_ratio", 0.01)),
+            residual=self.residual,
+        )
+        clients = int(metrics.get("clients", 0))
+        print(f"→ {self.name}: round {rnd} combined {clients} client updates ({examples} examples), "
+              f"sending {nbytes(payload) / 1e6:.2f} MB")
+        out = self._metrics(start, clients)
+        out.update({
+            "codec": codec,
+            "bytes_up": nbytes(payload),
+            "samples": examples,
+            "local_epochs": int(config.get("local_epochs", 1)),
+            "samples_per_s": examples / out["t_total"] if out["t_total"] > 0 else 0.0,
+        })
+        return payload, examples, out
+
+    def evaluate(self, parameters, config):
+        start = time.perf_counter()
+        rnd = self._begin(parameters, config)
+        res = self.server.evaluate_round(server_round=rnd, timeout=None)
+        if res is None or res[0] is None:
+            raise RuntimeError(f"{self.name}: no client evaluated round {rnd}")
+        loss, metrics, (results, _) = res
+        examples = sum(r.num_examples for _, r in results)
+        out = self._metrics(start, int(sum(r.metrics.get("clients", 1) for _, r in results)))
+        out.update({"accuracy": metrics["accuracy"], "misclassified": int(metrics["misclassified"])})
+        print(f"→ {self.name}: round {rnd} evaluated on {out['clients']} clients, loss={loss:.4f}")
+        return float(loss), examples, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flower edge aggregator between a site's clients and the root server")
+    parser.add_argument("--root", required=True, help="Root server address, e.g. 10.0.0.1:8080")
+    parser.add_argument("-p", "--port", type=int, default=8081, help="Port the site's clients connect to")
+    parser.add_argument("--name", default=None, help="Name in the root's logs (default: edge-<port>)")
+    parser.add_argument("--min-clients", type=int, default=1, help="Site clients to wait for before each round")
+    parser.add_argument("--round-deadline", type=float, default=None,
+                        help="Seconds a local fit round waits for clients (default: wait for all)")
+    parser.add_argument("--late-grace", type=float, default=0.0)
+    parser.add_argument("--late-discount", type=float, default=0.5)
+    parser.add_argument("--downlink-codec", type=str, default="none", choices=["none", "fp16"],
+                        help="Encoding of the global model sent to the site's clients")
+    parser.add_argument("--model-cache", type=int, default=0,
+                        help="Model versions remembered for hash-only / delta downlink to the site's clients")
+    parser.add_argument("--wire", type=str, default="numpy", choices=WIRE_FORMATS,
+                        help="Serialization of the models sent to the site's clients (the root's is mirrored)")
+    parser.add_argument("--wire-checksum", action="store_true", help="packed wire: CRC32-check every array")
+    parser.add_argument("--aggregation-workers", type=int, default=None,
+                        help="Threads folding client updates (default: all cores)")
+    args = parser.parse_args()
+    name = args.name or f"edge-{args.port}"
+
+    client_manager = SimpleClientManager()
+    client = EdgeClient(name)
+    strategy = EdgeStrategy(
+        fraction_fit=1.0,
+        fraction_evaluate=1.0,
+        min_fit_clients=args.min_clients,
+        min_evaluate_clients=args.min_clients,
+        min_available_clients=args.min_clients,
+        evaluate_metrics_aggregation_fn=aggregate_metrics,
+        fit_metrics_aggregation_fn=aggregate_fit_metrics,
+        on_fit_config_fn=client.fit_config,
+        on_evaluate_config_fn=client.fit_config,
+        downlink_codec=args.downlink_codec,
+        model_cache=args.model_cache,
+        wire=args.wire,
+        wire_checksum=args.wire_checksum,
+        aggregation_workers=args.aggregation_workers,
+    )
+    client.server = StreamingServer(
+        client_manager=client_manager,
+        strategy=strategy,
+        round_deadline=args.round_deadline,
+        late_grace=args.late_grace,
+        late_discount=args.late_discount,
+    )
+
+    grpc_server = start_grpc_server(
+        client_manager=client_manager,
+        server_address=f"0.0.0.0:{args.port}",
+        max_message_length=GRPC_MAX_MESSAGE_LENGTH,
+    )
+    print(f"→ {name}: accepting clients on 0.0.0.0:{args.port}, connecting to root at {args.root}")
+    try:
+        fl.client.start_client(server_address=args.root, client=PackedClient(client))
+    finally:
+        # The root has finished: release the site's clients too
+        client.server.disconnect_all_clients(timeout=None)
+        grpc_server.stop(grace=1)
+
+
+if __name__ == "__main__":
+    main()
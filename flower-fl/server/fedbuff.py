@@ -0,0 +1,225 @@
+"""
+Asynchronous buffered aggregation (FedBuff) for the Flower server.
+
+Synchronous rounds wait for the slowest client every time. Here each client is
+handed the latest global model as soon as it returns an update, and the server
+aggregates whenever `buffer_size` updates have arrived. An update trained on a
+model that is already `s` aggregations old is down-weighted by 1 / (1 + s) ** 0.5.
+"""
+
+# Standard library imports
+import queue
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from logging import INFO
+
+# Third-party and Flower (FL) imports
+from flwr.common import Code
+from flwr.common.logger import log
+from flwr.server import History
+from flwr.server.server import evaluate_client, fit_client
+from flwr.server.strategy import FedAvg
+
+from common.utils.wire import from_parameters
+from streaming import IdleClients, StreamingServer
+
+
+class FedBuff(FedAvg):
+    """FedAvg configuration for AsyncBufferedServer.
+
+    One round is one aggregation of `buffer_size` client updates. Updates more
+    than `max_staleness` aggregations old are dropped.
+    """
+
+    # Clients train through aggregations: server.py runs AsyncBufferedServer for it
+    asynchronous = True
+
+    def __init__(self, *args, buffer_size=2, staleness_exponent=0.5, max_staleness=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buffer_size = buffer_size
+        self.staleness_exponent = staleness_exponent
+        self.max_staleness = max_staleness
+
+    def __repr__(self):
+        return f"FedBuff(buffer_size={self.buffer_size}, staleness_exponent={self.staleness_exponent})"
+
+    def staleness_weight(self, staleness: int) -> float:
+        """Scale applied to an update trained on a model `staleness` aggregations old."""
+        if self.max_staleness is not None and staleness > self.max_staleness:
+            return 0.0
+        return (1.0 + staleness) ** -self.staleness_exponent
+
+
+class AsyncBufferedServer(StreamingServer):
+    """Flower server running FedBuff instead of synchronous rounds.
+
+    `num_rounds` counts aggregations. Each new global model is evaluated on the
+    clients while training goes on: a client gets the evaluation before its next
+    fit, and the strategy's `aggregate_evaluate` (best-model saving) runs once the
+    whole evaluation cohort has answered. Updates still in flight after the last
+    aggregation are collected and discarded, so clients end between two tasks.
+    """
+
+    def fit(self, num_rounds, timeout):
+        if not isinstance(self.strategy, FedBuff):
+            return super().fit(num_rounds, timeout)
+        history = History()
+
+        log(INFO, "[INIT]")
+        self.parameters = self._get_initial_parameters(server_round=self.start_round, timeout=timeout)
+        if self.start_round == 0:
+            res = self.strategy.evaluate(0, parameters=self.parameters)
+            if res is not None:
+                history.add_loss_centralized(server_round=0, loss=res[0])
+                history.add_metrics_centralized(server_round=0, metrics=res[1])
+        self._client_manager.wait_for(self.strategy.min_available_clients)
+
+        start_time = last_time = timeit.default_timer()
+        version = self.start_round     # Aggregations so far = version of the global model
+        bases = {version: from_parameters(self.parameters)}  # Models clients are training from
+        busy = {}                      # cid -> ("fit", version started from) or ("evaluate", round)
+        done = queue.Queue()
+        buffered, staleness, failures = 0, [], []
+        updates, discarded = 0, 0
+        evaluating, evaluated = None, version  # Round under evaluation, last round evaluated
+        pending_eval, eval_results, eval_failures = {}, [], []
+        cohort = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+
+            def submit(kind, fn, proxy, ins, tag, group_id):
+                busy[proxy.cid] = (kind, tag)
+                future = executor.submit(fn, proxy, ins, timeout, group_id)
+                future.add_done_callback(lambda f: done.put((kind, tag, proxy, f)))
+
+            def dispatch():
+                # A client owes the current evaluation before it trains again
+                for cid in list(pending_eval):
+                    if cid not in busy:
+                        proxy, ins = pending_eval.pop(cid)
+                        submit("evaluate", evaluate_client, proxy, ins, evaluating, evaluating)
+                if version < num_rounds:
+                    idle = IdleClients(self._client_manager, busy)
+                    for proxy, ins in self.strategy.configure_fit(version + 1, self.parameters, idle):
+                        submit("fit", fit_client, proxy, ins, version, version + 1)
+
+            def start_evaluation():
+                nonlocal evaluating, cohort
+                if evaluating is not None or version == evaluated:
+                    return
+                instructions = self.strategy.configure_evaluate(
+                    server_round=version, parameters=self.parameters, client_manager=self._client_manager
+                )
+                if instructions:
+                    evaluating, cohort = version, len(instructions)
+                    pending_eval.update({proxy.cid: (proxy, ins) for proxy, ins in instructions})
+
+            def finish_evaluation():
+                nonlocal evaluating, evaluated, eval_results, eval_failures
+                loss, metrics = self.strategy.aggregate_evaluate(evaluating, eval_results, eval_failures)
+                if loss is not None:
+                    history.add_loss_distributed(server_round=evaluating, loss=loss)
+                    history.add_metrics_distributed(server_round=evaluating, metrics=metrics)
+                evaluated, evaluating = evaluating, None
+                eval_results, eval_failures = [], []
+                start_evaluation()
+
+            def aggregate():
+                nonlocal version, buffered, staleness, failures, last_time
+                rnd = version + 1
+                finish_start = timeit.default_timer()
+                params, metrics = self.strategy.finish_fit_round(rnd, failures)
+                if params is not None:
+                    self.parameters = params
+                now = timeit.default_timer()
+                metrics = {
+                    **(metrics or {}),
+                    "staleness_mean": sum(staleness) / len(staleness),
+                    "staleness_max": max(staleness),
+                    "round_s": now - last_time,
+                    "aggregate_s": now - finish_start,
+                }
+                last_time = now
+                print(
+                    f"→ Round {rnd}: aggregated {buffered} updates "
+                    f"(staleness mean {metrics['staleness_mean']:.2f}, max {metrics['staleness_max']}) "
+                    f"after {timeit.default_timer() - start_time:.1f}s"
+                )
+                history.add_metrics_distributed_fit(server_round=rnd, metrics=metrics)
+                version = rnd
+                bases[version] = from_parameters(self.parameters)
+                buffered, staleness, failures = 0, [], []
+
+                res_cen = self.strategy.evaluate(rnd, parameters=self.parameters)
+                if res_cen is not None:
+                    history.add_loss_centralized(server_round=rnd, loss=res_cen[0])
+                    history.add_metrics_centralized(server_round=rnd, metrics=res_cen[1])
+                start_evaluation()
+
+            def collect_fit(started, proxy, future):
+                nonlocal buffered, updates, discarded
+                if version >= num_rounds:
+                    discarded += 1
+                    return
+                if future.exception() is not None:
+                    failures.append(future.exception())
+                    return
+                _, res = future.result()
+                if res.status.code != Code.OK:
+                    failures.append((proxy, res))
+                    return
+                scale = self.strategy.staleness_weight(version - started)
+                if scale == 0.0:
+                    discarded += 1
+                    return
+                try:
+                    self.strategy.fold_fit_result(
+                        version + 1, proxy, res, base=bases[started], scale=scale
+                    )
+                except ValueError as err:
+                    failures.append(err)
+                    return
+                buffered += 1
+                updates += 1
+                staleness.append(version - started)
+                if buffered >= self.strategy.buffer_size:
+                    aggregate()
+
+            def collect_evaluate(proxy, future):
+                if future.exception() is not None:
+                    eval_failures.append(future.exception())
+                else:
+                    _, res = future.result()
+                    if res.status.code == Code.OK:
+                        eval_results.append((proxy, res))
+                    else:
+                        eval_failures.append((proxy, res))
+                if len(eval_results) + len(eval_failures) == cohort:
+                    finish_evaluation()
+
+            dispatch()
+            while busy:
+                kind, tag, proxy, future = done.get()
+                del busy[proxy.cid]
+                if kind == "fit":
+                    collect_fit(tag, proxy, future)
+                else:
+                    collect_evaluate(proxy, future)
+                del future
+                # Forget models no client is training from any more
+                live = {tag for kind, tag in busy.values() if kind == "fit"} | {version}
+                for v in list(bases):
+                    if v not in live:
+                        del bases[v]
+                dispatch()
+                if not busy and version < num_rounds:
+                    # Every client left; carry on once one is back
+                    self._client_manager.wait_for(1)
+                    dispatch()
+
+        elapsed = timeit.default_timer() - start_time
+        print(
+            f"→ FedBuff: {updates} updates in {version - self.start_round} aggregations over {elapsed:.1f}s "
+            f"({updates / elapsed * 60:.1f} updates/min, {discarded} discarded)"
+        )
+        return history, elapsed
@@ -0,0 +1,184 @@
+"""
+Fit cohort selection for the Flower server.
+
+The strategy samples every available client as usual; a sampler then picks the
+round's cohort among them and may tailor each client's fit config.
+
+  random      `cohort_size` clients at random (all of them by default)
+  throughput  learns each client's speed and reliability from the metrics it
+              returns with `fit` and picks the cohort expected to finish
+              soonest; clients never seen train first, and a client left out
+              for too long is picked regardless of speed, so every client's
+              data keeps contributing. With `balance_epochs` faster clients
+              are given more local epochs, up to the time the cohort's median
+              client needs anyway.
+"""
+
+# Standard library imports
+import math
+import random
+import statistics
+
+SAMPLERS = ("random", "throughput")
+
+
+class ClientProfile:
+    """Rolling view of one client, from the results of its fits."""
+
+    __slots__ = ("rate", "epoch_samples", "latency", "failure_rate", "fits", "failures", "last_picked")
+
+    def __init__(self):
+        self.rate = None           # Samples trained per second of fit (incl. decode/encode)
+        self.epoch_samples = None  # Samples in one local epoch
+        self.latency = None        # Seconds per fit
+        self.failure_rate = 0.0    # Share of recent fits that failed or missed the round
+        self.fits = 0
+        self.failures = 0
+        self.last_picked = None    # Selection at which the client was last picked
+
+
+def _ema(old, new, smoothing):
+    return new if old is None else (1 - smoothing) * old + smoothing * new
+
+
+class RandomSampler:
+    """Random cohort of `cohort_size` clients; keeps client profiles for the logs."""
+
+    name = "random"
+
+    def __init__(self, cohort_size=None, smoothing=0.3, seed=None):
+        self.cohort_size = cohort_size
+        self.smoothing = smoothing  # Weight of the newest observation in the rolling profile
+        self.rng = random.Random(seed)
+        self.profiles = {}          # cid -> ClientProfile
+        self.selections = 0         # Cohorts picked so far
+        self._pending = set()       # cids picked whose result has not arrived
+
+    def profile(self, cid):
+        if cid not in self.profiles:
+            self.profiles[cid] = ClientProfile()
+        return self.profiles[cid]
+
+    def cohort_limit(self, available):
+        return min(self.cohort_size or available, available)
+
+    def select(self, server_round, instructions):
+        """The (proxy, FitIns) pairs of this round's cohort."""
+        if not instructions:
+            return instructions
+        self.selections += 1
+        chosen = self.choose(server_round, instructions, self.cohort_limit(len(instructions)))
+        for proxy, _ in chosen:
+            self.profile(proxy.cid).last_picked = self.selections
+            self._pending.add(proxy.cid)
+        return chosen
+
+    def choose(self, server_round, instructions, k):
+        return self.rng.sample(instructions, k)
+
+    def fit_config(self, cid, config):
+        """Config sent to client `cid` (a copy of the round's config, may be changed in place)."""
+        return config
+
+    def record_fit(self, cid, num_examples, metrics):
+        """Learn from a successful fit result."""
+        self._pending.discard(cid)
+        p = self.profile(cid)
+        p.fits += 1
+        p.failure_rate = _ema(p.failure_rate, 0.0, self.smoothing)
+        t_total = float(metrics.get("t_total", 0.0))
+        samples = int(metrics.get("samples", num_examples))
+        if t_total > 0 and samples > 0:
+            p.latency = _ema(p.latency, t_total, self.smoothing)
+            p.rate = _ema(p.rate, samples / t_total, self.smoothing)
+        if not metrics.get("out_of_time", False):
+            p.epoch_samples = samples / max(int(metrics.get("local_epochs", 1)), 1)
+
+    def record_failure(self, cid):
+        self._pending.discard(cid)
+        p = self.profile(cid)
+        p.failures += 1
+        p.failure_rate = _ema(p.failure_rate, 1.0, self.smoothing)
+
+    def end_round(self):
+        """Count clients picked this round whose result never came (dropped, timed out) as failed."""
+        for cid in list(self._pending):
+            self.record_failure(cid)
+
+    def expected_time(self, cid, epochs=1):
+        """Seconds client `cid` should take to fit `epochs` epochs (None until it has been timed)."""
+        p = self.profiles.get(cid)
+        if p is None or p.rate is None:
+            return None
+        if p.epoch_samples is None:
+            return p.latency
+        return epochs * p.epoch_samples / p.rate
+
+
+class ThroughputSampler(RandomSampler):
+    """Cohort expected to finish soonest, with exploration and a fairness floor.
+
+    A client is overdue once `fairness` × (clients / cohort) selections have
+    passed without it, i.e. `fairness` times its fair share of waiting. Clients
+    failing more than `max_failure_rate` of the time are only picked when
+    overdue (or when nobody else is left).
+    """
+
+    name = "throughput"
+
+    def __init__(self, cohort_size=None, smoothing=0.3, seed=None, fairness=2.0, max_failure_rate=0.5,
+                 balance_epochs=False, max_epoch_factor=2.0):
+        super().__init__(cohort_size, smoothing, seed)
+        self.fairness = fairness
+        self.max_failure_rate = max_failure_rate
+        self.balance_epochs = balance_epochs
+        self.max_epoch_factor = max_epoch_factor  # Most epochs a fast client gets, × the configured ones
+        self._target = None  # Expected seconds of the cohort's median client, for balance_epochs
+
+    def choose(self, server_round, instructions, k):
+        window = math.ceil(self.fairness * len(instructions) / k)
+        unseen, overdue, ranked = [], [], []
+        for item in instructions:
+            p = self.profiles.get(item[0].cid)
+            if p is None or p.fits + p.failures == 0:
+                unseen.append(item)
+            elif p.last_picked is None or self.selections - p.last_picked >= window:
+                overdue.append((p.last_picked or 0, item))
+            else:
+                # Expected time, stretched by how often the client does not deliver
+                t = self.expected_time(item[0].cid)
+                t = math.inf if t is None else t / max(1.0 - p.failure_rate, 1e-3)
+                ranked.append((p.failure_rate > self.max_failure_rate, t, item))
+        self.rng.shuffle(unseen)
+        overdue.sort(key=lambda x: x[0])
+        ranked.sort(key=lambda x: x[:2])
+        overdue = [item for _, item in overdue]
+        chosen = (unseen + overdue + [item for *_, item in ranked])[:k]
+
+        times = [t for t in (self.expected_time(proxy.cid) for proxy, _ in chosen) if t is not None]
+        self._target = statistics.median(times) if times else None
+        n_unseen = min(len(unseen), k)
+        note = f"{n_unseen} unseen, {min(len(overdue), k - n_unseen)} overdue"
+        if times:
+            note += f", slowest expected {max(times):.2f}s/epoch"
+        print(f"→ Round {server_round}: sampler picked {len(chosen)}/{len(instructions)} clients ({note})")
+        return chosen
+
+    def fit_config(self, cid, config):
+        if not self.balance_epochs or self._target is None:
+            return config
+        t = self.expected_time(cid)
+        if t:
+            epochs = int(config.get("local_epochs", 1))
+            limit = max(1, int(epochs * self.max_epoch_factor))
+            config["local_epochs"] = min(max(1, round(epochs * self._target / t)), limit)
+        return config
+
+
+def make_sampler(name, cohort_size=None, balance_epochs=False, seed=None):
+    """The sampler selected with --sampler."""
+    if name == "throughput":
+        return ThroughputSampler(cohort_size, seed=seed, balance_epochs=balance_epochs)
+    if name == "random":
+        return RandomSampler(cohort_size, seed=seed)
+    raise ValueError(f"Unknown sampler {name!r} (choose from {', '.join(SAMPLERS)})")
@@ -7,10 +7,20 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 # Third-party and Flower (FL) imports
 import argparse
+import json
+import statistics
+import time
 import numpy as np
 import flwr as fl
-from flwr.common import ndarrays_to_parameters, parameters_to_ndarrays
-from flwr.server.strategy import FedAvg, FedAdagrad, FedAdam, FedYogi
+from flwr.common import (Code, EvaluateIns, FitIns, FitRes, Parameters, Status, ndarrays_to_parameters,
+                         parameters_to_ndarrays)
+from flwr.server import SimpleClientManager
+from flwr.server.strategy import FedAvg, FedAdagrad, FedAdam, FedOpt, FedYogi
+
+from common.models.spec import cnn_spec, init_parameters
+from common.utils.codec import CODECS
+# The server's own modules and common/utils/versions.py and wire.py are imported in
+# the functions that use them, so importing this module stays cheap
 
 # Map of strategy name to corresponding Flower strategy class
 STRATEGIES = {
@@ -20,103 +30,714 @@ STRATEGIES = {
     "FedYogi":    FedYogi,
 }
 
+def strategy_class(name):
+    """The strategy class called `name`: one of STRATEGIES, or FedBuff (see fedbuff.py)."""
+    if name == "FedBuff":
+        from fedbuff import FedBuff
+        return FedBuff
+    return STRATEGIES[name]
+
+# Client phases timed by common/utils/profiling.py, reported as t_<phase> metrics
+PHASES = ("decode", "data", "forward", "backward", "step", "encode")
+
+def summarize_profiles(metrics_list, label):
+    """Summarize per-phase client timings and name the round's slowest client.
+
+    - Mean time per phase across clients.
+    - Slowest client (by t_total), and the phase it spent most time in.
+    - Lowest throughput and highest peak memory.
+    """
+    timed = [m for _, m in metrics_list if "t_total" in m]
+    if not timed:
+        return {}
+    slowest = max(timed, key=lambda m: m["t_total"])
+    phase = max(PHASES, key=lambda p: slowest.get(f"t_{p}", 0.0))
+    summary = {
+        "t_total_max": slowest["t_total"],
+        "t_total_mean": sum(m["t_total"] for m in timed) / len(timed),
+        "bottleneck_cid": str(slowest.get("cid", "?")),
+        "bottleneck_phase": phase,
+        "samples_per_s_min": min(m.get("samples_per_s", 0.0) for m in timed),
+        "peak_mem_mb_max": max(m.get("peak_mem_mb", 0.0) for m in timed),
+    }
+    for p in PHASES:
+        values = [m[f"t_{p}"] for m in timed if f"t_{p}" in m]
+        if values:
+            summary[f"t_{p}_mean"] = sum(values) / len(values)
+    # Clients in --fast-cpu mode report the speedup of their chosen configuration
+    speedups = [m["fast_speedup"] for m in timed if "fast_speedup" in m]
+    if speedups:
+        summary["fast_speedup_mean"] = sum(speedups) / len(speedups)
+    print(
+        f"→ {label}: slowest client {summary['bottleneck_cid']} took {summary['t_total_max']:.2f}s "
+        f"(mostly {phase}: {slowest.get(f't_{phase}', 0.0):.2f}s), "
+        f"mean {summary['t_total_mean']:.2f}s over {len(timed)} clients"
+    )
+    return summary
+
+def aggregate_fit_metrics(metrics_list):
+    """Aggregate client fit metrics: phase timings and the round's bottleneck client."""
+    return summarize_profiles(metrics_list, "fit")
+
 def aggregate_metrics(metrics_list):
     """Aggregate client evaluation metrics.
 
-    - Average accuracy across clients.
+    - Average accuracy across clients; an edge aggregator (edge.py) reports the
+      mean over its `clients` and counts that many times.
     - Sum total misclassifications.
+    - Phase timings and the slowest client, when clients report them.
     """
     accuracies = [m.get("accuracy", 0.0) for _, m in metrics_list]
     miscls     = [m.get("misclassified", 0) for _, m in metrics_list]
+    clients    = [m.get("clients", 1) for _, m in metrics_list]
     return {
-        "accuracy": sum(accuracies) / len(accuracies) if accuracies else 0.0,
+        "accuracy": sum(a * n for a, n in zip(accuracies, clients)) / sum(clients) if accuracies else 0.0,
         "misclassified": sum(miscls),
+        **summarize_profiles(metrics_list, "evaluate"),
     }
 
+# tensor_type of Parameters holding NumPy arrays as-is, for clients running in
+# the server's own process tree (simulation.py) where nothing is serialized
+IN_PROCESS = "numpy.ndarray.inprocess"
+
+def to_ndarrays(parameters):
+    """parameters_to_ndarrays that passes in-process arrays straight through and reads packed ones."""
+    if parameters.tensor_type == IN_PROCESS:
+        return list(parameters.tensors)
+    from common.utils.wire import from_parameters
+    return from_parameters(parameters)
+
+def payload_bytes(parameters):
+    """Size in bytes of a serialized Parameters object as it goes over the wire."""
+    if parameters.tensor_type == IN_PROCESS:
+        return sum(t.nbytes for t in parameters.tensors)
+    return sum(len(t) for t in parameters.tensors)
+
 def make_savebest_strategy(base_cls):
-    """Create a subclass of the given strategy class that saves the best model by loss."""
+    """Create a subclass of the given strategy class that saves the best model by loss.
+
+    The subclass also averages compressed client updates (see common/utils/codec.py)
+    before the base strategy runs and logs the bytes sent and received every round.
+    Updates are folded into a StreamingAggregator one at a time: StreamingServer
+    calls `fold_fit_result` as each client finishes, while the stock Flower server
+    goes through `aggregate_fit`, which folds the collected results in turn.
+    With a `checkpointer` (see checkpoint.py) every new global model is saved in
+    the background together with the state `restore_checkpoint` needs to resume.
+
+    With an `evaluate_fn` (server-side evaluation, see central_eval.py) the best
+    model is picked by the centralized loss instead of the clients' losses, and
+    federated evaluation only runs every `fed_eval_every` rounds (0: only after
+    round `num_rounds`; -1: never).
+
+    With `model_cache` > 0 the global model sent out is addressed by its hash
+    (see common/utils/versions.py): the server remembers the versions each
+    client reports holding and the last `model_cache` models it sent, and sends
+    a client only the hash of a version it holds, or the delta from its newest
+    held version, instead of the full model.
+
+    A `sampler` (see sampler.py) picks each fit cohort among the sampled clients
+    and learns every client's speed and reliability from its fit results.
+    With `telemetry` (see telemetry.py) every round and client result is recorded.
+    With `wire` "packed" the models sent out are single packed buffers (see
+    common/utils/wire.py), CRC32-checked with `wire_checksum`; clients reply in
+    the format they received.
+    """
+    from common.utils.versions import VersionCache, encode_delta, version_hash
+    from common.utils.wire import PACKED, to_parameters
+    from streaming import StreamingAggregator
+
     class SaveBest(base_cls):
-        def __init__(self, *args, **kwargs):
+        def __init__(self, *args, downlink_codec="none", aggregation_workers=None, checkpointer=None,
+                     fed_eval_every=1, num_rounds=None, model_cache=0, sampler=None, telemetry=None,
+                     wire="numpy", wire_checksum=False, **kwargs):
             super().__init__(*args, **kwargs)
             self.best_loss = float("inf")  # Track lowest evaluation loss seen so far
             self._last_ndarrays = None     # Store latest parameters to save best model
+            self.downlink_codec = downlink_codec  # "fp16" halves the global model sent out
+            self._fit_base = None          # Global weights clients computed their deltas against
+            self._bytes_down = 0           # Bytes sent to clients in the current fit round
+            self._bytes_up = 0             # Bytes received from clients in the current fit round
+            self._aggregator = StreamingAggregator(aggregation_workers)
+            self._fit_metrics = []         # (num_examples, metrics) of each folded result
+            self._fit_proxy = None         # Any proxy of this round, for the combined result
+            self._fit_round = None         # Round the aggregation state belongs to
+            self._eval_ndarrays = None     # Parameters under evaluation, saved if they are the best
+            self.checkpointer = checkpointer  # CheckpointWriter, or None to only save the best model
+            self.fed_eval_every = fed_eval_every
+            self.num_rounds = num_rounds
+            self.sampler = sampler         # Picks the fit cohort, or None to train every sampled client
+            self.model_cache = VersionCache(model_cache) if model_cache else None
+            self._client_versions = {}     # cid -> versions the client reported holding
+            self._sent = None              # (Parameters, sent Parameters, version, arrays) of the latest model
+            self._deltas = {}              # base version -> delta Parameters to the latest model
+            self._eval_bytes_down = 0      # Bytes sent to clients in the current evaluation
+            self._downlink_kinds = {}      # Encoding -> clients it was sent to, in the current fit round
+            self.telemetry = telemetry     # Telemetry store, or None
+            self._dispatched = {}          # cid -> (time, bytes) its current fit was sent
+            self._eval_sent = {}           # cid -> bytes its current evaluation was sent
+            self._round_start = None       # When the current fit round was first configured
+            self._eval_start = None        # When the current evaluation was configured
+            self._fit_latencies = []       # Dispatch-to-result seconds of each folded update
+            self._aggregate_s = 0.0        # Seconds spent folding and finishing the current round
+            self.wire = wire               # Wire format of the Parameters sent out ("numpy" / "packed")
+            self.wire_checksum = wire_checksum
 
-        def aggregate_fit(self, rnd, results, failures):
-            # Standard aggregation of model updates
-            params, agg_metrics = super().aggregate_fit(rnd, results, failures)
-            # Save parameters from this round
-            self._last_ndarrays = parameters_to_ndarrays(params)
+        def checkpoint_state(self):
+            """Strategy state saved with each round checkpoint."""
+            state = {"best_loss": self.best_loss}
+            # Server-optimizer moments of FedAdam/FedYogi/FedAdagrad
+            if isinstance(self, FedOpt):
+                for key in ("m_t", "v_t"):
+                    if getattr(self, key):
+                        state[key] = getattr(self, key)
+            return state
+
+        def restore_checkpoint(self, ndarrays, state):
+            """Continue from a checkpoint's global weights and `checkpoint_state`."""
+            self.initial_parameters = ndarrays_to_parameters(ndarrays)
+            self._last_ndarrays = ndarrays
+            self.best_loss = state.get("best_loss", float("inf"))
+            if isinstance(self, FedOpt):
+                self.current_weights = ndarrays
+                self.m_t = state.get("m_t")
+                self.v_t = state.get("v_t")
+
+        def wire_parameters(self, ndarrays):
+            """`ndarrays` as Parameters in the wire format sent to clients."""
+            return to_parameters(ndarrays, self.wire, self.wire_checksum)
+
+        def _downlink(self, parameters):
+            """Return the Parameters actually sent to clients."""
+            if self.downlink_codec == "fp16":
+                return self.wire_parameters([a.astype(np.float16) for a in to_ndarrays(parameters)])
+            if self.wire == "packed" and parameters.tensor_type != PACKED:
+                # The initial or a restored model; aggregated ones are packed already
+                return self.wire_parameters(to_ndarrays(parameters))
+            return parameters
+
+        def _publish(self, parameters):
+            """Sent Parameters, version hash and arrays of `parameters`, once per Parameters object."""
+            if self._sent is None or self._sent[0] is not parameters:
+                sent = self._downlink(parameters)
+                arrays = to_ndarrays(sent)
+                version = version_hash(arrays)
+                self._sent = (parameters, sent, version, arrays)
+                self._deltas = {}
+                self.model_cache.put(version, arrays)
+            return self._sent[1:]
+
+        def _deliver(self, parameters, instructions, kinds):
+            """(proxy, Parameters, config, bytes) per instruction, counting encodings in `kinds`."""
+            if self.model_cache is None:
+                sent = self._downlink(parameters)
+                kinds["full"] = kinds.get("full", 0) + len(instructions)
+                return [(proxy, sent, ins.config, payload_bytes(sent)) for proxy, ins in instructions]
+            sent, version, arrays = self._publish(parameters)
+            out = []
+            for proxy, ins in instructions:
+                held = self._client_versions.get(proxy.cid, [])
+                config = {**ins.config, "model_version": version}
+                payload = sent
+                if version in held:
+                    payload, config["model_encoding"] = Parameters(tensors=[], tensor_type=sent.tensor_type), "cached"
+                else:
+                    # Newest version the client holds that the server still has
+                    base = next((v for v in reversed(held) if v in self.model_cache), None)
+                    if base is not None and base not in self._deltas:
+                        delta = self.wire_parameters(encode_delta(arrays, self.model_cache.get(base)))
+                        # Not worth it if the model changed too much to compress
+                        self._deltas[base] = delta if payload_bytes(delta) < payload_bytes(sent) else None
+                    if base is not None and self._deltas[base] is not None:
+                        payload, config["model_base"] = self._deltas[base], base
+                        config["model_encoding"] = "delta"
+                    else:
+                        config["model_encoding"] = "full"
+                kinds[config["model_encoding"]] = kinds.get(config["model_encoding"], 0) + 1
+                out.append((proxy, payload, config, payload_bytes(payload)))
+            return out
+
+        def note_client_versions(self, proxy, metrics):
+            """Remember the model versions a client reported holding with a result."""
+            if self.model_cache is not None and metrics.get("model_versions"):
+                self._client_versions[proxy.cid] = str(metrics["model_versions"]).split(",")
+
+        def forget_client_versions(self, failures):
+            """Send failed clients the full model next time: their cache may be gone."""
+            for failure in failures:
+                if isinstance(failure, tuple):
+                    self._client_versions.pop(failure[0].cid, None)
+
+        def begin_fit_round(self, parameters):
+            """Reset per-round aggregation state for updates taken against `parameters`."""
+            # Deltas are decoded against the float32 master weights, so fp16 rounding
+            # of the downlink never accumulates in the global model
+            self._fit_base = to_ndarrays(parameters)
+            # Until a round produces an update, the global model is the initial one
+            if self._last_ndarrays is None:
+                self._last_ndarrays = self._fit_base
+            self._aggregator.reset(self._fit_base)
+            self._bytes_down = 0
+            self._bytes_up = 0
+            self._fit_metrics = []
+            self._downlink_kinds = {}
+            self._round_start = time.perf_counter()
+            self._fit_latencies = []
+            self._aggregate_s = 0.0
+
+        def configure_fit(self, server_round, parameters, client_manager):
+            instructions = super().configure_fit(server_round, parameters, client_manager)
+            # Asynchronous servers configure each round many times, once per idle client
+            if server_round != self._fit_round:
+                self._fit_round = server_round
+                self.begin_fit_round(parameters)
+            if self.sampler is not None:
+                instructions = self.sampler.select(server_round, instructions)
+            deliveries = self._deliver(parameters, instructions, self._downlink_kinds)
+            self._bytes_down += sum(d[3] for d in deliveries)
+            now = time.perf_counter()
+            for proxy, _, _, n in deliveries:
+                self._dispatched[proxy.cid] = (now, n)
+            if self.sampler is not None:
+                deliveries = [(proxy, payload, self.sampler.fit_config(proxy.cid, dict(config)), n)
+                              for proxy, payload, config, n in deliveries]
+            return [(proxy, FitIns(payload, config)) for proxy, payload, config, _ in deliveries]
+
+        def fed_eval_due(self, server_round):
+            """Whether clients evaluate the model of this round."""
+            if self.fed_eval_every < 0:
+                return False
+            if server_round == self.num_rounds:
+                return True
+            return self.fed_eval_every > 0 and server_round % self.fed_eval_every == 0
+
+        def configure_evaluate(self, server_round, parameters, client_manager):
+            if not self.fed_eval_due(server_round):
+                return []
+            instructions = super().configure_evaluate(server_round, parameters, client_manager)
+            self._eval_ndarrays = self._last_ndarrays
+            kinds = {}
+            deliveries = self._deliver(parameters, instructions, kinds)
+            self._eval_bytes_down = sum(d[3] for d in deliveries)
+            self._eval_sent = {proxy.cid: n for proxy, _, _, n in deliveries}
+            self._eval_start = time.perf_counter()
+            if instructions:
+                print(f"→ Round {server_round}: evaluation sends {self._eval_bytes_down / 1e6:.2f} MB"
+                      + self._kinds_note(kinds))
+            return [(proxy, EvaluateIns(payload, config)) for proxy, payload, config, _ in deliveries]
+
+        def _kinds_note(self, kinds):
+            """" (2 cached, 1 delta, ...)" with the model cache, else ""."""
+            if self.model_cache is None:
+                return ""
+            return " (" + ", ".join(f"{n} {kind}" for kind, n in sorted(kinds.items())) + ")"
+
+        def fold_fit_result(self, rnd, proxy, fit_res, base=None, scale=1.0):
+            """Fold one client's update into the running average; the result can then be dropped.
+
+            `base` and `scale` are the client's starting model and staleness weight
+            when an asynchronous server hands in an update taken against an older model.
+            """
+            start = time.perf_counter()
+            cid = proxy.cid if proxy is not None else None
+            sent_at, bytes_down = self._dispatched.pop(cid, (start, 0))
+            codec = str(fit_res.metrics.get("codec", "none"))
+            self._aggregator.fold(
+                to_ndarrays(fit_res.parameters), codec, float(fit_res.num_examples),
+                base=base, scale=scale,
+            )
+            self._aggregate_s += time.perf_counter() - start
+            self._fit_latencies.append(start - sent_at)
+            self._bytes_up += payload_bytes(fit_res.parameters)
+            self.record(
+                "clients", round=rnd, kind="fit", cid=cid, latency_s=start - sent_at,
+                client_s=fit_res.metrics.get("t_total"), bytes_down=bytes_down,
+                bytes_up=payload_bytes(fit_res.parameters), num_examples=fit_res.num_examples,
+                status="ok" if scale >= 1.0 else "discounted",
+            )
+            self._fit_metrics.append((fit_res.num_examples, fit_res.metrics))
+            self._fit_proxy = proxy
+            self.note_client_versions(proxy, fit_res.metrics)
+            if self.sampler is not None:
+                self.sampler.record_fit(cid, fit_res.num_examples, fit_res.metrics)
+
+        def record(self, table, **values):
+            """Queue a telemetry row, if telemetry is on."""
+            if self.telemetry is not None:
+                self.telemetry.record(table, **values)
+
+        def _record_failures(self, rnd, kind, failures):
+            for failure in failures:
+                if isinstance(failure, tuple):
+                    self._dispatched.pop(failure[0].cid, None)
+                    self.record("clients", round=rnd, kind=kind, cid=failure[0].cid, status="failed")
+
+        def _record_round(self, rnd, kind, round_s, latencies, failures, **values):
+            straggler = round_s - statistics.median(latencies) if latencies else None
+            self.record("rounds", round=rnd, kind=kind, round_s=round_s, straggler_wait_s=straggler,
+                        clients=len(latencies), failures=len(failures), **values)
+
+        def close(self):
+            """Write out pending checkpoints and telemetry."""
+            if self.checkpointer is not None:
+                self.checkpointer.close()
+            if self.telemetry is not None:
+                self.telemetry.close()
+
+        def finish_fit_round(self, rnd, failures):
+            """Turn the folded updates into the new global model."""
+            finish_start = time.perf_counter()
+            self._record_failures(rnd, "fit", failures)
+            self.forget_client_versions(failures)
+            if self.sampler is not None:
+                for failure in failures:
+                    if isinstance(failure, tuple):
+                        self.sampler.record_failure(failure[0].cid)
+                # FedBuff clients still training are not late: their results count later
+                if not getattr(self, "asynchronous", False):
+                    self.sampler.end_round()
+            if self._aggregator.count == 0:
+                self._record_round(rnd, "fit", finish_start - self._round_start, [], failures,
+                                   bytes_down=self._bytes_down, bytes_up=0)
+                return super().aggregate_fit(rnd, [], failures)
+            averaged = self._aggregator.result()
+            # Hand the base strategy one pre-averaged result, so FedAdam/FedYogi/FedAdagrad
+            # still apply their server optimizer on top of the average
+            combined = FitRes(
+                status=Status(Code.OK, "Success"),
+                parameters=ndarrays_to_parameters(averaged),
+                num_examples=int(self._aggregator.total),
+                metrics={},
+            )
+            params, agg_metrics = super().aggregate_fit(rnd, [(self._fit_proxy, combined)], failures)
+            if self.fit_metrics_aggregation_fn is not None:
+                agg_metrics = self.fit_metrics_aggregation_fn(self._fit_metrics)
+            print(
+                f"→ Round {rnd}: sent {self._bytes_down / 1e6:.2f} MB{self._kinds_note(self._downlink_kinds)}, "
+                f"received {self._bytes_up / 1e6:.2f} MB from {self._aggregator.count} clients"
+            )
+            agg_metrics = {
+                **(agg_metrics or {}),
+                "bytes_down": self._bytes_down,
+                "bytes_up": self._bytes_up,
+                "clients": self._aggregator.count,
+                "examples": int(self._aggregator.total),
+            }
+            # Keep this round's parameters for best-model saving without another copy:
+            # FedOpt strategies already hold them in current_weights
+            checkpoint_start = time.perf_counter()
+            self._aggregate_s += checkpoint_start - finish_start
+            if params is not None:
+                self._last_ndarrays = self.current_weights if isinstance(self, FedOpt) else averaged
+                if self.checkpointer is not None:
+                    self.checkpointer.save_round(rnd, self._last_ndarrays, self.checkpoint_state())
+                # The base strategy returns Flower's format; repack once here rather than per send
+                if self.wire == "packed":
+                    params = self.wire_parameters(self._last_ndarrays)
+            end = time.perf_counter()
+            self._record_round(
+                rnd, "fit", end - self._round_start, self._fit_latencies, failures,
+                aggregate_s=self._aggregate_s, checkpoint_s=end - checkpoint_start,
+                bytes_down=self._bytes_down, bytes_up=self._bytes_up,
+            )
             return params, agg_metrics
 
+        def aggregate_fit(self, rnd, results, failures):
+            # Stock Flower server: results arrive all at once, fold them one by one
+            for proxy, res in results:
+                self.fold_fit_result(rnd, proxy, res)
+            return self.finish_fit_round(rnd, failures)
+
+        def save_if_best(self, rnd, loss, metrics, ndarrays):
+            """Save `ndarrays` to best_model.npz if `loss` is the lowest so far."""
+            if loss is None or loss >= self.best_loss:
+                return
+            self.best_loss = loss
+            # Save the best model as a .npz file, replacing the old one only once written
+            metadata = {"round": rnd, "loss": float(loss), **(metrics or {})}
+            if self.checkpointer is not None:
+                self.checkpointer.save_best("best_model.npz", ndarrays, metadata)
+            else:
+                from checkpoint import atomic_savez
+                atomic_savez("best_model.npz", *ndarrays, metadata=metadata)
+            print(f"→ Round {rnd}: new best loss={loss:.4f}; saved best_model.npz")
+
+        def evaluate(self, server_round, parameters):
+            # Centralized evaluation, right after the round's aggregation (FedAvg.evaluate,
+            # decoding either wire format)
+            res = None
+            if self.evaluate_fn is not None:
+                res = self.evaluate_fn(server_round, to_ndarrays(parameters), {})
+            if res is not None and server_round > 0 and self._last_ndarrays is not None:
+                self.save_if_best(server_round, res[0], res[1], self._last_ndarrays)
+            return res
+
         def aggregate_evaluate(self, rnd, results, failures):
             # Evaluate aggregated model and check if this is the best model so far
+            round_s = time.perf_counter() - self._eval_start if self._eval_start is not None else None
+            latencies = []
+            for proxy, res in results:
+                self.note_client_versions(proxy, res.metrics)
+                # Results arrive together, so the latency is the client's own time
+                latency = res.metrics.get("t_total")
+                if latency is not None:
+                    latencies.append(latency)
+                self.record("clients", round=rnd, kind="evaluate", cid=proxy.cid, latency_s=latency,
+                            client_s=latency, bytes_down=self._eval_sent.get(proxy.cid), bytes_up=0,
+                            num_examples=res.num_examples, status="ok")
+            self._record_failures(rnd, "evaluate", failures)
+            if round_s is not None:
+                self._record_round(rnd, "evaluate", round_s, latencies, failures,
+                                   bytes_down=self._eval_bytes_down, bytes_up=0)
+            self.forget_client_versions(failures)
             loss, agg_metrics = super().aggregate_evaluate(rnd, results, failures)
-            if loss is not None and loss < self.best_loss:
-                self.best_loss = loss
-                # Save the best model as a .npz file
-                np.savez(
-                    "best_model.npz",
-                    *self._last_ndarrays,
-                    metadata={
-                        "round": rnd,
-                        "loss": float(loss),
-                        **(agg_metrics or {}),
-                    },
-                )
-                print(f"→ Round {rnd}: new best loss={loss:.4f}; saved best_model.npz")
+            if agg_metrics is not None:
+                agg_metrics["bytes_down"] = self._eval_bytes_down
+            if self.evaluate_fn is None:
+                self.save_if_best(rnd, loss, agg_metrics, self._eval_ndarrays)
             return loss, agg_metrics
 
     return SaveBest
 
-if __name__ == "__main__":
-    # Parse CLI arguments for server configuration
-    parser = argparse.ArgumentParser(
-        description="Flower server w/ selectable strategy & best-model saving"
-    )
-    parser.add_argument("-p", "--port", type=int, default=8080)
+def add_server_args(parser):
+    """Add the round, strategy and codec options shared by server.py and simulation.py."""
+    from common.utils.wire import WIRE_FORMATS
+    from sampler import SAMPLERS
     parser.add_argument("-r", "--num-rounds", type=int, default=10)
     parser.add_argument("-e", "--local-epochs", type=int, default=1)
     parser.add_argument("-l", "--learning-rate", type=float, default=0.01)
-    parser.add_argument("-m", "--strategy", type=str, default="FedAvg", choices=list(STRATEGIES.keys()))
-    parser.add_argument("-nc", "--num-classes", type=int, default=5, help="Model output classes (for dummy init)")
-    args = parser.parse_args()
+    parser.add_argument("-m", "--strategy", type=str, default="FedAvg", choices=[*STRATEGIES, "FedBuff"])
+    parser.add_argument("-nc", "--num-classes", type=int, default=5, help="Model output classes")
+    parser.add_argument("--hidden-units", type=int, default=128, help="Width of the model's fully connected layer")
+    parser.add_argument("--min-clients", type=int, default=1, help="Clients to wait for before each round")
+    parser.add_argument("--codec", type=str, default="none", choices=CODECS, help="Client update codec")
+    parser.add_argument("--int8-per-channel", action="store_true", help="int8 codec: one scale per output channel")
+    parser.add_argument("--stochastic-rounding", action="store_true", help="int8 codec: unbiased stochastic rounding")
+    parser.add_argument("--topk-ratio", type=float, default=0.01, help="topk codec: fraction of entries sent per tensor")
+    parser.add_argument("--rank", type=int, default=0,
+                        help="Clients train a rank-r update of fc1 instead of the full layer (0: off; lowrank codec sends its factors)")
+    parser.add_argument("--downlink-codec", type=str, default="none", choices=["none", "fp16"],
+                        help="Encoding of the global model sent to clients")
+    parser.add_argument("--sampler", type=str, default="random", choices=SAMPLERS,
+                        help="How each fit cohort is picked among available clients")
+    parser.add_argument("--cohort-size", type=int, default=None,
+                        help="Clients trained per round (default: every available client)")
+    parser.add_argument("--balance-epochs", action="store_true",
+                        help="throughput sampler: give faster clients more local epochs, up to 2x -e")
+    parser.add_argument("--wire", type=str, default="numpy", choices=WIRE_FORMATS,
+                        help="Serialization of the models sent to clients (packed: one buffer, zero-copy decode)")
+    parser.add_argument("--wire-checksum", action="store_true", help="packed wire: CRC32-check every array")
+    parser.add_argument("--model-cache", type=int, default=0,
+                        help="Global model versions remembered for hash-only / delta downlink (0: always send in full)")
+    parser.add_argument("--aggregation-workers", type=int, default=None,
+                        help="Threads folding client updates into the global model (default: all cores)")
+    parser.add_argument("--buffer-size", type=int, default=2,
+                        help="FedBuff: client updates buffered per aggregation (-r counts aggregations)")
+    parser.add_argument("--round-deadline", type=float, default=None,
+                        help="Seconds a fit round waits for clients (default: wait for all)")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Seconds of local training per round (default: 80%% of --round-deadline)")
+    parser.add_argument("--late-grace", type=float, default=0.0,
+                        help="Seconds after the deadline in which late results are still accepted")
+    parser.add_argument("--late-discount", type=float, default=0.5,
+                        help="Weight factor for results accepted in the grace window")
+    parser.add_argument("--history-json", type=str, default=None,
+                        help="Write per-round losses and metrics to this JSON file at the end")
+    parser.add_argument("--eval-data", type=str, default=None,
+                        help="Held-out <class>/<image> folder to evaluate the global model on the server")
+    parser.add_argument("--eval-batch-size", type=int, default=512, help="Batch size of server-side evaluation")
+    parser.add_argument("--fed-eval-every", type=int, default=1,
+                        help="Rounds between federated evaluations on the clients (0: last round only, -1: never)")
+    parser.add_argument("--checkpoint-dir", type=str, default="",
+                        help="Folder for per-round checkpoints (e.g. checkpoints; off by default)")
+    parser.add_argument("--keep-checkpoints", type=int, default=3,
+                        help="Round checkpoints to keep besides best_model.npz (0 keeps all)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue from the newest checkpoint in --checkpoint-dir; -r is the total rounds")
+    parser.add_argument("--telemetry", type=str, default="",
+                        help="SQLite file recording per-round and per-client telemetry (e.g. telemetry.db)")
+    parser.add_argument("--init-from", type=str, default=None,
+                        help="Start from the weights in this .npz (best_model.npz, a round checkpoint, ...)")
+    parser.add_argument("--init", type=str, default="numpy", choices=["numpy", "torch"],
+                        help="Without --init-from: draw initial weights with NumPy, or build the model in torch")
+    parser.add_argument("--init-seed", type=int, default=None, help="Seed of --init numpy")
+    return parser
 
-    # Import model building function and Torch
-    from common.models.cnn import build_model
-    import torch
+def initial_weights(args):
+    """Initial global weights as NumPy arrays; only --init torch imports torch."""
+    spec = cnn_spec(args.num_classes, args.hidden_units)
+    if args.init_from:
+        from checkpoint import load_weights
+        ndarrays = [a.astype(np.float32, copy=False) for a in load_weights(args.init_from)]
+        if [a.shape for a in ndarrays] != [shape for _, shape in spec]:
+            raise ValueError(f"{args.init_from} does not match the model (check --hidden-units / --num-classes)")
+        print(f"→ Initial weights from {args.init_from}")
+        return ndarrays
+    if args.init == "torch":
+        from common.models.cnn import build_model
+        model = build_model(num_classes=args.num_classes, hidden_units=args.hidden_units)
+        return [t.cpu().numpy() for t in model.state_dict().values()]
+    # Same distribution as torch's default layer init (see common/models/spec.py)
+    return init_parameters(spec, args.init_seed)
 
-    # Build a dummy model to initialize global parameters
-    model = build_model(num_classes=args.num_classes)
-    initial_ndarrays = [t.cpu().numpy() for t in model.state_dict().values()]
-    initial_parameters = ndarrays_to_parameters(initial_ndarrays)
+def make_fit_config(args):
+    """Return the configuration function sending the learning config to clients each round."""
+    # Leave clients time to encode and upload before the deadline
+    if args.codec == "lowrank" and args.rank <= 0:
+        raise ValueError("--codec lowrank needs --rank > 0")
+    time_budget = args.time_budget
+    if time_budget is None:
+        time_budget = 0.8 * args.round_deadline if args.round_deadline else 0.0
 
-    # Configuration function to send learning config to clients each round
     def fit_config(rnd: int):
-        return {"local_epochs": args.local_epochs, "lr": args.learning_rate}
+        return {
+            "server_round": rnd,
+            "local_epochs": args.local_epochs,
+            "lr": args.learning_rate,
+            "codec": args.codec,
+            "int8_per_channel": args.int8_per_channel,
+            "stochastic_rounding": args.stochastic_rounding,
+            "topk_ratio": args.topk_ratio,
+            "rank": args.rank,
+            "time_budget": time_budget,
+        }
+
+    return fit_config
 
-    # Instantiate strategy with custom SaveBest wrapper
-    BaseStrat = STRATEGIES[args.strategy]
+def make_strategy(args, initial_parameters):
+    """Instantiate the selected strategy with the SaveBest wrapper."""
+    if args.resume and not args.checkpoint_dir:
+        raise ValueError("--resume needs --checkpoint-dir")
+    BaseStrat = strategy_class(args.strategy)
     SaveBest  = make_savebest_strategy(BaseStrat)
-    strategy  = SaveBest(
+    extra     = {"buffer_size": args.buffer_size} if args.strategy == "FedBuff" else {}
+    telemetry = None
+    if args.telemetry:
+        from telemetry import Telemetry
+        telemetry = Telemetry(args.telemetry, config=vars(args))
+    checkpointer = None
+    if args.checkpoint_dir:
+        from checkpoint import CheckpointWriter
+        on_write = None
+        if telemetry is not None:
+            on_write = lambda kind, rnd, seconds, size: telemetry.record(
+                "checkpoints", round=rnd, kind=kind, seconds=seconds, bytes=size)
+        checkpointer = CheckpointWriter(args.checkpoint_dir, args.keep_checkpoints, on_write=on_write)
+    evaluate_fn = None
+    if args.eval_data:
+        # Imported here: it needs torch, which the server otherwise only uses for the initial model
+        from central_eval import CentralEvaluator
+        evaluate_fn = CentralEvaluator(args.eval_data, args.num_classes, args.hidden_units, args.eval_batch_size)
+    from sampler import make_sampler
+    return SaveBest(
         fraction_fit=1.0,
         fraction_evaluate=1.0,
-        min_fit_clients=1,
-        min_evaluate_clients=1,
-        min_available_clients=1,
+        min_fit_clients=args.min_clients,
+        min_evaluate_clients=args.min_clients,
+        min_available_clients=args.min_clients,
         initial_parameters=initial_parameters,
         evaluate_metrics_aggregation_fn=aggregate_metrics,
-        on_fit_config_fn=fit_config,
+        fit_metrics_aggregation_fn=aggregate_fit_metrics,
+        on_fit_config_fn=make_fit_config(args),
+        evaluate_fn=evaluate_fn,
+        fed_eval_every=args.fed_eval_every,
+        num_rounds=args.num_rounds,
+        downlink_codec=args.downlink_codec,
+        model_cache=args.model_cache,
+        wire=args.wire,
+        wire_checksum=args.wire_checksum,
+        sampler=make_sampler(args.sampler, args.cohort_size, args.balance_epochs),
+        aggregation_workers=args.aggregation_workers,
+        checkpointer=checkpointer,
+        telemetry=telemetry,
+        **extra,
+    )
+
+def resume_from_checkpoint(args, strategy):
+    """With --resume, load the newest checkpoint into `strategy` and return its round (else 0)."""
+    from checkpoint import latest_checkpoint, load_checkpoint
+    path = latest_checkpoint(args.checkpoint_dir) if args.resume else None
+    if path is None:
+        if args.resume:
+            print(f"→ No checkpoint in {args.checkpoint_dir!r}; starting from round 1")
+        return 0
+    rnd, ndarrays, state = load_checkpoint(path)
+    expected = [a.shape for a in parameters_to_ndarrays(strategy.initial_parameters)]
+    if [a.shape for a in ndarrays] != expected:
+        raise ValueError(f"{path} does not match the model (check --hidden-units / --num-classes)")
+    strategy.restore_checkpoint(ndarrays, state)
+    # The round checkpoint is written before that round's evaluation; best_model.npz may be newer
+    if os.path.exists("best_model.npz"):
+        with np.load("best_model.npz", allow_pickle=True) as best:
+            strategy.best_loss = min(strategy.best_loss, best["metadata"].item()["loss"])
+    print(f"→ Resuming after round {rnd} from {path} (best loss so far {strategy.best_loss:.4f})")
+    return rnd
+
+def make_server(args, strategy, client_manager=None, start_round=0):
+    """Build the Flower server for `strategy`.
+
+    StreamingServer folds each update as it arrives; AsyncBufferedServer (FedBuff)
+    also lets every client move on without waiting for the others. Rounds are
+    numbered on from `start_round`, the round a resumed checkpoint ended with.
+    """
+    if getattr(strategy, "asynchronous", False):
+        from fedbuff import AsyncBufferedServer as ServerCls
+    else:
+        from streaming import StreamingServer as ServerCls
+    return ServerCls(
+        client_manager=client_manager or SimpleClientManager(),
+        strategy=strategy,
+        round_deadline=args.round_deadline,
+        late_grace=args.late_grace,
+        late_discount=args.late_discount,
+        start_round=start_round,
     )
 
+def save_history(path, history, args, **extra):
+    """Write a Flower History and the run's options to `path` as JSON."""
+    out = {
+        "config": vars(args),
+        **extra,
+        "losses_distributed": history.losses_distributed,
+        "losses_centralized": history.losses_centralized,
+        "metrics_distributed_fit": history.metrics_distributed_fit,
+        "metrics_distributed": history.metrics_distributed,
+        "metrics_centralized": history.metrics_centralized,
+    }
+    with open(path, "w") as f:
+        json.dump(out, f, indent=1, default=float)
+    print(f"→ Saved run history to {path}")
+
+if __name__ == "__main__":
+    # Parse CLI arguments for server configuration
+    parser = argparse.ArgumentParser(
+        description="Flower server w/ selectable strategy & best-model saving"
+    )
+    parser.add_argument("-p", "--port", type=int, default=8080)
+    args = add_server_args(parser).parse_args()
+
+    from common.utils.profiling import peak_memory_mb
+
+    # Initial global parameters, without importing torch unless --init torch
+    initial_parameters = ndarrays_to_parameters(initial_weights(args))
+
+    # Instantiate strategy with custom SaveBest wrapper, continuing from a checkpoint with --resume
+    strategy = make_strategy(args, initial_parameters)
+    start_round = resume_from_checkpoint(args, strategy)
+
     # Log configuration summary
     print(
         f"→ Starting server on 0.0.0.0:{args.port} | rounds={args.num_rounds} | "
-        f"strategy={args.strategy} | epochs/client={args.local_epochs} | lr={args.learning_rate}"
+        f"strategy={args.strategy} | epochs/client={args.local_epochs} | lr={args.learning_rate} | "
+        f"codec={args.codec} | downlink={args.downlink_codec} | wire={args.wire} | deadline={args.round_deadline}"
     )
 
     # Launch the Flower server
-    fl.server.start_server(
+    server = make_server(args, strategy, start_round=start_round)
+    history = fl.server.start_server(
         server_address=f"0.0.0.0:{args.port}",
         config=fl.server.ServerConfig(num_rounds=args.num_rounds),
-        strategy=strategy,
+        server=server,
     )
+    strategy.close()
+    if args.history_json:
+        save_history(args.history_json, history, args, server_peak_mem_mb=peak_memory_mb())
@@ -0,0 +1,323 @@
+"""
+Constant-memory aggregation for the Flower server.
+
+StreamingServer hands every fit result to the strategy the moment it arrives,
+and StreamingAggregator folds it into preallocated weighted-sum buffers, so the
+server never holds more than one client update at a time. With a round deadline
+the server also stops waiting for clients that are too slow.
+"""
+
+# Standard library imports
+import os
+import queue
+import random
+import time
+import timeit
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from logging import INFO
+
+# Third-party and Flower (FL) imports
+import numpy as np
+from flwr.common import Code
+from flwr.common.logger import log
+from flwr.server import ClientManager, History, Server
+from flwr.server.server import evaluate_clients, fit_client
+
+from common.utils.codec import accumulate_update, arrays_per_tensor, check_update
+
+
+class StreamingAggregator:
+    """Running example-weighted average of client updates.
+
+    Buffers are allocated once and reused every round. Per-tensor work runs on a
+    thread pool: NumPy releases the GIL for large element-wise operations, so
+    the layers of one update are folded in parallel across cores.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(self.max_workers) if self.max_workers > 1 else None
+        self.base = None      # Global weights the updates are deltas against
+        self.buffers = []     # float32 weighted sum of deltas, one per tensor
+        self.total = 0.0      # Sum of weights folded so far
+        self.count = 0        # Number of updates folded so far
+
+    def _map(self, fn, n):
+        if self._pool is None:
+            return [fn(i) for i in range(n)]
+        return list(self._pool.map(fn, range(n)))
+
+    def reset(self, base):
+        """Start a new round against the global weights `base`."""
+        shapes = [b.shape for b in base]
+        if shapes == [buf.shape for buf in self.buffers]:
+            self._map(lambda i: self.buffers[i].fill(0.0), len(shapes))
+        else:
+            self.buffers = [np.zeros(shape, dtype=np.float32) for shape in shapes]
+        self.base = base
+        self.total = 0.0
+        self.count = 0
+
+    def fold(self, arrays, codec: str, weight: float, base=None, scale: float = 1.0):
+        """Add one client's (possibly compressed) update with the given weight.
+
+        `base` is the model the client started from, when it is not the round's
+        (asynchronous servers). `scale` shrinks the update's contribution without
+        counting towards the total, so down-weighted updates move the model less.
+        A malformed update raises ValueError and leaves the running sums untouched.
+        """
+        base = self.base if base is None else base
+        step = arrays_per_tensor(codec)
+        # Layers are folded in parallel: reject a bad update before any of it is added
+        check_update(arrays, base, codec)
+
+        def fold_layer(i):
+            accumulate_update(
+                [self.buffers[i]], arrays[step * i:step * (i + 1)], [base[i]], codec, weight * scale
+            )
+
+        self._map(fold_layer, len(base))
+        self.total += weight
+        self.count += 1
+
+    def result(self):
+        """Weighted average of everything folded so far, as full weights."""
+        if self.total == 0:
+            return [b.copy() for b in self.base]
+
+        def finish_layer(i):
+            return (self.base[i] + self.buffers[i] / self.total).astype(self.base[i].dtype)
+
+        return self._map(finish_layer, len(self.base))
+
+
+class IdleClients(ClientManager):
+    """View of a client manager that only offers clients with no work in flight."""
+
+    def __init__(self, manager: ClientManager, busy):
+        self.manager = manager
+        self.busy = busy
+
+    def all(self):
+        return {cid: p for cid, p in self.manager.all().items() if cid not in self.busy}
+
+    def num_available(self):
+        return len(self.all())
+
+    def register(self, client):
+        return self.manager.register(client)
+
+    def unregister(self, client):
+        self.manager.unregister(client)
+
+    def wait_for(self, num_clients, timeout=0):
+        # Never block: clients only become idle when the caller collects their results
+        return self.num_available() >= num_clients
+
+    def sample(self, num_clients, min_num_clients=None, criterion=None):
+        idle = [p for p in self.all().values() if criterion is None or criterion.select(p)]
+        return random.sample(idle, min(num_clients, len(idle)))
+
+
+class StreamingServer(Server):
+    """Flower server that streams fit results into the strategy.
+
+    Strategies implementing `fold_fit_result` and `finish_fit_round` (SaveBest in
+    server.py does) receive each result as soon as its client finishes, and the
+    result is dropped right after. Other strategies fall back to Flower's usual
+    collect-then-`aggregate_fit` round.
+
+    With `round_deadline` (seconds) a round closes once the deadline plus
+    `late_grace` has passed. Results arriving after the deadline but within the
+    grace window count with weight × `late_discount`; later ones are dropped, and
+    their clients are left out of sampling, for fit and evaluation, until they
+    have finished.
+    """
+
+    def __init__(self, *, client_manager, strategy=None, round_deadline=None, late_grace=0.0, late_discount=0.5,
+                 start_round=0):
+        super().__init__(client_manager=client_manager, strategy=strategy)
+        self.round_deadline = round_deadline
+        self.late_grace = late_grace
+        self.late_discount = late_discount
+        self.start_round = start_round  # Rounds already done by the run this one resumes
+        self._inflight = {}  # cid -> fit future of a client a closed round stopped waiting for
+
+    def fit(self, num_rounds, timeout):
+        """Flower's round loop, running rounds `start_round` + 1 … `num_rounds`."""
+        history = History()
+
+        log(INFO, "[INIT]")
+        self.parameters = self._get_initial_parameters(server_round=self.start_round, timeout=timeout)
+        if self.start_round == 0:
+            res = self.strategy.evaluate(0, parameters=self.parameters)
+            if res is not None:
+                history.add_loss_centralized(server_round=0, loss=res[0])
+                history.add_metrics_centralized(server_round=0, metrics=res[1])
+
+        start_time = timeit.default_timer()
+        for current_round in range(self.start_round + 1, num_rounds + 1):
+            log(INFO, "")
+            log(INFO, "[ROUND %s]", current_round)
+            res_fit = self.fit_round(server_round=current_round, timeout=timeout)
+            if res_fit is not None:
+                parameters_prime, fit_metrics, _ = res_fit
+                if parameters_prime:
+                    self.parameters = parameters_prime
+                history.add_metrics_distributed_fit(server_round=current_round, metrics=fit_metrics)
+
+            res_cen = self.strategy.evaluate(current_round, parameters=self.parameters)
+            if res_cen is not None:
+                history.add_loss_centralized(server_round=current_round, loss=res_cen[0])
+                history.add_metrics_centralized(server_round=current_round, metrics=res_cen[1])
+
+            res_fed = self.evaluate_round(server_round=current_round, timeout=timeout)
+            if res_fed is not None and res_fed[0] is not None:
+                history.add_loss_distributed(server_round=current_round, loss=res_fed[0])
+                history.add_metrics_distributed(server_round=current_round, metrics=res_fed[1])
+        elapsed = timeit.default_timer() - start_time
+
+        # Let clients past the last deadline finish, so they are disconnected between tasks
+        wait(list(self._inflight.values()))
+        return history, elapsed
+
+    def fit_round(self, server_round, timeout):
+        if not hasattr(self.strategy, "fold_fit_result"):
+            return super().fit_round(server_round, timeout)
+
+        client_manager = self._client_manager
+        if self._inflight:
+            if len(self._inflight) >= client_manager.num_available():
+                # Everyone is still busy with an earlier round; wait for the first to finish
+                wait(list(self._inflight.values()), return_when=FIRST_COMPLETED)
+            self._inflight = {cid: f for cid, f in self._inflight.items() if not f.done()}
+            client_manager = IdleClients(client_manager, self._inflight)
+        client_instructions = self.strategy.configure_fit(
+            server_round=server_round,
+            parameters=self.parameters,
+            client_manager=client_manager,
+        )
+        if not client_instructions:
+            log(INFO, "configure_fit: no clients selected, cancel")
+            return None
+        log(
+            INFO,
+            "configure_fit: strategy sampled %s clients (out of %s)",
+            len(client_instructions),
+            self._client_manager.num_available(),
+        )
+
+        # Futures are only referenced from the queue until they are consumed,
+        # so each client's update can be freed as soon as it has been folded
+        done = queue.Queue()
+        folded, failures, latencies, late = 0, [], [], 0
+        aggregate_time = 0.0
+        start = time.perf_counter()
+        cutoff = None
+        if self.round_deadline is not None:
+            cutoff = start + self.round_deadline + self.late_grace
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {}
+        for proxy, ins in client_instructions:
+            future = executor.submit(fit_client, proxy, ins, timeout, server_round)
+            futures[proxy.cid] = future
+            future.add_done_callback(lambda f: done.put((time.perf_counter() - start, f)))
+        del future
+        for _ in client_instructions:
+            try:
+                if cutoff is None:
+                    latency, future = done.get()
+                else:
+                    latency, future = done.get(timeout=max(cutoff - time.perf_counter(), 0.0))
+            except queue.Empty:
+                break
+            failure = future.exception()
+            if failure is not None:
+                failures.append(failure)
+                continue
+            proxy, res = future.result()
+            futures.pop(proxy.cid, None)
+            del future
+            if res.status.code != Code.OK:
+                failures.append((proxy, res))
+                continue
+            latencies.append(latency)
+            scale = 1.0
+            if self.round_deadline is not None and latency > self.round_deadline:
+                scale = self.late_discount
+                late += 1
+            fold_start = time.perf_counter()
+            try:
+                self.strategy.fold_fit_result(server_round, proxy, res, scale=scale)
+                folded += 1
+            except ValueError as err:
+                failures.append(err)
+            aggregate_time += time.perf_counter() - fold_start
+            del res
+        # Don't wait for clients past the deadline; their results are dropped
+        dropped = {cid: f for cid, f in futures.items() if not f.done()}
+        self._inflight.update(dropped)
+        executor.shutdown(wait=False)
+
+        log(INFO, "aggregate_fit: folded %s results and %s failures", folded, len(failures))
+        finish_start = time.perf_counter()
+        parameters_aggregated, metrics_aggregated = self.strategy.finish_fit_round(
+            server_round, failures
+        )
+        aggregate_time += time.perf_counter() - finish_start
+        return parameters_aggregated, {
+            **(metrics_aggregated or {}),
+            **self._latency_summary(server_round, latencies, late, len(dropped)),
+            "round_s": time.perf_counter() - start,
+            "aggregate_s": aggregate_time,
+        }, ([], failures)
+
+    def evaluate_round(self, server_round, timeout):
+        """Flower's evaluate_round, sampling only clients that are not still running a fit."""
+        start = time.perf_counter()
+        client_manager = self._client_manager
+        self._inflight = {cid: f for cid, f in self._inflight.items() if not f.done()}
+        if self._inflight:
+            # A client can only run one task at a time
+            client_manager = IdleClients(client_manager, self._inflight)
+        client_instructions = self.strategy.configure_evaluate(
+            server_round=server_round,
+            parameters=self.parameters,
+            client_manager=client_manager,
+        )
+        if not client_instructions:
+            log(INFO, "configure_evaluate: no clients selected, skipping evaluation")
+            return None
+        log(
+            INFO,
+            "configure_evaluate: strategy sampled %s clients (out of %s, %s still fitting)",
+            len(client_instructions),
+            self._client_manager.num_available(),
+            len(self._inflight),
+        )
+        results, failures = evaluate_clients(
+            client_instructions, max_workers=self.max_workers, timeout=timeout, group_id=server_round
+        )
+        log(INFO, "aggregate_evaluate: received %s results and %s failures", len(results), len(failures))
+        loss, metrics = self.strategy.aggregate_evaluate(server_round, results, failures)
+        return loss, {**(metrics or {}), "round_s": time.perf_counter() - start}, (results, failures)
+
+    def _latency_summary(self, server_round, latencies, late, dropped):
+        """Log client round-trip percentiles for the round, to help pick a deadline."""
+        if not latencies:
+            print(f"→ Round {server_round}: no client made the deadline; {dropped} dropped")
+            return {"late": late, "dropped": dropped}
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        summary = {
+            "latency_p50": float(p50),
+            "latency_p90": float(p90),
+            "latency_p99": float(p99),
+            "latency_max": float(max(latencies)),
+            "late": late,
+            "dropped": dropped,
+        }
+        print(
+            f"→ Round {server_round}: client latency p50 {p50:.2f}s, p90 {p90:.2f}s, "
+            f"p99 {p99:.2f}s, max {summary['latency_max']:.2f}s; {late} late, {dropped} dropped"
+        )
+        return summary
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Round telemetry for the Flower server, stored in SQLite.
+
+SaveBest (server.py) records one row per round and one per client result, and
+the CheckpointWriter one per file it writes. Rows are queued and a background
+thread inserts them in batches, so a round never waits on the database. Every
+server start is a new run in the same file.
+
+  rounds        per fit/evaluate round: duration, time spent waiting on
+                stragglers (round time minus the median client latency),
+                aggregation time, time blocked queueing the checkpoint, bytes
+                each way, clients and failures
+  clients       per client and round: latency (fit: dispatch to result; evaluate:
+                the client's own time, as results arrive together), client-side
+                time, bytes each way, examples and status (ok / discounted / failed)
+  checkpoints   per file written: seconds and bytes
+
+    python telemetry.py telemetry.db              # latest run
+    python telemetry.py telemetry.db --run 3 --kind evaluate
+"""
+
+# Standard library imports
+import json
+import queue
+import sqlite3
+import threading
+import time
+from logging import WARNING
+
+SCHEMA = {
+    "runs": ("run_id", "started", "config"),
+    "rounds": ("run_id", "round", "kind", "round_s", "straggler_wait_s", "aggregate_s", "checkpoint_s",
+               "bytes_down", "bytes_up", "clients", "failures"),
+    "clients": ("run_id", "round", "kind", "cid", "latency_s", "client_s", "bytes_down", "bytes_up",
+                "num_examples", "status"),
+    "checkpoints": ("run_id", "round", "kind", "seconds", "bytes"),
+}
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    for table, columns in SCHEMA.items():
+        if table == "runs":  # run_id numbers the runs
+            columns = ("run_id INTEGER PRIMARY KEY",) + columns[1:]
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+    return conn
+
+
+class Telemetry:
+    """Append-only telemetry of one server run, written to SQLite off the hot path.
+
+    Rows are written once `batch_size` are queued or `flush_interval` seconds
+    after the first unwritten one. A failed write is logged and the rows dropped.
+    """
+
+    def __init__(self, path, config=None, batch_size=256, flush_interval=1.0):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        with connect(self.path) as conn:
+            cur = conn.execute("INSERT INTO runs (started, config) VALUES (?, ?)",
+                               (time.time(), json.dumps(config or {}, default=str)))
+            self.run_id = cur.lastrowid
+        conn.close()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, table, **values):
+        """Queue one row of `table`; missing columns are NULL."""
+        self._queue.put((table, tuple(values.get(c, self.run_id if c == "run_id" else None)
+                                      for c in SCHEMA[table])))
+
+    def close(self):
+        """Write everything queued and stop the writer."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        from flwr.common.logger import log
+
+        conn = connect(self.path)
+        pending, deadline, done = {}, None, False
+        while not done:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is None:
+                    done = True
+                else:
+                    pending.setdefault(item[0], []).append(item[1])
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+            except queue.Empty:
+                pass
+            if pending and (done or time.monotonic() >= deadline
+                            or sum(map(len, pending.values())) >= self.batch_size):
+                try:
+                    with conn:
+                        for table, rows in pending.items():
+                            marks = ", ".join("?" * len(SCHEMA[table]))
+                            conn.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+                except sqlite3.Error as err:
+                    log(WARNING, "Telemetry write failed: %s", err)
+                pending, deadline = {}, None
+        conn.close()
+
+
+def percentiles(values, ps=(50, 95, 99)):
+    """Linearly interpolated percentiles of `values` (NaN if empty)."""
+    values = sorted(values)
+    if not values:
+        return [float("nan")] * len(ps)
+    out = []
+    for p in ps:
+        k = (len(values) - 1) * p / 100
+        lo = int(k)
+        hi = min(lo + 1, len(values) - 1)
+        out.append(values[lo] + (values[hi] - values[lo]) * (k - lo))
+    return out
+
+
+def report(path, run_id=None, kind="fit"):
+    """Print round latency percentiles and per-client slowdowns of one run."""
+    conn = sqlite3.connect(path)
+    if run_id is None:
+        run_id = conn.execute("SELECT MAX(run_id) FROM runs").fetchone()[0]
+    if run_id is None:
+        print(f"→ No runs in {path}")
+        return
+    rows = conn.execute(
+        "SELECT round, round_s, straggler_wait_s, aggregate_s, checkpoint_s, bytes_down, bytes_up "
+        "FROM rounds WHERE run_id = ? AND kind = ? ORDER BY round", (run_id, kind)).fetchall()
+    print(f"→ Run {run_id}: {len(rows)} {kind} rounds")
+    if rows:
+        p50, p95, p99 = percentiles([r[1] for r in rows])
+        mean = lambda i: sum(r[i] or 0.0 for r in rows) / len(rows)
+        print(f"  round latency   p50 {p50:.3f}s  p95 {p95:.3f}s  p99 {p99:.3f}s")
+        print(f"  mean per round  straggler wait {mean(2):.3f}s, aggregation {mean(3):.3f}s, "
+              f"checkpoint {mean(4):.3f}s")
+        print(f"  bytes           down {sum(r[5] or 0 for r in rows) / 1e6:.2f} MB, "
+              f"up {sum(r[6] or 0 for r in rows) / 1e6:.2f} MB")
+    writes = conn.execute("SELECT seconds FROM checkpoints WHERE run_id = ?", (run_id,)).fetchall()
+    if writes:
+        print(f"  checkpoint files {len(writes)}, mean write {sum(w[0] for w in writes) / len(writes):.3f}s "
+              "(background)")
+
+    # Slowdown: a client's latency over the median client latency of the same round
+    by_round = {}
+    for rnd, cid, latency, status in conn.execute(
+            "SELECT round, cid, latency_s, status FROM clients WHERE run_id = ? AND kind = ?", (run_id, kind)):
+        by_round.setdefault(rnd, []).append((cid, latency, status))
+    stats = {}
+    for results in by_round.values():
+        median = percentiles([lat for _, lat, s in results if lat is not None and s != "failed"], (50,))[0]
+        for cid, latency, status in results:
+            s = stats.setdefault(cid, {"latency": [], "slowdown": [], "failed": 0})
+            if status == "failed" or latency is None:
+                s["failed"] += status == "failed"
+                continue
+            s["latency"].append(latency)
+            if median > 0:
+                s["slowdown"].append(latency / median)
+    conn.close()
+    if not stats:
+        return
+    print(f"  {'client':>12} {'rounds':>6} {'p50 s':>8} {'p95 s':>8} {'slowdown':>8} {'failed':>6}")
+    slowdowns = {cid: percentiles(s["slowdown"], (50,))[0] if s["slowdown"] else 0.0 for cid, s in stats.items()}
+    for cid in sorted(stats, key=slowdowns.get, reverse=True):  # Slowest first
+        s, slowdown = stats[cid], slowdowns[cid]
+        p50, p95 = percentiles(s["latency"], (50, 95))
+        print(f"  {cid[-12:]:>12} {len(s['latency']):6d} {p50:8.3f} {p95:8.3f} {slowdown:7.2f}x {s['failed']:6d}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize the round telemetry of a server run")
+    parser.add_argument("path", nargs="?", default="telemetry.db")
+    parser.add_argument("--run", type=int, default=None, help="Run id (default: the latest)")
+    parser.add_argument("--kind", default="fit", choices=["fit", "evaluate"])
+    args = parser.parse_args()
+    report(args.path, args.run, args.kind)
+
+
+if __name__ == "__main__":
+    main()
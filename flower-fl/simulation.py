@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Single-host federated simulation with the real CNN, FLClient and server strategies.
+
+Each simulated client is a client_v2.FLClient living in a pool of worker
+processes (one per core by default); a client always runs on the same worker,
+so its state (e.g. top-k residuals) carries over between rounds. Client
+partitions are decoded once and copied into one shared-memory block that every
+worker maps instead of loading its own copy, and each global model is published
+to shared memory once and read from there by all clients. There is no gRPC: the
+Flower server talks to in-process ClientProxy objects that forward fit/evaluate
+calls to the pool, and updates come back as plain NumPy arrays.
+
+    python simulation.py -n 100 -r 40 --partition iid
+"""
+
+# Standard library imports
+import os, sys
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "client"))
+sys.path.insert(0, os.path.join(ROOT, "server"))
+
+import argparse
+import itertools
+import multiprocessing as mp
+import threading
+import traceback
+from concurrent.futures import Future
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+# Third-party and Flower (FL) imports
+import numpy as np
+from flwr.common import (Code, DisconnectRes, EvaluateRes, FitRes, GetPropertiesRes, Parameters,
+                         Status, ndarrays_to_parameters)
+from flwr.server import SimpleClientManager
+from flwr.server.client_proxy import ClientProxy
+
+from server import (IN_PROCESS, add_server_args, initial_weights, make_server, make_strategy,
+                    resume_from_checkpoint, save_history, to_ndarrays)
+
+# Arrays in a shared block start on cache-line boundaries
+ALIGN = 64
+
+
+def to_shared(arrays):
+    """Copy `arrays` into one new shared-memory block; return it and the layout to map them back."""
+    layout, offset = [], 0
+    for a in arrays:
+        offset = -(-offset // ALIGN) * ALIGN
+        layout.append((a.dtype.str, a.shape, offset))
+        offset += a.nbytes
+    shm = SharedMemory(create=True, size=max(offset, 1))
+    for a, view in zip(arrays, from_shared(shm, layout)):
+        view[...] = a
+    return shm, layout
+
+
+def from_shared(shm, layout):
+    """NumPy views of the arrays stored in `shm`, no copy."""
+    return [np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset) for dtype, shape, offset in layout]
+
+
+def load_partitions(num_clients, partition, seed=0, data_root=None):
+    """
+    Return (train images, train labels, test images, test labels) per simulated
+    client, decoded through the client data cache (see common/utils/data.py).
+
+      dirs  client i uses <data_root>/client_<i>/, as client_v2.py would
+      iid   the data of every client_<ID>/ folder is pooled, shuffled and split
+            evenly into `num_clients` partitions
+    """
+    from common.utils.data import load_client_data
+
+    def splits(client_id):
+        train_loader, test_loader = load_client_data(client_id, cache=True, data_root=data_root)
+        train, test = train_loader.dataset, test_loader.dataset
+        return train.images, train.labels, test.images, test.labels
+
+    if partition == "dirs":
+        return [splits(str(i)) for i in range(1, num_clients + 1)]
+
+    data_root = Path(data_root or Path(ROOT) / "client" / "data")
+    ids = sorted(p.name.split("_", 1)[1] for p in data_root.glob("client_*") if p.is_dir())
+    pooled = [np.concatenate(parts) for parts in zip(*(splits(i) for i in ids))]
+    rng = np.random.default_rng(seed)
+    shards = []
+    for images, labels in (pooled[0:2], pooled[2:4]):
+        if len(labels) < num_clients:
+            raise ValueError(f"Only {len(labels)} samples to split between {num_clients} clients")
+        shards.append([(images[i], labels[i]) for i in np.array_split(rng.permutation(len(labels)), num_clients)])
+    return [(*train, *test) for train, test in zip(*shards)]
+
+
+def worker_main(tasks, results, data_name, data_layout, model_kwargs, batch_size, verbose):
+    """Serve fit/evaluate tasks for the clients pinned to this worker."""
+    import torch
+    from client_v2 import FLClient
+    from common.models.cnn import build_model
+    from common.utils.data import CLASS_NAMES, CachedImageDataset, cached_loader
+
+    # The pool already has one process per core
+    torch.set_num_threads(1)
+    if not verbose:
+        sys.stdout = open(os.devnull, "w")
+
+    data_shm = SharedMemory(name=data_name)
+    data = from_shared(data_shm, data_layout)
+    model = build_model(**model_kwargs)  # Shared by this worker's clients
+    clients = {}
+    versions = {}  # Shared-memory name -> (block, arrays) of recently seen global models
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, kind, index, name, layout, config = task
+        try:
+            if index not in clients:
+                train_x, train_y, test_x, test_y = data[4 * index:4 * index + 4]
+                clients[index] = FLClient(
+                    model,
+                    cached_loader(CachedImageDataset(train_x, train_y, CLASS_NAMES), batch_size, shuffle=True),
+                    cached_loader(CachedImageDataset(test_x, test_y, CLASS_NAMES), batch_size, shuffle=False),
+                    cid=str(index + 1),
+                )
+            if name not in versions:
+                shm = SharedMemory(name=name)
+                versions[name] = (shm, from_shared(shm, layout))
+                while len(versions) > 4:
+                    old = next(iter(versions))
+                    shm, arrays = versions.pop(old)
+                    del arrays
+                    shm.close()
+            parameters = versions[name][1]
+            client = clients[index]
+            value = client.fit(parameters, config) if kind == "fit" else client.evaluate(parameters, config)
+            del parameters  # Lets the block be closed once it is evicted
+            # SimpleQueue pickles right here, before training touches the model again
+            results.put((task_id, True, value))
+        except Exception:
+            results.put((task_id, False, traceback.format_exc()))
+    data_shm.close()
+
+
+class ClientPool:
+    """
+    Worker processes running the simulated clients. Client `index` always runs on
+    worker `index % num_workers`.
+    """
+
+    def __init__(self, num_workers, data_name, data_layout, model_kwargs, batch_size, verbose=False):
+        ctx = mp.get_context("spawn")
+        self.results = ctx.SimpleQueue()
+        self.tasks = [ctx.SimpleQueue() for _ in range(num_workers)]
+        self.workers = [
+            ctx.Process(
+                target=worker_main,
+                args=(q, self.results, data_name, data_layout, model_kwargs, batch_size, verbose),
+                daemon=True,
+            )
+            for q in self.tasks
+        ]
+        for w in self.workers:
+            w.start()
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._futures = {}
+        self._current = None  # (Parameters, block, layout) of the latest published model
+        self._refs = {}       # block name -> [block, tasks still using it]
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._reader.start()
+
+    def _publish(self, parameters):
+        """Put `parameters` in shared memory, once per Parameters object."""
+        if self._current is None or self._current[0] is not parameters:
+            shm, layout = to_shared(to_ndarrays(parameters))
+            self._refs[shm.name] = [shm, 0]
+            self._current = (parameters, shm, layout)
+            self._release()
+        return self._current[1].name, self._current[2]
+
+    def _release(self, name=None):
+        if name is not None:
+            self._refs[name][1] -= 1
+        for key, (shm, refs) in list(self._refs.items()):
+            if refs == 0 and shm is not self._current[1]:
+                del self._refs[key]
+                shm.close()
+                shm.unlink()
+
+    def submit(self, index, kind, parameters, config) -> Future:
+        future = Future()
+        with self._lock:
+            name, layout = self._publish(parameters)
+            self._refs[name][1] += 1
+            task_id = next(self._ids)
+            self._futures[task_id] = (future, name)
+            self.tasks[index % len(self.tasks)].put((task_id, kind, index, name, layout, config))
+        return future
+
+    def _read_results(self):
+        while True:
+            message = self.results.get()
+            if message is None:
+                return
+            task_id, ok, value = message
+            with self._lock:
+                future, name = self._futures.pop(task_id)
+                self._release(name)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(f"Simulated client failed:\n{value}"))
+
+    def close(self):
+        for q in self.tasks:
+            q.put(None)
+        for w in self.workers:
+            w.join()
+        self.results.put(None)
+        self._reader.join()
+        with self._lock:
+            for shm, _ in self._refs.values():
+                shm.close()
+                shm.unlink()
+            self._refs.clear()
+
+
+class SimClientProxy(ClientProxy):
+    """ClientProxy for a client in the ClientPool; parameters never leave the host."""
+
+    def __init__(self, cid, index, pool):
+        super().__init__(cid)
+        self.index = index
+        self.pool = pool
+
+    def fit(self, ins, timeout, group_id):
+        payload, num_examples, metrics = self.pool.submit(self.index, "fit", ins.parameters, ins.config).result(timeout)
+        return FitRes(
+            status=Status(Code.OK, "Success"),
+            parameters=Parameters(tensors=payload, tensor_type=IN_PROCESS),
+            num_examples=num_examples,
+            metrics=metrics,
+        )
+
+    def evaluate(self, ins, timeout, group_id):
+        loss, num_examples, metrics = self.pool.submit(self.index, "evaluate", ins.parameters, ins.config).result(timeout)
+        return EvaluateRes(status=Status(Code.OK, "Success"), loss=loss, num_examples=num_examples, metrics=metrics)
+
+    def get_properties(self, ins, timeout, group_id):
+        return GetPropertiesRes(status=Status(Code.OK, "Success"), properties={})
+
+    def get_parameters(self, ins, timeout, group_id):
+        raise NotImplementedError("Simulated clients take their initial parameters from the strategy")
+
+    def reconnect(self, ins, timeout, group_id):
+        return DisconnectRes(reason="")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many Flower clients on one machine")
+    parser.add_argument("-n", "--num-clients", type=int, default=10)
+    parser.add_argument("--partition", type=str, default="dirs", choices=["dirs", "iid"],
+                        help="dirs: client i reads client_<i>/; iid: pool all client folders and split evenly")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes running the clients (default: one per core)")
+    parser.add_argument("-b", "--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the iid partition")
+    parser.add_argument("--data-root", type=str, default=None,
+                        help="Folder holding the client_<ID>/ data folders (default: client/data)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the clients' output")
+    args = add_server_args(parser).parse_args()
+    if args.model_cache:
+        # Simulated clients read the global model from shared memory; nothing to save
+        print("→ --model-cache has no effect in simulation; sending the model as-is")
+        args.model_cache = 0
+
+    # Decode every partition once; the workers map this block instead of copying it
+    partitions = load_partitions(args.num_clients, args.partition, args.seed, args.data_root)
+    data_shm, data_layout = to_shared([a for p in partitions for a in p])
+    del partitions
+    print(f"→ Loaded {args.num_clients} client partitions into {data_shm.size / 1e6:.1f} MB of shared memory")
+
+    model_kwargs = {"num_classes": args.num_classes, "hidden_units": args.hidden_units}
+    # Same initial weights as server.py: --init-from, --init and --init-seed apply
+    initial_parameters = ndarrays_to_parameters(initial_weights(args))
+    strategy = make_strategy(args, initial_parameters)
+    start_round = resume_from_checkpoint(args, strategy)
+
+    workers = min(args.workers, args.num_clients)
+    pool = ClientPool(workers, data_shm.name, data_layout, model_kwargs, args.batch_size, args.verbose)
+    manager = SimpleClientManager()
+    for i in range(args.num_clients):
+        manager.register(SimClientProxy(str(i + 1), i, pool))
+    server = make_server(args, strategy, manager, start_round)
+    # One thread per client, so every client's task is queued at its worker up front
+    server.set_max_workers(args.num_clients)
+
+    print(
+        f"→ Simulating {args.num_clients} clients on {workers} workers | rounds={args.num_rounds} | "
+        f"strategy={args.strategy} | epochs/client={args.local_epochs} | lr={args.learning_rate} | codec={args.codec}"
+    )
+    try:
+        history, elapsed = server.fit(num_rounds=args.num_rounds, timeout=None)
+    finally:
+        pool.close()
+        data_shm.close()
+        data_shm.unlink()
+        strategy.close()
+    print(f"→ Simulation finished in {elapsed:.1f}s ({elapsed / max(args.num_rounds - start_round, 1):.2f}s per round)")
+    if history.losses_distributed:
+        rnd, loss = history.losses_distributed[-1]
+        print(f"→ Final distributed loss (round {rnd}): {loss:.4f}")
+    if history.losses_centralized:
+        rnd, loss = history.losses_centralized[-1]
+        print(f"→ Final centralized loss (round {rnd}): {loss:.4f}")
+    if args.history_json:
+        save_history(args.history_json, history, args, elapsed_s=elapsed)
+
+
+if __name__ == "__main__":
+    main()
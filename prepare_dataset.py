@@ -6,15 +6,26 @@ Cross-platform dataset splitter for federated learning clients.
 Unzips a dataset of class-folders and prepares per-client train/test subsets.
 Handles zips with a single top-level directory or direct class folders,
 and adds images to existing directories without overwriting.
+
+Run without arguments to prepare the one client configured below. With
+arguments, the whole federation is prepared in one pass over the zip:
+
+    python prepare_dataset.py dataset.zip --clients 20 --mode dirichlet --alpha 0.5
 """
 
 import sys
 from pathlib import Path
+import argparse
+import csv
+import hashlib
+import threading
+import time
 import zipfile
 import tempfile
 import shutil
 import random
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # === User Configuration ===
 ZIP_FILE    = Path(r'C:\Users\kjshi\Desktop\ASU_sem_2\Intro_to_ml_with_fpga\Project\Federated_learning_team_6\ML dataset-20250426T225000Z-002.zip')  # Path to your zipped dataset
@@ -23,16 +34,6 @@ BASE_DIR    = Path('flower-fl') / 'client' / 'data'  # Base directory for client
 FRACTION    = 0.2                              # Fraction of images per class to sample (0 < f ≤ 1)
 TRAIN_RATIO = 0.8                              # Fraction of sampled images for training
 
-# Sanity check for the ZIP file
-print(f"ZIP_FILE: {ZIP_FILE}")
-if not ZIP_FILE.is_file():
-    print(f"ERROR: ZIP file not found at {ZIP_FILE}", file=sys.stderr)
-    sys.exit(1)
-
-# Ensure base data directory exists
-BASE_DIR.mkdir(parents=True, exist_ok=True)
-
-
 def split_for_client(zip_path: Path, client_id: int, base_client_dir: Path, fraction: float, train_ratio: float):
     """
     Extracts classes from zip_path, samples `fraction` of images per class,
@@ -111,6 +112,243 @@ def split_for_client(zip_path: Path, client_id: int, base_client_dir: Path, frac
     print(f"Client {client_id} data prepared at {client_dir}")
 
 
+def list_class_members(zf: zipfile.ZipFile) -> dict:
+    """
+    Map class name -> sorted member names, read from the zip's directory only.
+    Classes are the folders at the top of the zip, or inside its single
+    top-level folder (the two layouts split_for_client handles); files in
+    subfolders of a class belong to that class. Hidden files and
+    __MACOSX-style folders are skipped.
+    """
+    files = []
+    for info in zf.infolist():
+        parts = info.filename.split('/')
+        if info.is_dir() or len(parts) < 2:
+            continue
+        if any(p.startswith(('__', '.')) for p in parts):
+            continue
+        files.append(parts)
+    # One top-level folder with no files of its own holds the class folders
+    depth = 1 if len({p[0] for p in files}) == 1 and all(len(p) > 2 for p in files) else 0
+    classes = {}
+    for parts in files:
+        classes.setdefault(parts[depth], []).append('/'.join(parts))
+    return {cls: sorted(members) for cls, members in sorted(classes.items())}
+
+
+def destination_names(classes: dict) -> dict:
+    """
+    Map member -> file name within its class folder: its own name, unless other
+    members of the class share it (e.g. from different subfolders), in which
+    case all of them get a short hash of their zip path appended.
+    """
+    names = {}
+    for members in classes.values():
+        seen = {}
+        for m in members:
+            seen.setdefault(Path(m).name, []).append(m)
+        for name, same in seen.items():
+            for m in same:
+                if len(same) == 1:
+                    names[m] = name
+                else:
+                    p = Path(name)
+                    names[m] = f"{p.stem}_{hashlib.sha1(m.encode()).hexdigest()[:8]}{p.suffix}"
+    return names
+
+
+def assign_members(classes: dict, num_clients: int, mode: str, fraction: float, alpha: float, seed: int) -> dict:
+    """
+    Decide which clients get each image: {class: [(member, [client indices]), ...]}.
+
+      iid        every image goes to exactly one client; each class is shuffled
+                 and dealt out round-robin, so clients get equal class mixes
+      fraction   like the single-client mode: each client independently samples
+                 `fraction` of every class (clients may share images)
+      dirichlet  every image goes to one client; each class is split between
+                 clients in proportions drawn from Dirichlet(`alpha`), so a
+                 small alpha gives each client only a few dominant classes
+    """
+    rng = random.Random(seed)
+    assignment = {}
+    for cls, members in classes.items():
+        shuffled = members[:]
+        rng.shuffle(shuffled)
+        owners = {m: [] for m in members}
+        if mode == 'iid':
+            # Random starting client, so the remainders don't always go to the first ones
+            offset = rng.randrange(num_clients)
+            for i, m in enumerate(shuffled):
+                owners[m].append((offset + i) % num_clients)
+        elif mode == 'fraction':
+            k = max(1, int(len(members) * fraction))
+            for c in range(num_clients):
+                for m in rng.sample(members, k):
+                    owners[m].append(c)
+        else:
+            weights = [rng.gammavariate(alpha, 1.0) for _ in range(num_clients)]
+            total = sum(weights) or 1.0
+            start, cum = 0, 0.0
+            for c, w in enumerate(weights):
+                cum += w / total
+                end = len(shuffled) if c == num_clients - 1 else round(cum * len(shuffled))
+                for m in shuffled[start:end]:
+                    owners[m].append(c)
+                start = end
+        # Keep the shuffled order: it becomes each client's random train/test split
+        assignment[cls] = [(m, owners[m]) for m in shuffled if owners[m]]
+    return assignment
+
+
+def link_file(src: Path, dest: Path, method: str) -> str:
+    """
+    Make `dest` a copy of `src` as cheaply as the filesystem allows; returns
+    how it was done: 'hardlink' (same inode), 'reflink' (copy-on-write clone)
+    or 'copy'.
+    """
+    if method == 'hardlink':
+        try:
+            os.link(src, dest)
+            return 'hardlink'
+        except OSError:
+            pass
+    if method in ('hardlink', 'reflink'):
+        try:
+            import fcntl
+            with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), 0x40049409, fsrc.fileno())  # FICLONE (Linux)
+            return 'reflink'
+        except (ImportError, OSError):
+            dest.unlink(missing_ok=True)
+    shutil.copy2(src, dest)
+    return 'copy'
+
+
+def partition_zip(zip_path: Path, out_dir: Path, num_clients: int, mode: str = 'iid', fraction: float = 0.2,
+                  alpha: float = 0.5, train_ratio: float = 0.8, seed: int = 0, first_id: int = 1,
+                  workers: int = None, link: str = 'hardlink', manifest: Path = None):
+    """
+    Partition the class folders of `zip_path` across `num_clients` clients in
+    one pass, writing out_dir/client_<ID>/{train,test}/<class>/<file> (file
+    names made unique within a class, see destination_names).
+
+    Each zip member is decompressed once, by one of `workers` threads, straight
+    into its first destination; further copies of the same image (fraction mode)
+    are hard links or reflinks where the filesystem allows (`link`). Existing
+    files are kept, as in the single-client mode. Every destination is listed
+    in `manifest` (default out_dir/manifest.csv).
+    """
+    start_time = time.perf_counter()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = manifest or out_dir / 'manifest.csv'
+    with zipfile.ZipFile(zip_path) as zf:
+        classes = list_class_members(zf)
+    if not classes:
+        print(f"ERROR: No class folders found in {zip_path}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Detected classes: {list(classes)}")
+    names = destination_names(classes)
+
+    # Destinations of every member, with each client's share split into train/test
+    jobs = {}
+    counts = [[0, 0] for _ in range(num_clients)]
+    for cls, owned in assign_members(classes, num_clients, mode, fraction, alpha, seed).items():
+        per_client = [[] for _ in range(num_clients)]
+        for member, owners in owned:
+            for c in owners:
+                per_client[c].append(member)
+        for c, members in enumerate(per_client):
+            n_train = max(1, int(len(members) * train_ratio)) if members else 0
+            for i, member in enumerate(members):
+                split = 'train' if i < n_train else 'test'
+                counts[c][split == 'test'] += 1
+                dest = out_dir / f"client_{first_id + c}" / split / cls / names[member]
+                jobs.setdefault(member, []).append((first_id + c, split, cls, dest))
+    for c in range(num_clients):
+        for split in ('train', 'test'):
+            for cls in classes:
+                (out_dir / f"client_{first_id + c}" / split / cls).mkdir(parents=True, exist_ok=True)
+
+    local = threading.local()
+
+    def write(item):
+        member, dests = item
+        if not hasattr(local, 'zf'):
+            local.zf = zipfile.ZipFile(zip_path)  # One handle per thread
+        done, source = [], None
+        for client, split, cls, dest in dests:
+            if dest.exists():
+                how = 'exists'
+            elif source is None:
+                tmp = dest.with_name(f".{dest.name}.tmp")
+                with local.zf.open(member) as fsrc, open(tmp, 'wb') as fdst:
+                    shutil.copyfileobj(fsrc, fdst, 1 << 20)
+                os.replace(tmp, dest)  # Never leave a partial image that later runs would skip
+                how = 'extract'
+            else:
+                how = link_file(source, dest, link)
+            if source is None:
+                source = dest  # Later copies of this image are made from here
+            done.append((member, client, split, cls, str(dest.relative_to(out_dir)), how))
+        return done
+
+    tally = {}
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as pool, \
+            open(manifest, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['member', 'client', 'split', 'class', 'path', 'how'])
+        for rows in pool.map(write, jobs.items()):
+            writer.writerows(rows)
+            for row in rows:
+                tally[row[-1]] = tally.get(row[-1], 0) + 1
+
+    for c, (n_train, n_test) in enumerate(counts):
+        print(f"client_{first_id + c}: {n_train} train / {n_test} test images")
+    summary = ', '.join(f"{n} {how}" for how, n in sorted(tally.items()))
+    print(f"Partitioned {len(jobs)} images across {num_clients} clients in "
+          f"{time.perf_counter() - start_time:.1f}s ({summary}); manifest: {manifest}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Partition a zipped class-folder dataset across all federated clients in one pass"
+    )
+    parser.add_argument('zip', type=Path, help="Zipped dataset of class folders")
+    parser.add_argument('-n', '--clients', type=int, required=True, help="Number of clients")
+    parser.add_argument('-o', '--out', type=Path, default=BASE_DIR, help="Folder receiving client_<ID>/ folders")
+    parser.add_argument('--mode', choices=['iid', 'fraction', 'dirichlet'], default='iid',
+                        help="iid: disjoint equal shares; fraction: each client samples --fraction of every "
+                             "class; dirichlet: disjoint non-IID shares")
+    parser.add_argument('--fraction', type=float, default=FRACTION, help="Per-class fraction (fraction mode)")
+    parser.add_argument('--alpha', type=float, default=0.5, help="Dirichlet concentration (dirichlet mode)")
+    parser.add_argument('--train-ratio', type=float, default=TRAIN_RATIO)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--first-id', type=int, default=1, help="ID of the first client folder")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Writer threads")
+    parser.add_argument('--link', choices=['hardlink', 'reflink', 'copy'], default='hardlink',
+                        help="How repeated copies of an image are made (falls back to copying)")
+    parser.add_argument('--manifest', type=Path, default=None, help="Manifest CSV (default: <out>/manifest.csv)")
+    args = parser.parse_args()
+    if not args.zip.is_file():
+        print(f"ERROR: ZIP file not found at {args.zip}", file=sys.stderr)
+        sys.exit(1)
+    partition_zip(args.zip, args.out, args.clients, args.mode, args.fraction, args.alpha, args.train_ratio,
+                  args.seed, args.first_id, args.workers, args.link, args.manifest)
+
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main()
+        sys.exit(0)
+
+    # Sanity check for the ZIP file
+    print(f"ZIP_FILE: {ZIP_FILE}")
+    if not ZIP_FILE.is_file():
+        print(f"ERROR: ZIP file not found at {ZIP_FILE}", file=sys.stderr)
+        sys.exit(1)
+
+    # Ensure base data directory exists
+    BASE_DIR.mkdir(parents=True, exist_ok=True)
+
     split_for_client(ZIP_FILE, CLIENT_ID, BASE_DIR, FRACTION, TRAIN_RATIO)
     print("Dataset split complete.")